@@ -24,6 +24,9 @@ class BaseAgent(abc.ABC):
     def __init__(self, index = 0):
         self.index = index
 
+        # Seconds the game allows for each move, see setMoveTimeBudget().
+        self._moveTimeBudget = None
+
     @abc.abstractmethod
     def getAction(self, state):
         """
@@ -33,6 +36,15 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def getMoveTimeBudget(self):
+        """
+        Get the number of seconds this agent may spend on each move,
+        or None if the game did not say.
+        Time limited searches (see `pacai.agents.search.deepening`) should stay within this.
+        """
+
+        return self._moveTimeBudget
+
     def registerInitialState(self, state):
         """
         Inspect the starting state.
@@ -40,6 +52,14 @@ class BaseAgent(abc.ABC):
 
         pass
 
+    def setMoveTimeBudget(self, seconds):
+        """
+        Called by the game (before `BaseAgent.registerInitialState`)
+        with the number of seconds the rules allow for each move.
+        """
+
+        self._moveTimeBudget = seconds
+
     def observationFunction(self, state):
         """
         Make an observation on the state of the game.
@@ -0,0 +1,379 @@
+"""
+A capture agent that plans with Monte Carlo Tree Search (MCTS).
+
+Each move, the agent grows a search tree from the current state using UCT (Upper Confidence Trees):
+walk down the tree (picking children by their UCB1 score), add one new child,
+play out a short random-ish game from it (a rollout), and back the result up the tree.
+The tree covers the moves of every agent (in turn order),
+so opponents pick the children that are the worst for us.
+When time is up, the most visited action at the root is taken.
+
+Rollouts are played on the game state in-place and undone afterwards
+(see `pacai.core.gamestate.AbstractGameState.applyAction`), so they do not allocate new states.
+The part of the tree under the state that actually comes up on our next move is kept for that move.
+"""
+
+import logging
+import math
+import random
+import time
+
+from pacai.agents.capture.capture import CaptureAgent
+from pacai.agents.search.deepening import Deadline
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+
+DEFAULT_EXPLORATION = 1.0
+DEFAULT_ROLLOUT_DEPTH = 20
+
+# The most rollouts for a single move.
+# This is the only limit when the game does not give a move time budget.
+DEFAULT_MAX_ROLLOUTS = 2000
+
+# The chance that an agent in a rollout makes a random move instead of following its policy.
+DEFAULT_RANDOM_MOVE_CHANCE = 0.2
+
+# Ghosts will chase invaders that are at most this far away (in a rollout).
+CHASE_DISTANCE = 5
+
+# How much being close to food is worth (in points) when evaluating the end of a rollout.
+FOOD_DISTANCE_WEIGHT = 0.01
+
+class MCTSCaptureAgent(CaptureAgent):
+    """
+    A capture agent that searches with Monte Carlo Tree Search (see `pacai.agents.capture.mcts`).
+
+    Rollouts follow a cheap default policy (see `MCTSCaptureAgent.getRolloutAction`)
+    and are scored with `MCTSCaptureAgent.evaluateRollout`,
+    children may override either of these to change the agent's play.
+    The search stops when the game's move time budget is nearly used up
+    (see `pacai.agents.base.BaseAgent.getMoveTimeBudget`) or after maxRollouts rollouts.
+    """
+
+    def __init__(self, index, explorationWeight = DEFAULT_EXPLORATION,
+            rolloutDepth = DEFAULT_ROLLOUT_DEPTH, maxRollouts = DEFAULT_MAX_ROLLOUTS,
+            randomMoveChance = DEFAULT_RANDOM_MOVE_CHANCE, **kwargs):
+        super().__init__(index)
+
+        self._explorationWeight = float(explorationWeight)
+        self._rolloutDepth = int(rolloutDepth)
+        self._maxRollouts = int(maxRollouts)
+        self._randomMoveChance = float(randomMoveChance)
+
+        # The root of the tree from our last move (kept so it can be reused).
+        self._root = None
+
+        # The food each team could eat at the start of the game: {isRed: [position, ...], ...}.
+        self._foodPositions = None
+
+        # Food that is eaten never comes back,
+        # so the closest food to a position is the first uneaten one in a list sorted by distance.
+        # {(isRed, position): [(distance, foodPosition), ...], ...}
+        self._foodByDistance = {}
+
+        # Totals over the game, for reporting.
+        self._totalRollouts = 0
+        self._totalSearchTime = 0.0
+
+    def registerInitialState(self, gameState):
+        super().registerInitialState(gameState)
+
+        self._root = None
+        self._totalRollouts = 0
+        self._totalSearchTime = 0.0
+
+        self._foodPositions = {
+            True: gameState.getBlueFood().asList(),
+            False: gameState.getRedFood().asList(),
+        }
+        self._foodByDistance = {}
+
+    def final(self, gameState):
+        super().final(gameState)
+
+        if (self._totalSearchTime > 0.0):
+            rate = self._totalRollouts / self._totalSearchTime
+            logging.debug('MCTS agent %d: %d rollouts in %.2f seconds (%.0f rollouts/second).' %
+                    (self.index, self._totalRollouts, self._totalSearchTime, rate))
+
+        self._root = None
+
+    def chooseAction(self, gameState):
+        startTime = time.time()
+        deadline = Deadline.fromBudget(self.getMoveTimeBudget())
+
+        root = self._findReusableRoot(gameState)
+        reusedVisits = 0
+        if (root is None):
+            root = _Node(gameState, self.index, self._getSearchActions(gameState, self.index))
+        else:
+            reusedVisits = root.visits
+
+        if (len(root.untriedActions) + len(root.children) == 0):
+            # There is nowhere to go.
+            self._root = None
+            return Directions.STOP
+
+        rollouts = 0
+        while (rollouts < self._maxRollouts):
+            if (rollouts > 0 and deadline.getRemaining() == 0.0):
+                break
+
+            self._runIteration(gameState, root)
+            rollouts += 1
+
+        searchTime = time.time() - startTime
+        self._totalRollouts += rollouts
+        self._totalSearchTime += searchTime
+
+        logging.debug('MCTS agent %d: %d rollouts in %.3f seconds (%.0f rollouts/second), '
+                '%d visits reused.' % (self.index, rollouts, searchTime,
+                rollouts / max(searchTime, 1e-9), reusedVisits))
+
+        self._root = root
+
+        # The most visited action is the most robust choice.
+        return max(root.children.items(), key = lambda item: item[1].visits)[0]
+
+    def evaluateRollout(self, gameState):
+        """
+        Score the state at the end of a rollout (from our team's point of view).
+        This is the score, plus a little bit for how close each team is to the food it can eat.
+        """
+
+        value = self.getScore(gameState)
+
+        for agentIndex in range(gameState.getNumAgents()):
+            foodDistance = self._getFoodDistance(gameState, agentIndex,
+                    gameState.getAgentState(agentIndex).getPosition())
+
+            if (gameState.isOnRedTeam(agentIndex) == self.red):
+                value -= FOOD_DISTANCE_WEIGHT * foodDistance
+            else:
+                value += FOOD_DISTANCE_WEIGHT * foodDistance
+
+        return value
+
+    def getRolloutAction(self, gameState, agentIndex, actions):
+        """
+        Pick the action for an agent in a rollout (the default policy).
+        Ghosts chase nearby invaders, and everyone else heads to the closest food they can eat.
+        Every so often, a random action is taken instead.
+        """
+
+        if (random.random() < self._randomMoveChance):
+            return random.choice(actions)
+
+        agentState = gameState.getAgentState(agentIndex)
+        position = agentState.getPosition()
+
+        targets = None
+        if (agentState.isBraveGhost()):
+            if (gameState.isOnRedTeam(agentIndex)):
+                opponents = gameState.getBlueTeamIndices()
+            else:
+                opponents = gameState.getRedTeamIndices()
+
+            targets = []
+            for opponent in opponents:
+                opponentState = gameState.getAgentState(opponent)
+                if (not opponentState.isPacman()):
+                    continue
+
+                opponentPosition = opponentState.getPosition()
+                if (self.getMazeDistance(position, opponentPosition) <= CHASE_DISTANCE):
+                    targets.append(opponentPosition)
+
+        bestActions = []
+        bestDistance = None
+
+        for action in actions:
+            successor = Actions.getSuccessor(position, action)
+
+            if (targets):
+                distance = min([self.getMazeDistance(successor, target) for target in targets])
+            else:
+                distance = self._getFoodDistance(gameState, agentIndex, successor)
+
+            if (bestDistance is None or distance < bestDistance):
+                bestActions = [action]
+                bestDistance = distance
+            elif (distance == bestDistance):
+                bestActions.append(action)
+
+        return random.choice(bestActions)
+
+    def _findReusableRoot(self, gameState):
+        """
+        Find the node for this state in the tree from our last move
+        (the state after every other agent has moved once), or None.
+        """
+
+        if (self._root is None):
+            return None
+
+        nodes = [self._root]
+        for i in range(gameState.getNumAgents()):
+            nodes = [child for node in nodes for child in node.children.values()]
+
+        stateHash = hash(gameState)
+        for node in nodes:
+            if (node.agentIndex == self.index and node.stateHash == stateHash):
+                return node
+
+        return None
+
+    def _getFoodDistance(self, gameState, agentIndex, position):
+        """
+        Get the maze distance from the position to the closest food the agent can eat
+        (or 0 if there is none).
+        """
+
+        isRed = gameState.isOnRedTeam(agentIndex)
+
+        key = (isRed, position)
+        foodByDistance = self._foodByDistance.get(key)
+        if (foodByDistance is None):
+            foodByDistance = sorted([(self.getMazeDistance(position, food), food)
+                    for food in self._foodPositions[isRed]])
+            self._foodByDistance[key] = foodByDistance
+
+        for distance, (x, y) in foodByDistance:
+            if (gameState.hasFood(x, y)):
+                return distance
+
+        return 0
+
+    def _getSearchActions(self, gameState, agentIndex):
+        """
+        Get the actions to search for an agent (stopping is only an option when nothing else is).
+        """
+
+        if (self._isTerminal(gameState)):
+            return []
+
+        actions = gameState.getLegalActions(agentIndex)
+        moves = [action for action in actions if action != Directions.STOP]
+
+        if (len(moves) > 0):
+            return moves
+
+        return actions
+
+    def _isTerminal(self, gameState):
+        # The rules end the game when time is up (not the state).
+        return gameState.isOver() or gameState.getTimeleft() <= 0
+
+    def _rollout(self, gameState, agentIndex):
+        """
+        Play out the state (where agentIndex is the next to move) with the default policy,
+        and return the value of where it ends up.
+        The state is changed in place and put back before returning.
+        """
+
+        numAgents = gameState.getNumAgents()
+
+        records = []
+        try:
+            for ply in range(self._rolloutDepth):
+                actions = self._getSearchActions(gameState, agentIndex)
+                if (len(actions) == 0):
+                    break
+
+                action = self.getRolloutAction(gameState, agentIndex, actions)
+                records.append(gameState.applyAction(agentIndex, action, validate = False))
+
+                agentIndex = (agentIndex + 1) % numAgents
+
+            return self.evaluateRollout(gameState)
+        finally:
+            for record in reversed(records):
+                gameState.undoAction(record)
+
+    def _runIteration(self, gameState, root):
+        """
+        Run a single UCT iteration: select, expand, roll out, and back up.
+        The state is changed in place and put back before returning.
+        """
+
+        numAgents = gameState.getNumAgents()
+        node = root
+        path = [root]
+        records = []
+
+        try:
+            # Selection: walk down through nodes that have been fully expanded.
+            while (len(node.untriedActions) == 0 and len(node.children) > 0):
+                action, node = self._selectChild(gameState, node)
+                records.append(gameState.applyAction(path[-1].agentIndex, action,
+                        validate = False))
+                path.append(node)
+
+            # Expansion: add a single new child.
+            if (len(node.untriedActions) > 0):
+                action = node.untriedActions.pop(random.randrange(len(node.untriedActions)))
+                records.append(gameState.applyAction(node.agentIndex, action, validate = False))
+
+                nextAgent = (node.agentIndex + 1) % numAgents
+                child = _Node(gameState, nextAgent, self._getSearchActions(gameState, nextAgent))
+                node.children[action] = child
+
+                node = child
+                path.append(node)
+
+            # Simulation.
+            # Terminal states are scored like the end of a rollout, so all values share a scale.
+            if (self._isTerminal(gameState)):
+                value = self.evaluateRollout(gameState)
+            else:
+                value = self._rollout(gameState, node.agentIndex)
+        finally:
+            for record in reversed(records):
+                gameState.undoAction(record)
+
+        # Backpropagation.
+        for node in path:
+            node.visits += 1
+            node.totalValue += value
+
+    def _selectChild(self, gameState, node):
+        """
+        Pick the child with the best UCB1 score (for the agent choosing at the node).
+        """
+
+        # Opponents are trying to minimize our value.
+        sign = 1.0
+        if (gameState.isOnRedTeam(node.agentIndex) != self.red):
+            sign = -1.0
+
+        logVisits = math.log(node.visits)
+
+        bestScore = None
+        bestItem = None
+
+        for action, child in node.children.items():
+            score = (sign * child.totalValue / child.visits
+                    + self._explorationWeight * math.sqrt(logVisits / child.visits))
+
+            if (bestScore is None or score > bestScore):
+                bestScore = score
+                bestItem = (action, child)
+
+        return bestItem
+
+class _Node(object):
+    """
+    A node in the search tree: a state where agentIndex is the next to move.
+    Values are always from the searching agent's point of view.
+    """
+
+    def __init__(self, gameState, agentIndex, actions):
+        self.agentIndex = agentIndex
+        self.stateHash = hash(gameState)
+
+        # {action: _Node, ...}
+        self.children = {}
+        self.untriedActions = list(actions)
+
+        self.visits = 0
+        self.totalValue = 0.0
@@ -4,16 +4,27 @@ import time
 
 from pacai.agents.capture.capture import CaptureAgent
 from pacai.util import util, counter
+from pacai.util.features import dot
 
 
 class ReflexCaptureAgent(CaptureAgent):
     """
     A base class for reflex agents that chooses score-maximizing actions.
+
+    By default, features and weights are `pacai.util.counter.Counter`s
+    (see `ReflexCaptureAgent.getFeatures`).
+    Agents that want faster evaluations can declare their features once
+    (see `ReflexCaptureAgent.getFeatureSchema`) and write them straight into arrays
+    (see `ReflexCaptureAgent.writeFeatures`).
     """
 
     def __init__(self, index, **kwargs):
         super().__init__(index)
 
+        # Only used with a feature schema.
+        self._featureRow = None
+        self._weightVector = None
+
     def chooseAction(self, gameState):
         """
         Picks among the actions with the highest return from `ReflexCaptureAgent.evaluate`.
@@ -49,11 +60,55 @@ class ReflexCaptureAgent(CaptureAgent):
         Computes a linear combination of features and feature weights.
         """
 
+        schema = self.getFeatureSchema()
+        if (schema is not None):
+            if (self._featureRow is None):
+                self._featureRow = schema.newVector()
+
+            features = self._featureRow
+            schema.zero(features)
+            self.writeFeatures(gameState, action, features)
+
+            return dot(features, self.getWeightVector(gameState))
+
         features = self.getFeatures(gameState, action)
         weights = self.getWeights(gameState, action)
 
         return features * weights
 
+    def getFeatureSchema(self):
+        """
+        Get the `pacai.util.features.FeatureSchema` that this agent writes its features with,
+        or None (the default) to use `ReflexCaptureAgent.getFeatures`.
+        This should always return the same schema.
+        """
+
+        return None
+
+    def getWeightVector(self, gameState):
+        """
+        Get the weights (see `ReflexCaptureAgent.getWeights`) as a vector of the feature schema.
+        With a schema, weights must not change, so they are only fetched once.
+        """
+
+        if (self._weightVector is None):
+            weights = self.getWeights(gameState, None)
+            self._weightVector = self.getFeatureSchema().toVector(weights)
+
+        return self._weightVector
+
+    def writeFeatures(self, gameState, action, features):
+        """
+        Write the features for taking the action into a vector of the feature schema
+        (features starts out as all zeros).
+        Agents with a schema should override this,
+        by default the features from `ReflexCaptureAgent.getFeatures` are copied in.
+        """
+
+        schema = self.getFeatureSchema()
+        for name, value in self.getFeatures(gameState, action).items():
+            features[schema.getIndex(name)] = value
+
     def getFeatures(self, gameState, action):
         features = counter.Counter()
         successor = self.getSuccessor(gameState, action)
@@ -0,0 +1,113 @@
+"""
+Iterative deepening for time limited (adversarial) searches.
+
+A search is run to a depth of 1, then 2, then 3, etc, until the time for the move is nearly used up
+(or a maximum depth is reached).
+When time runs out in the middle of a search, that search is thrown away,
+and the result of the last completed depth is used.
+Each search is given the principal variation (the best line of play) of the last one,
+so it can try the moves that were best last time first (which makes alpha-beta prune much more).
+"""
+
+import logging
+import time
+
+# By default, only use this fraction of the move budget (the rest is a safety margin).
+DEFAULT_TIME_FRACTION = 0.8
+
+class SearchTimeout(Exception):
+    """
+    Raised by `Deadline.check` when a search runs out of time.
+    """
+
+    pass
+
+class Deadline(object):
+    """
+    The point in time that a search has to be done by.
+    A deadline of None seconds never expires.
+    """
+
+    def __init__(self, seconds):
+        self._end = None
+        if (seconds is not None):
+            self._end = time.time() + seconds
+
+    def check(self):
+        """
+        Raise a `SearchTimeout` if the deadline has passed.
+        Searches should call this at every node.
+        """
+
+        if (self._end is not None and time.time() >= self._end):
+            raise SearchTimeout()
+
+    def getRemaining(self):
+        """
+        Get the number of seconds left (or None for deadlines that never expire).
+        """
+
+        if (self._end is None):
+            return None
+
+        return max(0.0, self._end - time.time())
+
+    @staticmethod
+    def fromBudget(budget, fraction = DEFAULT_TIME_FRACTION):
+        """
+        Get a deadline for some fraction of a move's time budget
+        (see `pacai.agents.base.BaseAgent.getMoveTimeBudget`).
+        A budget of None never expires.
+        """
+
+        if (budget is None):
+            return Deadline(None)
+
+        return Deadline(budget * fraction)
+
+def iterativeDeepening(search, deadline, maxDepth, minDepth = 1):
+    """
+    Run a search at increasing depths until the deadline (or maxDepth) is reached.
+
+    search(depth, principalVariation, deadline) -> (value, principalVariation)
+    The principal variation is a list of the best actions from the root (first action first).
+    The search should call `Deadline.check` on the deadline it is given often,
+    and undo any changes it made when it is interrupted by a `SearchTimeout`.
+
+    Returns the result of the deepest completed search: (depth, value, principalVariation).
+    The first search (minDepth) is always completed (it is given a deadline that never expires),
+    so there is always a result.
+    """
+
+    result = (0, None, [])
+    lastTime = None
+
+    for depth in range(minDepth, maxDepth + 1):
+        searchDeadline = deadline
+        if (depth == minDepth):
+            searchDeadline = Deadline(None)
+
+        startTime = time.time()
+
+        try:
+            value, principalVariation = search(depth, result[2], searchDeadline)
+        except SearchTimeout:
+            logging.debug('Search at depth %d timed out, using depth %d.' % (depth, result[0]))
+            break
+
+        result = (depth, value, principalVariation)
+        iterationTime = time.time() - startTime
+
+        # Don't start a search that (judging by how much the last one grew) cannot finish.
+        remaining = deadline.getRemaining()
+        if (remaining is not None):
+            if (remaining <= 0.0):
+                break
+
+            if (lastTime is not None and lastTime > 0.0
+                    and iterationTime * (iterationTime / lastTime) > remaining):
+                break
+
+        lastTime = iterationTime
+
+    return result
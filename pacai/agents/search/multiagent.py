@@ -1,19 +1,116 @@
+import copy
+
 from pacai.agents.base import BaseAgent
+from pacai.util import parallel
 from pacai.util import reflection
+from pacai.util.transposition import TranspositionTable
 
 class MultiAgentSearchAgent(BaseAgent):
     """
     A common class for all multi-agent searchers.
+
+    Searchers can opt in to a transposition table
+    (see `pacai.util.transposition.TranspositionTable`)
+    that they can use to reuse search results within a move, and across moves.
+    The table is bounded by transpositionTableSize
+    (e.g. `pacai.util.transposition.DEFAULT_MAX_SIZE`).
+    By default, the size is 0 and there is no table.
+
+    Searchers that value each root action on its own (see
+    `MultiAgentSearchAgent.searchRootAction`) can search the root actions in parallel
+    by setting numWorkers.
+    Workers are started on the first move and kept until the end of the game.
+    Each worker has its own copy of this agent and the initial state (with its layout),
+    and each move only sends the serialized state (see
+    `pacai.core.gamestate.AbstractGameState.serialize`).
     """
 
-    def __init__(self, index, evalFn = 'pacai.core.eval.score', depth = 2, **kwargs):
+    def __init__(self, index, evalFn = 'pacai.core.eval.score', depth = 2,
+            transpositionTableSize = 0, numWorkers = 1, **kwargs):
         super().__init__(index)
 
         self._evaluationFunction = reflection.qualifiedImport(evalFn)
         self._treeDepth = int(depth)
 
+        self._transpositionTableSize = int(transpositionTableSize)
+        self._transpositionTable = None
+        if (self._transpositionTableSize > 0):
+            self._transpositionTable = TranspositionTable(self._transpositionTableSize)
+
+        self._numWorkers = int(numWorkers)
+        self._pool = None
+
+        self._checkWorkers()
+
+    def final(self, state):
+        if (self._pool is not None):
+            self._pool.close()
+            self._pool = None
+
     def getEvaluationFunction(self):
         return self._evaluationFunction
 
+    def getTranspositionTable(self):
+        """
+        Get this agent's transposition table, or None if it does not use one.
+        """
+
+        return self._transpositionTable
+
     def getTreeDepth(self):
         return self._treeDepth
+
+    def searchRootAction(self, state, action):
+        """
+        Get the value of taking an action in the state (the root of the search).
+        The value must only depend on the state and action (not the other root actions),
+        since root actions may be searched in parallel.
+        Children that want to use `MultiAgentSearchAgent.searchRootActions` should override this.
+        """
+
+        raise NotImplementedError('This agent does not search root actions on their own.')
+
+    def searchRootActions(self, state, actions):
+        """
+        Get the value of each action (see `MultiAgentSearchAgent.searchRootAction`).
+        With more than one worker, the actions are searched in parallel.
+        Either way, the values are the same.
+        """
+
+        if (self._numWorkers <= 1 or len(actions) <= 1):
+            return [self.searchRootAction(state, action) for action in actions]
+
+        if (self._pool is None):
+            # Agents are often made in one process and then sent to a pool to play.
+            self._checkWorkers()
+            self._pool = parallel.PersistentPool(self._numWorkers, (self._getWorkerCopy(), state))
+
+        stateData = state.serialize()
+        return self._pool.map(_searchRootAction, [(stateData, action) for action in actions])
+
+    def _checkWorkers(self):
+        if (self._numWorkers > 1 and not parallel.canStartProcesses()):
+            raise ValueError(('Search workers (numWorkers = %d) cannot be used by an agent'
+                    + ' that is itself running in a pool of processes (e.g. with --jobs).')
+                    % (self._numWorkers))
+
+    def _getWorkerCopy(self):
+        """
+        Get a copy of this agent to search with in a worker process.
+        """
+
+        agent = copy.copy(self)
+
+        agent._numWorkers = 1
+        agent._pool = None
+
+        if (self._transpositionTable is not None):
+            agent._transpositionTable = TranspositionTable(self._transpositionTableSize)
+
+        return agent
+
+def _searchRootAction(context, stateData, action):
+    agent, initialState = context
+
+    state = initialState.deserialize(stateData)
+    return agent.searchRootAction(state, action)
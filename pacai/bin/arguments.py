@@ -1,6 +1,7 @@
 import argparse
 import textwrap
 
+from pacai.ui import text
 from pacai.ui import view
 
 def getParser(description, name):
@@ -25,7 +26,10 @@ def getParser(description, name):
 
     parser.add_argument('-s', '--seed', dest = 'seed',
             action = 'store', type = int, default = None,
-            help = 'Enter seed value to randomize the game')
+            help = 'Enter seed value to randomize the game. '
+                + 'Each game is seeded from this seed and its index, '
+                + 'so a run plays out the same with any number of --jobs '
+                + '(runs from before per-game seeds will not play out the same)')
 
     parser.add_argument('--catch-exceptions', dest = 'catchExceptions',
             action = 'store_true', default = False,
@@ -38,7 +42,12 @@ def getParser(description, name):
 
     parser.add_argument('--gif', dest = 'gif',
             action = 'store', type = str, default = None,
-            help = 'save the game as a gif to the specified path (default: %(default)s)')
+            help = 'save the game as a gif to the specified path,\n'
+                + 'use a .png or .webp path for an animated png or webp (default: %(default)s)')
+
+    parser.add_argument('--gif-background', dest = 'gifBackground',
+            action = 'store_true', default = False,
+            help = 'render and save the gif on a background thread (default: %(default)s)')
 
     parser.add_argument('--gif-fps', dest = 'gifFPS',
             action = 'store', type = int, default = view.DEFAULT_GIF_FPS,
@@ -48,6 +57,16 @@ def getParser(description, name):
             action = 'store', type = int, default = view.DEFAULT_SKIP_FRAMES,
             help = 'skip X actual frames between each frame of the gif (default: %(default)s)')
 
+    parser.add_argument('--jobs', dest = 'jobs',
+            action = 'store', type = int, default = 1,
+            help = 'play games in parallel with this many processes,\n'
+                + 'requires --null-graphics or --turbo (default: %(default)s)')
+
+    parser.add_argument('--keyframe-interval', dest = 'keyframeInterval',
+            action = 'store', type = int, default = 0,
+            help = 'when recording, save the whole game state every this many moves\n'
+                + 'so replays can start from any move quickly, 0 to never (default: %(default)s)')
+
     parser.add_argument('--null-graphics', dest = 'nullGraphics',
             action = 'store_true', default = False,
             help = 'generate no graphics (default: %(default)s)')
@@ -58,18 +77,58 @@ def getParser(description, name):
 
     parser.add_argument('--record', dest = 'record',
             action = 'store', type = str, default = None,
-            help = 'writes the moves of a game to the named pickle file (default: %(default)s)')
+            help = 'writes the moves of a game to the named replay file,\n'
+                + 'with the game index added when recording more than one game\n'
+                + '(default: %(default)s)')
 
     parser.add_argument('--replay', dest = 'replay',
             action = 'store', type = str, default = None,
-            help = 'load a recorded pickle game file to replay (default: %(default)s)')
+            help = 'load a recorded game file to replay (default: %(default)s)')
+
+    parser.add_argument('--replay-start', dest = 'replayStart',
+            action = 'store', type = int, default = 0,
+            help = 'start the replay after this many moves (default: %(default)s)')
+
+    parser.add_argument('--results', dest = 'results',
+            action = 'store', type = str, default = None,
+            help = 'write the results of every game to this file as JSON Lines,\n'
+                + 'use - for stdout (default: %(default)s)')
 
     parser.add_argument('--sprites', dest = 'spritesPath',
             action = 'store', type = str, default = view.DEFAULT_SPRITES,
             help = 'use the specified spritesheet for graphics (default: %(default)s)')
 
+    parser.add_argument('--turbo', dest = 'turbo',
+            action = 'store_true', default = False,
+            help = 'simulate games headless and as fast as possible: no graphics,\n'
+                + 'no move timing (unless --catch-exceptions), and no re-checking\n'
+                + 'that agents made legal moves (default: %(default)s)')
+
     parser.add_argument('--text-graphics', dest = 'textGraphics',
             action = 'store_true', default = False,
             help = 'display output as text only (default: %(default)s)')
 
+    parser.add_argument('--text-redraw', dest = 'textRedraw',
+            action = 'store', type = str, default = text.REDRAW_AUTO, choices = text.REDRAW_MODES,
+            help = 'how text graphics draw each frame: only redraw the changed cells\n'
+                + '(diff, uses ANSI escape codes), print the whole board (full), or\n'
+                + 'diff only when stdout is a terminal (auto) (default: %(default)s)')
+
     return parser
+
+def checkJobs(options):
+    """
+    Make sure that the parsed options can be played in parallel (if asked to).
+    """
+
+    if (options.jobs < 1):
+        raise ValueError('The number of jobs must be positive, found: %d.' % (options.jobs))
+
+    if (options.jobs == 1):
+        return
+
+    if (not (options.nullGraphics or options.turbo)):
+        raise ValueError('Parallel games (--jobs) require --null-graphics or --turbo.')
+
+    if (options.numTraining > 0):
+        raise ValueError('Training games cannot be played in parallel.')
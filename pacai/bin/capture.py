@@ -7,26 +7,31 @@ On your opponents side of the map, you are a pacman and can eat food and capsule
 
 import logging
 import os
-import pickle
 import random
 import sys
 
 from pacai.agents import keyboard
 from pacai.agents.capture.dummy import DummyAgent
+from pacai.bin.arguments import checkJobs
 from pacai.bin.arguments import getParser
 from pacai.core.actions import Actions
+from pacai.core import distanceCalculator
 from pacai.core.distance import manhattan
 from pacai.core.game import Game
 from pacai.core.gamestate import AbstractGameState
 from pacai.core.grid import Grid
 from pacai.core.layout import Layout
 from pacai.core.layout import getLayout
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import ReplayWriter
 from pacai.ui.capture.null import CaptureNullView
 from pacai.ui.capture.text import CaptureTextView
+from pacai.util import parallel
 from pacai.util import reflection
 from pacai.util.logs import initLogging
 from pacai.util.logs import updateLoggingLevel
 from pacai.util.mazeGenerator import generateMaze
+from pacai.util.results import ResultsWriter
 from pacai.util.util import nearestPoint
 
 COLLISION_TOLERANCE = 0.7  # How close ghosts must be to Pacman to kill
@@ -38,6 +43,8 @@ MIN_FOOD = 2
 
 SCARED_TIME = 40
 
+DEFAULT_REPLAY_PATH = 'replay'
+
 class CaptureGameState(AbstractGameState):
     """
     A game state specific to capture.
@@ -67,38 +74,25 @@ class CaptureGameState(AbstractGameState):
             else:
                 self._blueTeam.append(agentIndex)
 
-        # Build some denormalized structures for fast access.
+        self._buildTeamFood()
 
-        self._redCapsules = []
-        self._blueCapsules = []
-
-        for capsule in self.getCapsules():
-            if (self.isOnRedSide(capsule)):
-                self._redCapsules.append(capsule)
-            else:
-                self._blueCapsules.append(capsule)
-
-        self._redFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
-        self._blueFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
+    # Override
+    def deserialize(self, data):
+        state = super().deserialize(data)
 
-        for x in range(self._food.getWidth()):
-            for y in range(self._food.getHeight()):
-                if (not self._food[x][y]):
-                    continue
+        state._timeleft = data['timeleft']
+        state._buildTeamFood()
 
-                if (self.isOnRedSide((x, y))):
-                    self._redFood[x][y] = True
-                else:
-                    self._blueFood[x][y] = True
+        return state
 
     # Override
-    def generateSuccessor(self, agentIndex, action):
+    def generateSuccessor(self, agentIndex, action, validate = True):
         # Check that successors exist.
         if (self.isOver()):
             raise RuntimeError("Can't generate successors of a terminal state.")
 
         successor = self._initSuccessor()
-        successor._applySuccessorAction(agentIndex, action)
+        successor._applySuccessorAction(agentIndex, action, validate)
 
         return successor
 
@@ -128,12 +122,17 @@ class CaptureGameState(AbstractGameState):
             self._redFood = self._redFood.copy()
             self._blueFood = self._blueFood.copy()
 
-        super().eatFood(x, y)
+        if (not super().eatFood(x, y)):
+            return False
 
         if (self.isOnRedSide((x, y))):
-            self._redFood[x][y] = False
+            self._redFood.set(x, y, False)
+            self._numRedFood -= 1
         else:
-            self._blueFood[x][y] = False
+            self._blueFood.set(x, y, False)
+            self._numBlueFood -= 1
+
+        return True
 
     def getBlueCapsules(self):
         """
@@ -161,6 +160,20 @@ class CaptureGameState(AbstractGameState):
 
         return self._blueTeam
 
+    def getNumBlueFood(self):
+        """
+        Get the amount of food left on the blue team's side.
+        """
+
+        return self._numBlueFood
+
+    def getNumRedFood(self):
+        """
+        Get the amount of food left on the red team's side.
+        """
+
+        return self._numRedFood
+
     def getRedCapsules(self):
         """
         Get a list of remaining capsules on the red side.
@@ -224,13 +237,20 @@ class CaptureGameState(AbstractGameState):
 
         return self._teams[agentIndex]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    # Override
+    def serialize(self):
+        data = super().serialize()
+        data['timeleft'] = self._timeleft
+
+        return data
+
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
         """
         Apply the action to the context state (self).
         """
 
         # Find appropriate rules for the agent.
-        AgentRules.applyAction(self, action, agentIndex)
+        AgentRules.applyAction(self, action, agentIndex, validate)
         AgentRules.checkDeath(self, agentIndex)
         AgentRules.decrementTimer(self.getAgentState(agentIndex))
 
@@ -238,7 +258,60 @@ class CaptureGameState(AbstractGameState):
         self._lastAgentMoved = agentIndex
         self._timeleft -= 1
 
-        self._hash = None
+    def _buildTeamFood(self):
+        """
+        Build some denormalized structures for fast access:
+        each team's food and capsules (and how much food each team has left).
+        """
+
+        self._redCapsules = []
+        self._blueCapsules = []
+
+        for capsule in self.getCapsules():
+            if (self.isOnRedSide(capsule)):
+                self._redCapsules.append(capsule)
+            else:
+                self._blueCapsules.append(capsule)
+
+        self._redFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
+        self._blueFood = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
+
+        for (x, y) in self._food.asList():
+            if (self.isOnRedSide((x, y))):
+                self._redFood.set(x, y, True)
+            else:
+                self._blueFood.set(x, y, True)
+
+        self._numRedFood = self._redFood.count()
+        self._numBlueFood = self._blueFood.count()
+
+    # Override
+    def _getUndoRecord(self):
+        return (
+            super()._getUndoRecord(),
+            self._timeleft,
+            self._redFood,
+            self._blueFood,
+            self._numRedFood,
+            self._numBlueFood,
+            self._redCapsules,
+            self._blueCapsules,
+        )
+
+    # Override
+    def _restoreUndoRecord(self, record):
+        (
+            parentRecord,
+            self._timeleft,
+            self._redFood,
+            self._blueFood,
+            self._numRedFood,
+            self._numBlueFood,
+            self._redCapsules,
+            self._blueCapsules,
+        ) = record
+
+        super()._restoreUndoRecord(parentRecord)
 
 class CaptureRules:
     """
@@ -246,17 +319,18 @@ class CaptureRules:
     and how the game starts and ends.
     """
 
-    def newGame(self, layout, agents, display, length, catchExceptions):
+    def newGame(self, layout, agents, display, length, catchExceptions, turbo = False,
+            replayWriter = None):
         initState = CaptureGameState(layout, length)
         starter = random.randint(0, 1)
         logging.info('%s team starts' % ['Red', 'Blue'][starter])
         game = Game(agents, display, self, startingIndex = starter,
-                catchExceptions = catchExceptions)
+                catchExceptions = catchExceptions, turbo = turbo, replayWriter = replayWriter)
         game.state = initState
         game.length = length
 
-        self._totalBlueFood = initState.getBlueFood().count()
-        self._totalRedFood = initState.getRedFood().count()
+        self._totalBlueFood = initState.getNumBlueFood()
+        self._totalRedFood = initState.getNumRedFood()
 
         return game
 
@@ -279,10 +353,10 @@ class CaptureRules:
         redWin = False
         blueWin = False
 
-        if (state.getRedFood().count() <= MIN_FOOD):
+        if (state.getNumRedFood() <= MIN_FOOD):
             logging.info("The Blue team ate all but %d of the opponents' dots." % MIN_FOOD)
             blueWin = True
-        elif (state.getBlueFood().count() <= MIN_FOOD):
+        elif (state.getNumBlueFood() <= MIN_FOOD):
             logging.info("The Red team ate all but %d of the opponents' dots." % MIN_FOOD)
             redWin = True
         else:
@@ -342,17 +416,16 @@ class AgentRules:
         """
 
         agentState = state.getAgentState(agentIndex)
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getPossibleActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
-    def applyAction(state, action, agentIndex):
+    def applyAction(state, action, agentIndex, validate = True):
         """
         Edits the state to reflect the results of the action.
         """
 
-        legal = AgentRules.getLegalActions(state, agentIndex)
-        if (action not in legal):
+        if (validate and action not in AgentRules.getLegalActions(state, agentIndex)):
             raise ValueError('Illegal action: ' + str(action))
 
         agentState = state.getAgentState(agentIndex)
@@ -392,8 +465,8 @@ class AgentRules:
             else:
                 state.addScore(-FOOD_POINTS)
 
-            if ((isRed and state.getBlueFood().count() <= MIN_FOOD)
-                    or (not isRed and state.getRedFood().count() <= MIN_FOOD)):
+            if ((isRed and state.getNumBlueFood() <= MIN_FOOD)
+                    or (not isRed and state.getNumRedFood() <= MIN_FOOD)):
                 state.endGame(True)
 
             return
@@ -519,6 +592,11 @@ def readCommand(argv):
             help = 'comma separated arguments to be passed to blue team (e.g. \'opt1=val1,opt2\') '
                 + '(default: %(default)s)')
 
+    parser.add_argument('--distance-cache', dest = 'distanceCache',
+            action = 'store', type = str, default = None,
+            help = 'save and load maze distances in this directory (default: the value of $%s)'
+                % (distanceCalculator.CACHE_DIR_ENV_VAR))
+
     parser.add_argument('--keys0', dest = 'keys0',
             action = 'store_true', default = False,
             help = 'make agent 0 (first red player) a keyboard agent (default: %(default)s)')
@@ -560,15 +638,24 @@ def readCommand(argv):
         updateLoggingLevel(logging.DEBUG)
 
     viewOptions = {
+        'gifBackground': options.gifBackground,
         'gifFPS': options.gifFPS,
         'gifPath': options.gif,
         'skipFrames': options.gifSkipFrames,
         'spritesPath': options.spritesPath,
     }
 
+    if (options.turbo and options.replay is not None):
+        raise ValueError('Replays cannot be run in turbo mode.')
+
+    checkJobs(options)
+
     # Choose a display format.
-    if options.textGraphics:
-        args['display'] = CaptureTextView(**viewOptions)
+    if options.turbo:
+        # Turbo games never touch the display.
+        args['display'] = None
+    elif options.textGraphics:
+        args['display'] = CaptureTextView(redraw = options.textRedraw, **viewOptions)
     elif options.nullGraphics:
         args['display'] = CaptureNullView(**viewOptions)
     else:
@@ -596,7 +683,8 @@ def readCommand(argv):
         redArgs['numTraining'] = options.numTraining
         blueArgs['numTraining'] = options.numTraining
 
-    nokeyboard = options.textGraphics or options.nullGraphics or options.numTraining > 0
+    nokeyboard = (options.textGraphics or options.nullGraphics or options.turbo
+            or options.numTraining > 0)
     logging.debug('\nRed team %s with %s:' % (options.red, redArgs))
     redAgents = loadAgents(True, options.red, nokeyboard, redArgs)
     logging.debug('\nBlue team %s with %s:' % (options.blue, blueArgs))
@@ -608,6 +696,9 @@ def readCommand(argv):
         if (not val):
             continue
 
+        if (args['display'] is None):
+            raise ValueError('Keyboard agents require graphics.')
+
         if (numKeyboardAgents == 0):
             agent = keyboard.WASDKeyboardAgent(index, keyboard = args['display'].getKeyboard())
         elif (numKeyboardAgents == 1):
@@ -619,19 +710,10 @@ def readCommand(argv):
         args['agents'][index] = agent
 
     # Choose a layout.
-    if options.layout.startswith('RANDOM'):
-        layoutSeed = None
-        if (options.layout != 'RANDOM'):
-            layoutSeed = int(options.layout[6:])
-
-        args['layout'] = Layout(generateMaze(layoutSeed).split('\n'))
-    elif options.layout.lower().find('capture') == -1:
-        raise ValueError('You must use a capture layout with capture.py.')
-    else:
-        args['layout'] = getLayout(options.layout)
+    args['layout'] = loadLayout(options.layout)
 
-    if (args['layout'] is None):
-        raise ValueError('The layout ' + options.layout + ' cannot be found.')
+    if (options.distanceCache is not None):
+        distanceCalculator.setCacheDir(options.distanceCache)
 
     args['length'] = options.maxMoves
     args['numGames'] = options.numGames
@@ -639,6 +721,13 @@ def readCommand(argv):
     args['record'] = options.record
     args['catchExceptions'] = options.catchExceptions
     args['replay'] = options.replay
+    args['replayStart'] = options.replayStart
+    args['keyframeInterval'] = options.keyframeInterval
+    args['turbo'] = options.turbo
+    args['jobs'] = options.jobs
+    args['seed'] = seed
+    args['results'] = options.results
+    args['layoutName'] = options.layout
 
     return args
 
@@ -660,11 +749,50 @@ def loadAgents(isRed, agentModule, textgraphics, args):
 
     return createTeamFunction(indices[0], indices[1], isRed, **args)
 
-def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName):
+def loadLayout(name):
+    """
+    Load a capture layout by name.
+    RANDOM<seed> generates a random maze from the seed (and RANDOM from a random seed).
+    """
+
+    if name.startswith('RANDOM'):
+        layoutSeed = None
+        if (name != 'RANDOM'):
+            layoutSeed = int(name[6:])
+
+        return Layout(generateMaze(layoutSeed).split('\n'))
+    elif name.lower().find('capture') == -1:
+        raise ValueError('You must use a capture layout with capture.py.')
+
+    layout = getLayout(name)
+    if (layout is None):
+        raise ValueError('The layout ' + name + ' cannot be found.')
+
+    return layout
+
+def getReplayState(reader, ply):
+    """
+    Get the state of a recorded capture game (`pacai.core.replay.ReplayReader`)
+    after the given number of moves.
+    """
+
+    initialState = CaptureGameState(reader.getLayout(), reader.getHeader()['length'])
+    return reader.materializeState(initialState, ply)
+
+def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamName,
+        startState = None):
+    """
+    Show a recorded game.
+    If a start state is given, the actions pick up from that state (see getReplayState()).
+    """
+
     agents = [DummyAgent(index) for index in range(len(agents))]
     rules = CaptureRules()
     game = rules.newGame(layout, agents, display, length, False)
     state = game.state
+    if (startState is not None):
+        state = startState
+
     display.redTeam = redTeamName
     display.blueTeam = blueTeamName
     display.initialize(state)
@@ -680,14 +808,133 @@ def replayGame(layout, agents, actions, display, length, redTeamName, blueTeamNa
     display.finish()
 
 def runGames(layout, agents, display, length, numGames, record, numTraining,
-        redTeamName, blueTeamName, catchExceptions = False, **kwargs):
+        redTeamName, blueTeamName, catchExceptions = False, turbo = False, jobs = 1, seed = None,
+        results = None, layoutName = None, keyframeInterval = 0, **kwargs):
+    """
+    Play numGames games, and return the results of the non-training games
+    (see `pacai.core.game.Game.getResults`).
+    Finished games are not kept around.
+
+    If results is given (a path, or '-' for stdout),
+    the results of every game are written there (as JSON Lines) as soon as the game finishes.
+
+    If a seed is given, each game is seeded with `pacai.util.parallel.getGameSeed`
+    (even with a single job), so the games of a run do not share a single random stream.
+    With more than one job, games are played headless in a pool of processes
+    (each game gets its own copy of the agents, so agents cannot learn across games).
+
+    Recorded games get a keyframe every keyframeInterval moves (see `pacai.core.replay`).
+    """
+
+    if (jobs > 1):
+        if (numTraining > 0):
+            raise ValueError('Training games cannot be played in parallel.')
+
+        if (seed is None):
+            seed = random.randint(0, 2**32)
+
+        tasks = [(layout, layoutName, agents, length, catchExceptions, turbo, record,
+                keyframeInterval, redTeamName, blueTeamName, numGames, i,
+                parallel.getGameSeed(seed, i)) for i in range(numGames)]
+        outcomes = parallel.iterateInPool(_playGame, tasks, jobs)
+    else:
+        outcomes = _playGames(layout, layoutName, agents, display, length, numGames,
+                numTraining, catchExceptions, turbo, record, keyframeInterval, redTeamName,
+                blueTeamName, seed)
+
+    gameResults = []
+    with ResultsWriter(results) as writer:
+        for gameResult in outcomes:
+            writer.write(gameResult)
+
+            if (not gameResult['training']):
+                gameResults.append(gameResult)
+
+    if (len(gameResults) > 0):
+        scores = [gameResult['score'] for gameResult in gameResults]
+        redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
+        blueWinRate = [s < 0 for s in scores].count(True) / float(len(scores))
+        logging.info('Average Score:%s', sum(scores) / float(len(scores)))
+        logging.info('Scores:%s', ', '.join([str(score) for score in scores]))
+        logging.info('Red Win Rate: %d/%d (%.2f)' %
+                ([s > 0 for s in scores].count(True), len(scores), redWinRate))
+        logging.info('Blue Win Rate: %d/%d (%.2f)' %
+                ([s < 0 for s in scores].count(True), len(scores), blueWinRate))
+        logging.info('Record: %s',
+                ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
+
+    return gameResults
+
+def getRecordPath(record, numGames, gameIndex):
+    """
+    Get the path to record a game's replay to.
+    When recording more than one game, the game's index is added to the path.
+    """
+
+    path = DEFAULT_REPLAY_PATH
+    if (isinstance(record, str)):
+        path = record
+
+    if (numGames > 1):
+        path = '%s.%d' % (path, gameIndex)
+
+    return path
+
+def getWinner(score):
+    """
+    Get who won a game with the given final score: 'red', 'blue', or 'tie'.
+    """
+
+    if (score > 0):
+        return 'red'
+    elif (score < 0):
+        return 'blue'
+
+    return 'tie'
+
+def _getGameResult(game, layoutName, gameIndex, gameSeed, isTraining):
+    gameResult = {
+        'game': gameIndex,
+        'seed': gameSeed,
+        'layout': layoutName,
+        'training': isTraining,
+        'winner': getWinner(game.state.getScore()),
+    }
+    gameResult.update(game.getResults())
+
+    return gameResult
+
+def _playGame(layout, layoutName, agents, length, catchExceptions, turbo, record,
+        keyframeInterval, redTeamName, blueTeamName, numGames, gameIndex, gameSeed):
+    """
+    Play a single headless game in a worker process.
+    """
+
+    random.seed(gameSeed)
+
+    display = None
+    if (not turbo):
+        display = CaptureNullView()
+
+    rules = CaptureRules()
+    return _playRecordedGame(rules, layout, layoutName, agents, display, length, catchExceptions,
+            turbo, record, keyframeInterval, redTeamName, blueTeamName, numGames, gameIndex,
+            gameSeed, False)
+
+def _playGames(layout, layoutName, agents, display, length, numGames, numTraining,
+        catchExceptions, turbo, record, keyframeInterval, redTeamName, blueTeamName, seed):
+    """
+    Play games one after another in this process,
+    yielding each game's result as soon as it finishes.
+    """
+
     rules = CaptureRules()
-    games = []
 
     nullView = None
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
-        nullView = CaptureNullView()
+        if (not turbo):
+            nullView = CaptureNullView()
 
     for i in range(numGames):
         isTraining = (i < numTraining)
@@ -698,48 +945,49 @@ def runGames(layout, agents, display, length, numGames, record, numTraining,
         else:
             gameDisplay = display
 
-        g = rules.newGame(layout, agents, gameDisplay, length, catchExceptions)
-        g.run()
+        gameSeed = None
+        if (seed is not None):
+            gameSeed = parallel.getGameSeed(seed, i)
+            random.seed(gameSeed)
 
-        if (not isTraining):
-            games.append(g)
+        yield _playRecordedGame(rules, layout, layoutName, agents, gameDisplay, length,
+                catchExceptions, turbo, record, keyframeInterval, redTeamName, blueTeamName,
+                numGames, i, gameSeed, isTraining)
 
-        g.record = None
-        if record:
-            components = {
-                'layout': layout,
-                'agents': [agent.__class__.__name__ for agent in agents],
-                'actions': g.moveHistory,
-                'length': length,
-                'redTeamName': redTeamName,
-                'blueTeamName': blueTeamName
-            }
+def _playRecordedGame(rules, layout, layoutName, agents, display, length, catchExceptions, turbo,
+        record, keyframeInterval, redTeamName, blueTeamName, numGames, gameIndex, gameSeed,
+        isTraining):
+    """
+    Play a game (streaming it to a replay if we are recording) and return its result.
+    """
 
-            path = 'replay'
-            if (isinstance(record, str)):
-                path = record
+    replayWriter = None
+    if (record):
+        header = {
+            'gameType': 'capture',
+            'layout': layout.layoutText,
+            'layoutName': layoutName,
+            'seed': gameSeed,
+            'agents': [agent.__class__.__name__ for agent in agents],
+            'length': length,
+            'redTeamName': redTeamName,
+            'blueTeamName': blueTeamName,
+        }
 
-            g.record = pickle.dumps(components)
-            with open(path, 'wb') as file:
-                file.write(g.record)
+        path = getRecordPath(record, numGames, gameIndex)
+        replayWriter = ReplayWriter(path, header, keyframeInterval)
 
-            logging.info("Game recorded to: '%s'." % (path))
+    game = rules.newGame(layout, agents, display, length, catchExceptions, turbo,
+            replayWriter = replayWriter)
+    game.run()
 
-    if (numGames > 0):
-        scores = [game.state.getScore() for game in games]
-        redWinRate = [s > 0 for s in scores].count(True) / float(len(scores))
-        blueWinRate = [s < 0 for s in scores].count(True) / float(len(scores))
-        logging.info('Average Score:%s', sum(scores) / float(len(scores)))
-        logging.info('Scores:%s', ', '.join([str(score) for score in scores]))
-        logging.info('Red Win Rate: %d/%d (%.2f)' %
-                ([s > 0 for s in scores].count(True), len(scores), redWinRate))
-        logging.info('Blue Win Rate: %d/%d (%.2f)' %
-                ([s < 0 for s in scores].count(True), len(scores), blueWinRate))
-        logging.info('Record: %s',
-                ', '.join([('Blue', 'Tie', 'Red')[max(0, min(2, 1 + s))] for s in scores]))
+    gameResult = _getGameResult(game, layoutName, gameIndex, gameSeed, isTraining)
 
-    return games
+    if (replayWriter is not None):
+        replayWriter.close(gameResult)
+        logging.info("Game recorded to: '%s'." % (path))
 
+    return gameResult
 
 def main(argv):
     """
@@ -756,12 +1004,16 @@ def main(argv):
     if (options['replay'] is not None):
         logging.info('Replaying recorded game %s.' % options['replay'])
 
-        recorded = None
-        with open(options['replay'], 'rb') as file:
-            recorded = pickle.load(file)
+        reader = ReplayReader(options['replay'])
+        header = reader.getHeader()
+
+        startState = None
+        if (options['replayStart'] > 0):
+            startState = getReplayState(reader, options['replayStart'])
 
-        recorded['display'] = options['display']
-        replayGame(**recorded)
+        replayGame(reader.getLayout(), header['agents'], reader.moves(options['replayStart']),
+                options['display'], header['length'], header['redTeamName'],
+                header['blueTeamName'], startState = startState)
 
         return
 
@@ -9,13 +9,13 @@ Have fun!
 
 import logging
 import os
-import pickle
 import random
 import sys
 
 from pacai.agents.base import BaseAgent
 from pacai.agents.ghost.random import RandomGhost
 from pacai.agents.greedy import GreedyAgent
+from pacai.bin.arguments import checkJobs
 from pacai.bin.arguments import getParser
 from pacai.core.actions import Actions
 from pacai.core.directions import Directions
@@ -23,10 +23,14 @@ from pacai.core.distance import manhattan
 from pacai.core.game import Game
 from pacai.core.gamestate import AbstractGameState
 from pacai.core.layout import getLayout
+from pacai.core.replay import ReplayReader
+from pacai.core.replay import ReplayWriter
 from pacai.ui.pacman.null import PacmanNullView
 from pacai.ui.pacman.text import PacmanTextView
+from pacai.util import parallel
 from pacai.util.logs import initLogging
 from pacai.util.logs import updateLoggingLevel
+from pacai.util.results import ResultsWriter
 from pacai.util.util import nearestPoint
 
 PACMAN_AGENT_INDEX = 0
@@ -40,6 +44,8 @@ BOARD_CLEAR_POINTS = 500  # Points for clearning all the food from the board.
 GHOST_POINTS = 200  # Points for eating a ghost.
 LOSE_POINTS = -500  # Points for getting eatten.
 
+DEFAULT_REPLAY_PATH = 'pacman.replay'
+
 class PacmanGameState(AbstractGameState):
     """
     A game state specific to pacman.
@@ -50,7 +56,7 @@ class PacmanGameState(AbstractGameState):
         super().__init__(layout)
 
     # Override
-    def generateSuccessor(self, agentIndex, action):
+    def generateSuccessor(self, agentIndex, action, validate = True):
         """
         Returns the successor state after the specified agent takes the action.
         """
@@ -60,7 +66,7 @@ class PacmanGameState(AbstractGameState):
             raise RuntimeError("Can't generate successors of a terminal state.")
 
         successor = self._initSuccessor()
-        successor._applySuccessorAction(agentIndex, action)
+        successor._applySuccessorAction(agentIndex, action, validate)
 
         return successor
 
@@ -118,16 +124,16 @@ class PacmanGameState(AbstractGameState):
 
         return self._agentStates[PACMAN_AGENT_INDEX]
 
-    def _applySuccessorAction(self, agentIndex, action):
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
         """
         Apply the action to the context state (self).
         """
 
         # Let the agent's logic deal with its action's effects on the board.
         if (agentIndex == PACMAN_AGENT_INDEX):
-            PacmanRules.applyAction(self, action)
+            PacmanRules.applyAction(self, action, validate)
         else:
-            GhostRules.applyAction(self, action, agentIndex)
+            GhostRules.applyAction(self, action, agentIndex, validate)
 
         # Time passes.
         if (agentIndex == PACMAN_AGENT_INDEX):
@@ -142,8 +148,6 @@ class PacmanGameState(AbstractGameState):
         # Book keeping.
         self._lastAgentMoved = agentIndex
 
-        self._hash = None
-
 class ClassicGameRules(object):
     """
     These game rules manage the control flow of a game, deciding when
@@ -153,10 +157,12 @@ class ClassicGameRules(object):
     def __init__(self, timeout = 30):
         self.timeout = timeout
 
-    def newGame(self, layout, pacmanAgent, ghostAgents, display, catchExceptions = False):
+    def newGame(self, layout, pacmanAgent, ghostAgents, display, catchExceptions = False,
+            turbo = False, replayWriter = None):
         agents = [pacmanAgent] + ghostAgents[:layout.getNumGhosts()]
         initState = PacmanGameState(layout)
-        game = Game(agents, display, self, catchExceptions = catchExceptions)
+        game = Game(agents, display, self, catchExceptions = catchExceptions, turbo = turbo,
+                replayWriter = replayWriter)
         game.state = initState
 
         self._initialFoodCount = initState.getNumFood()
@@ -217,17 +223,16 @@ class PacmanRules:
         """
 
         agentState = state.getPacmanState()
-        return Actions.getPossibleActions(agentState.getPosition(), agentState.getDirection(),
-                state.getWalls())
+        return state.getInitialLayout().getPossibleActions(agentState.getPosition(),
+                agentState.getDirection())
 
     @staticmethod
-    def applyAction(state, action):
+    def applyAction(state, action, validate = True):
         """
         Edits the state to reflect the results of the action.
         """
 
-        legal = PacmanRules.getLegalActions(state)
-        if (action not in legal):
+        if (validate and action not in PacmanRules.getLegalActions(state)):
             raise ValueError('Illegal pacman action: ' + str(action))
 
         pacmanState = state.getPacmanState()
@@ -278,8 +283,8 @@ class GhostRules:
         """
 
         agentState = state.getGhostState(ghostIndex)
-        possibleActions = Actions.getPossibleActions(agentState.getPosition(),
-                agentState.getDirection(), state.getWalls())
+        possibleActions = state.getInitialLayout().getPossibleActions(agentState.getPosition(),
+                agentState.getDirection())
         reverse = Actions.reverseDirection(agentState.getDirection())
 
         if (Directions.STOP in possibleActions):
@@ -291,9 +296,8 @@ class GhostRules:
         return possibleActions
 
     @staticmethod
-    def applyAction(state, action, ghostIndex):
-        legal = GhostRules.getLegalActions(state, ghostIndex)
-        if (action not in legal):
+    def applyAction(state, action, ghostIndex, validate = True):
+        if (validate and action not in GhostRules.getLegalActions(state, ghostIndex)):
             raise ValueError('Illegal ghost action: ' + str(action))
 
         ghostState = state.getGhostState(ghostIndex)
@@ -443,7 +447,8 @@ def readCommand(argv):
         raise ValueError('The layout ' + options.layout + ' cannot be found.')
 
     # Choose a Pacman agent.
-    noKeyboard = (options.replay is None and (options.textGraphics or options.nullGraphics))
+    noKeyboard = (options.replay is None
+            and (options.textGraphics or options.nullGraphics or options.turbo))
     if (noKeyboard and ('KeyboardAgent' in options.pacman)):
         raise ValueError('Keyboard agents require graphics.')
 
@@ -459,17 +464,26 @@ def readCommand(argv):
         options.numIgnore = int(agentOpts['numTrain'])
 
     viewOptions = {
+        'gifBackground': options.gifBackground,
         'gifFPS': options.gifFPS,
         'gifPath': options.gif,
         'skipFrames': options.gifSkipFrames,
         'spritesPath': options.spritesPath,
     }
 
+    if (options.turbo and options.replay is not None):
+        raise ValueError('Replays cannot be run in turbo mode.')
+
+    checkJobs(options)
+
     # Choose a display format.
-    if options.nullGraphics:
+    if options.turbo:
+        # Turbo games never touch the display.
+        args['display'] = None
+    elif options.nullGraphics:
         args['display'] = PacmanNullView(**viewOptions)
     elif options.textGraphics:
-        args['display'] = PacmanTextView(**viewOptions)
+        args['display'] = PacmanTextView(redraw = options.textRedraw, **viewOptions)
     else:
         # Defer importing the GUI unless we actually need it.
         # This allows people to not have tkinter installed.
@@ -480,15 +494,35 @@ def readCommand(argv):
 
     args['catchExceptions'] = options.catchExceptions
     args['gameToReplay'] = options.replay
+    args['replayStart'] = options.replayStart
     args['ghosts'] = [BaseAgent.loadAgent(options.ghost, i + 1) for i in range(options.numGhosts)]
     args['numGames'] = options.numGames
     args['pacman'] = BaseAgent.loadAgent(options.pacman, PACMAN_AGENT_INDEX, agentOpts)
     args['record'] = options.record
+    args['keyframeInterval'] = options.keyframeInterval
     args['timeout'] = options.timeout
+    args['turbo'] = options.turbo
+    args['jobs'] = options.jobs
+    args['seed'] = seed
+    args['results'] = options.results
+    args['layoutName'] = options.layout
 
     return args
 
-def replayGame(layout, actions, display):
+def getReplayState(reader, ply):
+    """
+    Get the state of a recorded pacman game (`pacai.core.replay.ReplayReader`)
+    after the given number of moves.
+    """
+
+    return reader.materializeState(PacmanGameState(reader.getLayout()), ply)
+
+def replayGame(layout, actions, display, startState = None):
+    """
+    Show a recorded game.
+    If a start state is given, the actions pick up from that state (see getReplayState()).
+    """
+
     rules = ClassicGameRules()
 
     agents = []
@@ -497,6 +531,9 @@ def replayGame(layout, actions, display):
 
     game = rules.newGame(layout, agents[PACMAN_AGENT_INDEX], agents[1:], display)
     state = game.state
+    if (startState is not None):
+        state = startState
+
     display.initialize(state)
 
     for action in actions:
@@ -512,14 +549,115 @@ def replayGame(layout, actions, display):
     display.finish()
 
 def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraining = 0,
-        catchExceptions = False, timeout = 30, **kwargs):
+        catchExceptions = False, timeout = 30, turbo = False, jobs = 1, seed = None,
+        results = None, layoutName = None, keyframeInterval = 0, **kwargs):
+    """
+    Play numGames games, and return the results of the non-training games
+    (see `pacai.core.game.Game.getResults`).
+    Finished games are not kept around.
+
+    If results is given (a path, or '-' for stdout),
+    the results of every game are written there (as JSON Lines) as soon as the game finishes.
+
+    If a seed is given, each game is seeded with `pacai.util.parallel.getGameSeed`
+    (even with a single job), so the games of a run do not share a single random stream.
+    With more than one job, games are played headless in a pool of processes
+    (each game gets its own copy of the agents, so agents cannot learn across games).
+
+    Recorded games get a keyframe every keyframeInterval moves (see `pacai.core.replay`).
+    """
+
+    if (jobs > 1):
+        if (numTraining > 0):
+            raise ValueError('Training games cannot be played in parallel.')
+
+        if (seed is None):
+            seed = random.randint(0, 2**32)
+
+        tasks = [(layout, layoutName, pacman, ghosts, catchExceptions, timeout, turbo, record,
+                keyframeInterval, numGames, i, parallel.getGameSeed(seed, i))
+                for i in range(numGames)]
+        outcomes = parallel.iterateInPool(_playGame, tasks, jobs)
+    else:
+        outcomes = _playGames(layout, layoutName, pacman, ghosts, display, numGames,
+                numTraining, catchExceptions, timeout, turbo, record, keyframeInterval, seed)
+
+    gameResults = []
+    with ResultsWriter(results) as writer:
+        for gameResult in outcomes:
+            writer.write(gameResult)
+
+            if (not gameResult['training']):
+                gameResults.append(gameResult)
+
+    if (len(gameResults) > 0):
+        scores = [gameResult['score'] for gameResult in gameResults]
+        wins = [gameResult['win'] for gameResult in gameResults]
+        winRate = wins.count(True) / float(len(wins))
+        logging.info('Average Score: %s', sum(scores) / float(len(scores)))
+        logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
+        logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
+        logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
+
+    return gameResults
+
+def getRecordPath(record, numGames, gameIndex):
+    """
+    Get the path to record a game's replay to.
+    When recording more than one game, the game's index is added to the path.
+    """
+
+    path = DEFAULT_REPLAY_PATH
+    if (isinstance(record, str)):
+        path = record
+
+    if (numGames > 1):
+        path = '%s.%d' % (path, gameIndex)
+
+    return path
+
+def _getGameResult(game, layoutName, gameIndex, gameSeed, isTraining):
+    gameResult = {
+        'game': gameIndex,
+        'seed': gameSeed,
+        'layout': layoutName,
+        'training': isTraining,
+        'win': game.state.isWin(),
+    }
+    gameResult.update(game.getResults())
+
+    return gameResult
+
+def _playGame(layout, layoutName, pacman, ghosts, catchExceptions, timeout, turbo, record,
+        keyframeInterval, numGames, gameIndex, gameSeed):
+    """
+    Play a single headless game in a worker process.
+    """
+
+    random.seed(gameSeed)
+
+    display = None
+    if (not turbo):
+        display = PacmanNullView()
+
+    rules = ClassicGameRules(timeout)
+    return _playRecordedGame(rules, layout, layoutName, pacman, ghosts, display,
+            catchExceptions, turbo, record, keyframeInterval, numGames, gameIndex, gameSeed, False)
+
+def _playGames(layout, layoutName, pacman, ghosts, display, numGames, numTraining,
+        catchExceptions, timeout, turbo, record, keyframeInterval, seed):
+    """
+    Play games one after another in this process,
+    yielding each game's result as soon as it finishes.
+    """
+
     rules = ClassicGameRules(timeout)
-    games = []
 
     nullView = None
     if (numTraining > 0):
         logging.info('Playing %d training games.' % numTraining)
-        nullView = PacmanNullView()
+        if (not turbo):
+            nullView = PacmanNullView()
 
     for i in range(numGames):
         isTraining = (i < numTraining)
@@ -530,31 +668,46 @@ def runGames(layout, pacman, ghosts, display, numGames, record = None, numTraini
         else:
             gameDisplay = display
 
-        game = rules.newGame(layout, pacman, ghosts, gameDisplay, catchExceptions)
-        game.run()
+        gameSeed = None
+        if (seed is not None):
+            gameSeed = parallel.getGameSeed(seed, i)
+            random.seed(gameSeed)
 
-        if (not isTraining):
-            games.append(game)
+        yield _playRecordedGame(rules, layout, layoutName, pacman, ghosts, gameDisplay,
+                catchExceptions, turbo, record, keyframeInterval, numGames, i, gameSeed,
+                isTraining)
 
-        if (record):
-            path = 'pacman.replay'
-            if (isinstance(record, str)):
-                path = record
+def _playRecordedGame(rules, layout, layoutName, pacman, ghosts, display, catchExceptions, turbo,
+        record, keyframeInterval, numGames, gameIndex, gameSeed, isTraining):
+    """
+    Play a game (streaming it to a replay if we are recording) and return its result.
+    """
 
-            components = {'layout': layout, 'actions': game.moveHistory}
-            with open(path, 'wb') as file:
-                pickle.dump(components, file)
+    replayWriter = None
+    if (record):
+        header = {
+            'gameType': 'pacman',
+            'layout': layout.layoutText,
+            'layoutName': layoutName,
+            'maxGhosts': layout.getNumGhosts(),
+            'seed': gameSeed,
+            'agents': [agent.__class__.__name__ for agent in [pacman] + ghosts],
+        }
 
-    if ((numGames - numTraining) > 0):
-        scores = [game.state.getScore() for game in games]
-        wins = [game.state.isWin() for game in games]
-        winRate = wins.count(True) / float(len(wins))
-        logging.info('Average Score: %s', sum(scores) / float(len(scores)))
-        logging.info('Scores:        %s', ', '.join([str(score) for score in scores]))
-        logging.info('Win Rate:      %d/%d (%.2f)' % (wins.count(True), len(wins), winRate))
-        logging.info('Record:        %s', ', '.join([['Loss', 'Win'][int(w)] for w in wins]))
+        path = getRecordPath(record, numGames, gameIndex)
+        replayWriter = ReplayWriter(path, header, keyframeInterval)
+
+    game = rules.newGame(layout, pacman, ghosts, display, catchExceptions, turbo,
+            replayWriter = replayWriter)
+    game.run()
 
-    return games
+    gameResult = _getGameResult(game, layoutName, gameIndex, gameSeed, isTraining)
+
+    if (replayWriter is not None):
+        replayWriter.close(gameResult)
+        logging.info("Game recorded to: '%s'." % (path))
+
+    return gameResult
 
 def main(argv):
     """
@@ -571,12 +724,14 @@ def main(argv):
     if (args['gameToReplay'] is not None):
         logging.info('Replaying recorded game %s.' % args['gameToReplay'])
 
-        recorded = None
-        with open(args['gameToReplay'], 'rb') as file:
-            recorded = pickle.load(file)
+        reader = ReplayReader(args['gameToReplay'])
+
+        startState = None
+        if (args['replayStart'] > 0):
+            startState = getReplayState(reader, args['replayStart'])
 
-        recorded['display'] = args['display']
-        replayGame(**recorded)
+        replayGame(reader.getLayout(), reader.moves(args['replayStart']), args['display'],
+                startState = startState)
 
         return
 
@@ -0,0 +1,190 @@
+"""
+Measure how long it takes to get ready to play a game:
+importing pacai and creating the different kinds of views.
+Each measurement is run in a fresh Python process (so nothing is already imported or loaded),
+and the median time over all the runs is reported.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import textwrap
+
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# Each benchmark is some code to time, and is run on its own (after the setup).
+BENCHMARKS = [
+    ('import pacman', '', 'import pacai.bin.pacman'),
+    ('import capture', '', 'import pacai.bin.capture'),
+    (
+        'pacman null view',
+        'from pacai.ui.pacman.null import PacmanNullView',
+        'PacmanNullView()',
+    ),
+    (
+        'pacman text view',
+        'from pacai.ui.pacman.text import PacmanTextView',
+        'PacmanTextView()',
+    ),
+    (
+        'capture null view',
+        'from pacai.ui.capture.null import CaptureNullView',
+        'CaptureNullView()',
+    ),
+    (
+        'capture text view',
+        'from pacai.ui.capture.text import CaptureTextView',
+        'CaptureTextView()',
+    ),
+    (
+        'view assets (for images)',
+        'from pacai.ui.pacman.null import PacmanNullView',
+        'view = PacmanNullView(); view._getSprites(); view._getFont()',
+    ),
+]
+
+BENCHMARK_TEMPLATE = """
+import json
+import sys
+import time
+
+%s
+
+start = time.perf_counter()
+%s
+seconds = time.perf_counter() - start
+
+print(json.dumps({'seconds': seconds, 'pil': ('PIL' in sys.modules)}))
+"""
+
+def formatResults(results):
+    """
+    Get a printable table of benchmark results.
+    """
+
+    nameWidth = max([len('Benchmark')] + [len(result['name']) for result in results])
+
+    rowFormat = '%-' + str(nameWidth) + 's  %12s  %10s'
+    lines = [rowFormat % ('Benchmark', 'Median (ms)', 'Loads PIL')]
+
+    for result in results:
+        lines.append(rowFormat % (result['name'], '%.2f' % (result['seconds'] * 1000.0),
+                result['pil']))
+
+    return '\n'.join(lines)
+
+def readCommand(argv):
+    """
+    Processes the command used to run the startup benchmarks from the command line.
+    """
+
+    description = """
+    DESCRIPTION:
+        This program will measure how long pacai takes to start up:
+        importing the games and creating each kind of view.
+        Every measurement is made in a fresh Python process.
+
+    EXAMPLES:
+        (1) python -m pacai.bin.startup
+          - Runs every benchmark a few times and reports the median time.
+        (2) python -m pacai.bin.startup --runs 20
+          - Runs every benchmark twenty times.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+            prog = os.path.basename(__file__), formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-d', '--debug', dest = 'debug',
+            action = 'store_true', default = False,
+            help = 'set logging level to debug (default: %(default)s)')
+
+    parser.add_argument('-q', '--quiet', dest = 'quiet',
+            action = 'store_true', default = False,
+            help = 'set logging level to warning (default: %(default)s)')
+
+    parser.add_argument('-r', '--runs', dest = 'runs',
+            action = 'store', type = int, default = 5,
+            help = 'run each benchmark this many times (default: %(default)s)')
+
+    options, otherjunk = parser.parse_known_args(argv)
+
+    if len(otherjunk) != 0:
+        raise ValueError('Unrecognized options: \'%s\'.' % (str(otherjunk)))
+
+    if options.quiet and options.debug:
+        raise ValueError('Logging cannont be set to both debug and quiet.')
+
+    if options.quiet:
+        updateLoggingLevel(logging.WARNING)
+    elif options.debug:
+        updateLoggingLevel(logging.DEBUG)
+
+    if (options.runs < 1):
+        raise ValueError('The number of runs must be positive, found: %d.' % (options.runs))
+
+    return {
+        'runs': options.runs,
+    }
+
+def runBenchmark(setup, code, runs):
+    """
+    Time the code (after the setup) in a fresh process, runs times.
+    Returns the median time (in seconds), and if PIL was imported by the end.
+    """
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT_DIR] + [path for path in
+            env.get('PYTHONPATH', '').split(os.pathsep) if (path != '')])
+
+    times = []
+    loadsPIL = False
+
+    for i in range(runs):
+        output = subprocess.run([sys.executable, '-c', BENCHMARK_TEMPLATE % (setup, code)],
+                env = env, check = True, stdout = subprocess.PIPE).stdout
+
+        result = json.loads(output.decode('utf-8').strip().splitlines()[-1])
+        times.append(result['seconds'])
+        loadsPIL = loadsPIL or result['pil']
+
+    return statistics.median(times), loadsPIL
+
+def runBenchmarks(runs, **kwargs):
+    """
+    Run all the startup benchmarks, and return the results:
+    [{'name': ..., 'seconds': ..., 'pil': ...}, ...].
+    """
+
+    results = []
+    for (name, setup, code) in BENCHMARKS:
+        seconds, loadsPIL = runBenchmark(setup, code, runs)
+        results.append({'name': name, 'seconds': seconds, 'pil': loadsPIL})
+
+        logging.debug('%s: %.2f ms' % (name, seconds * 1000.0))
+
+    return results
+
+def main(argv):
+    """
+    Entry point for the startup benchmarks.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    options = readCommand(argv)
+    results = runBenchmarks(**options)
+
+    logging.info('Startup times:\n%s' % (formatResults(results)))
+
+    return results
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
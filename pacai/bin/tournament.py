@@ -0,0 +1,290 @@
+"""
+A round robin tournament between capture teams.
+Every pair of teams plays on every layout, once with each team as red (and once as blue).
+Games are played headless with the normal capture timeouts enforced,
+and can be spread over a pool of processes.
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import random
+import sys
+import textwrap
+
+from pacai.bin import capture
+from pacai.core import distanceCalculator
+from pacai.util import parallel
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+from pacai.util.mazeGenerator import MAX_DIFFERENT_MAZES
+
+POINTS_WIN = 3
+POINTS_TIE = 1
+
+def getStandings(teams, results):
+    """
+    Total up the results of a tournament into a list of standings (best team first).
+    Each standing is a dict with the team, points, wins, losses, ties, crashes, games,
+    and the team's total score (from its own point of view).
+    """
+
+    standings = {}
+    for team in teams:
+        standings[team] = {
+            'team': team,
+            'points': 0,
+            'wins': 0,
+            'losses': 0,
+            'ties': 0,
+            'crashes': 0,
+            'games': 0,
+            'score': 0,
+        }
+
+    for (redTeam, blueTeam, layoutName, score, crashed) in results:
+        for (team, teamScore) in ((redTeam, score), (blueTeam, -score)):
+            standing = standings[team]
+            standing['games'] += 1
+            standing['score'] += teamScore
+
+            if (teamScore > 0):
+                standing['wins'] += 1
+                standing['points'] += POINTS_WIN
+            elif (teamScore < 0):
+                standing['losses'] += 1
+
+                # A crash always loses.
+                if (crashed):
+                    standing['crashes'] += 1
+            else:
+                standing['ties'] += 1
+                standing['points'] += POINTS_TIE
+
+    return sorted(standings.values(), key = lambda standing: (-standing['points'],
+            -standing['score'], standing['team']))
+
+def formatStandings(standings):
+    """
+    Get a printable table of standings.
+    """
+
+    teamWidth = max([len('Team')] + [len(standing['team']) for standing in standings])
+
+    rowFormat = '%4s  %-' + str(teamWidth) + 's  %6s  %4s  %6s  %4s  %7s  %5s  %9s'
+    lines = [rowFormat % ('Rank', 'Team', 'Points', 'Wins', 'Losses', 'Ties', 'Crashes',
+            'Games', 'Avg Score')]
+
+    for (rank, standing) in enumerate(standings):
+        averageScore = standing['score'] / max(1, standing['games'])
+        row = [rank + 1]
+        row += [standing[key] for key in ('team', 'points', 'wins', 'losses', 'ties', 'crashes',
+                'games')]
+        row.append('%.2f' % (averageScore))
+
+        lines.append(rowFormat % tuple(row))
+
+    return '\n'.join(lines)
+
+def getSchedule(teams, layoutNames, numGames):
+    """
+    Get every game in a round robin: (red team, blue team, layout name).
+    """
+
+    schedule = []
+
+    for (team1, team2) in itertools.combinations(teams, 2):
+        for layoutName in layoutNames:
+            for (redTeam, blueTeam) in ((team1, team2), (team2, team1)):
+                for i in range(numGames):
+                    schedule.append((redTeam, blueTeam, layoutName))
+
+    return schedule
+
+def readCommand(argv):
+    """
+    Processes the command used to run a tournament from the command line.
+    """
+
+    description = """
+    DESCRIPTION:
+        This program will run a round robin tournament of capture teams.
+        Each pair of teams plays on every layout, with each team playing as both red and blue.
+        Teams are modules with a createTeam function (see pacai.core.baselineTeam).
+
+    EXAMPLES:
+        (1) python -m pacai.bin.tournament --teams pacai.core.baselineTeam pacai.student.myTeam
+          - Plays the baseline team against pacai.student.myTeam on defaultCapture.
+        (2) python -m pacai.bin.tournament --teams A B C --layouts defaultCapture RANDOM13 --jobs 8
+          - Plays a three team tournament on two layouts with eight processes.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+            prog = os.path.basename(__file__), formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('-d', '--debug', dest = 'debug',
+            action = 'store_true', default = False,
+            help = 'set logging level to debug (default: %(default)s)')
+
+    parser.add_argument('-l', '--layouts', dest = 'layouts',
+            action = 'store', type = str, nargs = '+', default = ['defaultCapture'],
+            help = 'play on these layouts, RANDOM<seed> generates a maze (default: %(default)s)')
+
+    parser.add_argument('-n', '--num-games', dest = 'numGames',
+            action = 'store', type = int, default = 1,
+            help = 'games per pair of teams, layout, and color (default: %(default)s)')
+
+    parser.add_argument('-q', '--quiet', dest = 'quiet',
+            action = 'store_true', default = False,
+            help = 'set logging level to warning (default: %(default)s)')
+
+    parser.add_argument('-s', '--seed', dest = 'seed',
+            action = 'store', type = int, default = None,
+            help = 'seed the tournament, so it can be played again exactly')
+
+    parser.add_argument('-t', '--teams', dest = 'teams',
+            action = 'store', type = str, nargs = '+', required = True,
+            help = 'the team modules to play against each other')
+
+    parser.add_argument('--distance-cache', dest = 'distanceCache',
+            action = 'store', type = str, default = None,
+            help = 'save and load maze distances in this directory (default: the value of $%s)'
+                % (distanceCalculator.CACHE_DIR_ENV_VAR))
+
+    parser.add_argument('--jobs', dest = 'jobs',
+            action = 'store', type = int, default = 1,
+            help = 'play games in parallel with this many processes (default: %(default)s)')
+
+    parser.add_argument('--max-moves', dest = 'maxMoves',
+            action = 'store', type = int, default = 1200,
+            help = 'set maximum number of moves in a game (default: %(default)s)')
+
+    parser.add_argument('--output', dest = 'output',
+            action = 'store', type = str, default = None,
+            help = 'also write the results table to this file (default: %(default)s)')
+
+    options, otherjunk = parser.parse_known_args(argv)
+
+    if len(otherjunk) != 0:
+        raise ValueError('Unrecognized options: \'%s\'.' % (str(otherjunk)))
+
+    if options.quiet and options.debug:
+        raise ValueError('Logging cannont be set to both debug and quiet.')
+
+    if options.quiet:
+        updateLoggingLevel(logging.WARNING)
+    elif options.debug:
+        updateLoggingLevel(logging.DEBUG)
+
+    if (len(set(options.teams)) != len(options.teams)):
+        raise ValueError('Each team can only be entered once.')
+
+    if (len(options.teams) < 2):
+        raise ValueError('A tournament needs at least two teams.')
+
+    if (options.jobs < 1):
+        raise ValueError('The number of jobs must be positive, found: %d.' % (options.jobs))
+
+    seed = options.seed
+    if seed is None:
+        seed = random.randint(0, 2**32)
+    random.seed(seed)
+    logging.debug('Seed value: ' + str(seed))
+
+    # Every game on a random layout should be on the same maze.
+    layoutNames = []
+    for layoutName in options.layouts:
+        if (layoutName == 'RANDOM'):
+            layoutName = 'RANDOM%d' % (random.randint(1, MAX_DIFFERENT_MAZES))
+
+        # Fail early on bad layouts.
+        capture.loadLayout(layoutName)
+        layoutNames.append(layoutName)
+
+    if (options.distanceCache is not None):
+        distanceCalculator.setCacheDir(options.distanceCache)
+
+    return {
+        'teams': options.teams,
+        'layoutNames': layoutNames,
+        'length': options.maxMoves,
+        'numGames': options.numGames,
+        'jobs': options.jobs,
+        'seed': seed,
+        'output': options.output,
+    }
+
+def runTournament(teams, layoutNames, length, numGames, jobs, seed, **kwargs):
+    """
+    Play every game in the tournament and return the results:
+    (red team, blue team, layout name, final score, if an agent crashed or timed out).
+    """
+
+    schedule = getSchedule(teams, layoutNames, numGames)
+    logging.info('Playing %d games with %d job(s).' % (len(schedule), jobs))
+
+    tasks = []
+    for (i, (redTeam, blueTeam, layoutName)) in enumerate(schedule):
+        tasks.append((redTeam, blueTeam, layoutName, length, parallel.getGameSeed(seed, i)))
+
+    outcomes = parallel.runInPool(_playGame, tasks, jobs)
+
+    results = []
+    for ((redTeam, blueTeam, layoutName), (score, crashed)) in zip(schedule, outcomes):
+        logging.debug('%s (red) vs %s (blue) on %s: %d' % (redTeam, blueTeam, layoutName, score))
+        results.append((redTeam, blueTeam, layoutName, score, crashed))
+
+    return results
+
+def _loadTeam(isRed, team):
+    try:
+        return capture.loadAgents(isRed, team, True, {})
+    except Exception:
+        # A team that can't be loaded forfeits (the game treats missing agents as crashes).
+        logging.warning('Could not load team: %s.' % (team), exc_info = True)
+        return [None, None]
+
+def _playGame(redTeam, blueTeam, layoutName, length, gameSeed):
+    """
+    Play a single game of the tournament (possibly in a worker process).
+    Returns the final score and if an agent crashed (or timed out).
+    """
+
+    random.seed(gameSeed)
+
+    layout = capture.loadLayout(layoutName)
+    redAgents = _loadTeam(True, redTeam)
+    blueAgents = _loadTeam(False, blueTeam)
+
+    # Agents are interleaved: red, blue, red, blue.
+    agents = [redAgents[0], blueAgents[0], redAgents[1], blueAgents[1]]
+
+    rules = capture.CaptureRules()
+    game = rules.newGame(layout, agents, None, length, True, turbo = True)
+    game.run()
+
+    return game.state.getScore(), game.agentCrashed
+
+def main(argv):
+    """
+    Entry point for a tournament.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    options = readCommand(argv)
+    results = runTournament(**options)
+
+    table = formatStandings(getStandings(options['teams'], results))
+    logging.info('Results:\n%s' % (table))
+
+    if (options['output'] is not None):
+        with open(options['output'], 'w') as file:
+            file.write(table + '\n')
+
+    return results
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,270 @@
+"""
+Re-simulate recorded games (see `pacai.core.replay`) and check that they still end the same way.
+Every replay's moves are played again (headless, with no agents) with the current rules,
+and the final score, winner, and number of moves are compared against the replay's footer.
+A mismatch usually means that the game rules have changed since the game was recorded.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import textwrap
+
+from pacai.bin import capture
+from pacai.bin import pacman
+from pacai.core import replay
+from pacai.util import parallel
+from pacai.util.logs import initLogging
+from pacai.util.logs import updateLoggingLevel
+from pacai.util.results import ResultsWriter
+
+def findReplays(paths):
+    """
+    Get every replay file in the given paths.
+    Directories are searched recursively (for files that start with the replay magic),
+    and files are always included.
+    """
+
+    replayPaths = []
+
+    for path in paths:
+        if (not os.path.isdir(path)):
+            replayPaths.append(path)
+            continue
+
+        for (dirPath, dirNames, fileNames) in os.walk(path):
+            dirNames.sort()
+
+            for fileName in sorted(fileNames):
+                filePath = os.path.join(dirPath, fileName)
+                if (_isReplay(filePath)):
+                    replayPaths.append(filePath)
+
+    return replayPaths
+
+def formatReport(reports):
+    """
+    Get a printable summary of verification reports.
+    """
+
+    failed = [report for report in reports if not report['ok']]
+
+    lines = ['Verified %d replay(s): %d ok, %d failed.' %
+            (len(reports), len(reports) - len(failed), len(failed))]
+
+    for report in failed:
+        lines.append('%s:' % (report['path']))
+        for mismatch in report['mismatches']:
+            lines.append('    %s' % (mismatch))
+
+    return '\n'.join(lines)
+
+def readCommand(argv):
+    """
+    Processes the command used to verify replays from the command line.
+    """
+
+    description = """
+    DESCRIPTION:
+        This program will re-simulate recorded games and make sure that each one
+        still ends with the same score, winner, and number of moves.
+        Both pacman and capture replays are supported.
+
+    EXAMPLES:
+        (1) python -m pacai.bin.verify_replays replays/
+          - Verifies every replay in the replays directory (and its subdirectories).
+        (2) python -m pacai.bin.verify_replays --jobs 8 --results report.jsonl replays/
+          - Verifies replays with eight processes, and writes a report for each replay.
+    """
+
+    parser = argparse.ArgumentParser(description = textwrap.dedent(description),
+            prog = os.path.basename(__file__), formatter_class = argparse.RawTextHelpFormatter)
+
+    parser.add_argument('paths', metavar = 'PATH',
+            action = 'store', type = str, nargs = '+',
+            help = 'replay files, or directories to search for replay files')
+
+    parser.add_argument('-d', '--debug', dest = 'debug',
+            action = 'store_true', default = False,
+            help = 'set logging level to debug (default: %(default)s)')
+
+    parser.add_argument('-q', '--quiet', dest = 'quiet',
+            action = 'store_true', default = False,
+            help = 'set logging level to warning (default: %(default)s)')
+
+    parser.add_argument('--jobs', dest = 'jobs',
+            action = 'store', type = int, default = 1,
+            help = 'verify replays in parallel with this many processes (default: %(default)s)')
+
+    parser.add_argument('--results', dest = 'results',
+            action = 'store', type = str, default = None,
+            help = 'write the report for every replay to this file as JSON Lines,\n'
+                + 'use - for stdout (default: %(default)s)')
+
+    options, otherjunk = parser.parse_known_args(argv)
+
+    if len(otherjunk) != 0:
+        raise ValueError('Unrecognized options: \'%s\'.' % (str(otherjunk)))
+
+    if options.quiet and options.debug:
+        raise ValueError('Logging cannont be set to both debug and quiet.')
+
+    if options.quiet:
+        updateLoggingLevel(logging.WARNING)
+    elif options.debug:
+        updateLoggingLevel(logging.DEBUG)
+
+    if (options.jobs < 1):
+        raise ValueError('The number of jobs must be positive, found: %d.' % (options.jobs))
+
+    return {
+        'paths': options.paths,
+        'jobs': options.jobs,
+        'results': options.results,
+    }
+
+def verifyReplay(path):
+    """
+    Re-simulate a single replay (possibly in a worker process) and return a report:
+    a JSON friendly dict with the path, if the replay is ok, and a list of mismatches.
+    """
+
+    report = {
+        'path': path,
+        'ok': False,
+        'gameType': None,
+        'mismatches': [],
+    }
+
+    try:
+        reader = replay.ReplayReader(path)
+        report['gameType'] = reader.getHeader().get('gameType')
+
+        report['mismatches'] = _verify(reader)
+    except Exception as ex:
+        logging.debug('Could not verify replay: %s.' % (path), exc_info = True)
+        report['mismatches'].append('Could not verify replay: %s: %s.' %
+                (ex.__class__.__name__, str(ex)))
+
+    report['ok'] = (len(report['mismatches']) == 0)
+    return report
+
+def verifyReplays(paths, jobs = 1, results = None, **kwargs):
+    """
+    Verify every replay in the paths (see findReplays()) and return the reports
+    (see verifyReplay()).
+    If results is given (a path, or '-' for stdout),
+    each report is written there (as JSON Lines) as soon as it is ready.
+    """
+
+    replayPaths = findReplays(paths)
+    logging.info('Verifying %d replay(s) with %d job(s).' % (len(replayPaths), jobs))
+
+    tasks = [(replayPath,) for replayPath in replayPaths]
+
+    reports = []
+    with ResultsWriter(results) as writer:
+        for report in parallel.iterateInPool(verifyReplay, tasks, jobs):
+            writer.write(report)
+            reports.append(report)
+
+            if (not report['ok']):
+                logging.warning('Replay failed verification: %s.' % (report['path']))
+
+    return reports
+
+def _isReplay(path):
+    with open(path, 'rb') as file:
+        return file.read(len(replay.MAGIC)) == replay.MAGIC
+
+def _newGame(reader):
+    """
+    Get a game with the replay's initial state and rules.
+    The game has no agents (or display), it is only used to check when the game ends.
+    """
+
+    header = reader.getHeader()
+    layout = reader.getLayout()
+    gameType = header.get('gameType')
+
+    if (gameType == 'capture'):
+        agents = [None] * len(header['agents'])
+        return capture.CaptureRules().newGame(layout, agents, None, header['length'], False)
+    elif (gameType == 'pacman'):
+        ghosts = [None] * layout.getNumGhosts()
+        return pacman.ClassicGameRules().newGame(layout, None, ghosts, None)
+
+    raise ValueError('Unknown game type: %s.' % (gameType))
+
+def _verify(reader):
+    """
+    Play out the replay and get a list of the ways it differs from its footer.
+    """
+
+    footer = reader.getFooter()
+    if (footer is None):
+        return ['The replay was cut off (it has no footer).']
+
+    mismatches = []
+
+    game = _newGame(reader)
+    state = game.state
+    numMoves = 0
+
+    for (agentIndex, action) in reader.moves():
+        if (game.gameOver):
+            mismatches.append('The game ended after %d moves, but more moves were recorded.' %
+                    (numMoves))
+            break
+
+        try:
+            state = state.generateSuccessor(agentIndex, action)
+        except Exception as ex:
+            mismatches.append('Move %d (agent %d, %s) could not be played: %s.' %
+                    (numMoves, agentIndex, action, str(ex)))
+            break
+
+        numMoves += 1
+        game.rules.process(state, game)
+
+    if (numMoves != footer['numMoves']):
+        mismatches.append('Expected %d moves, played %d.' % (footer['numMoves'], numMoves))
+
+    # Games that crashed (or timed out) end early, and the rules decide the score.
+    if (footer.get('crashed', False)):
+        return mismatches
+
+    if (not game.gameOver):
+        mismatches.append('The game did not end after %d moves.' % (numMoves))
+
+    if ('score' in footer and state.getScore() != footer['score']):
+        mismatches.append('Expected a score of %s, got %s.' % (footer['score'], state.getScore()))
+
+    if ('winner' in footer and capture.getWinner(state.getScore()) != footer['winner']):
+        mismatches.append('Expected the winner to be %s, got %s.' %
+                (footer['winner'], capture.getWinner(state.getScore())))
+
+    if ('win' in footer and state.isWin() != footer['win']):
+        mismatches.append('Expected win to be %s, got %s.' % (footer['win'], state.isWin()))
+
+    return mismatches
+
+def main(argv):
+    """
+    Entry point for verifying replays.
+    The args are a blind pass of `sys.argv` with the executable stripped.
+    """
+
+    initLogging()
+
+    options = readCommand(argv)
+    reports = verifyReplays(**options)
+
+    logging.info(formatReport(reports))
+
+    return reports
+
+if __name__ == '__main__':
+    reports = main(sys.argv[1:])
+    sys.exit(int(not all([report['ok'] for report in reports])))
@@ -1,3 +1,4 @@
+from pacai.core import zobrist
 from pacai.core.actions import Actions
 from pacai.core.directions import Directions
 from pacai.util import util
@@ -9,9 +10,12 @@ class AgentState:
     The convention for positions, like a graph, is that (0, 0) is the lower left corner,
     x increases horizontally and y increases vertically.
     Therefore, north is the direction of increasing y, or (0, 1).
+
+    When given `pacai.core.zobrist.ZobristKeys`, an agent state keeps its own Zobrist hash
+    up-to-date as it changes (see `AgentState.getZobristHash`).
     """
 
-    def __init__(self, position, direction, isPacman):
+    def __init__(self, position, direction, isPacman, index = 0, zobristKeys = None):
         # Save the starting information for later use.
         self._startPosition = position
         self._startDirection = direction
@@ -23,18 +27,42 @@ class AgentState:
         self._isPacman = isPacman
         self._scaredTimer = 0
 
-    def copy(self):
-        state = AgentState(self._startPosition, self._startDirection, self._startIsPacman)
+        self._index = index
+        self._zobristKeys = zobristKeys
+        self._zobrist = 0
+
+        if (zobristKeys is not None):
+            self._zobrist = (zobristKeys.agent(index, zobrist.AGENT_POSITION, position)
+                    ^ zobristKeys.agent(index, zobrist.AGENT_DIRECTION, direction)
+                    ^ zobristKeys.agent(index, zobrist.AGENT_IS_PACMAN, isPacman)
+                    ^ zobristKeys.agent(index, zobrist.AGENT_SCARED_TIMER, 0))
 
-        state._isPacman = self._isPacman
-        state._position = self._position
-        state._direction = self._direction
-        state._scaredTimer = self._scaredTimer
+    def copy(self):
+        # Skip the constructor, every field (including the hash) is copied directly.
+        state = AgentState.__new__(AgentState)
+        state.__dict__.update(self.__dict__)
 
         return state
 
     def decrementScaredTimer(self):
-        self._scaredTimer = max(0, self._scaredTimer - 1)
+        self._setScaredTimer(max(0, self._scaredTimer - 1))
+
+    def deserialize(self, data):
+        """
+        Get a copy of this agent state with the values from `AgentState.serialize`.
+        """
+
+        position, direction, isPacman, scaredTimer = data
+        if (position is not None):
+            position = tuple(position)
+
+        state = self.copy()
+        state._setPosition(position)
+        state._setDirection(direction)
+        state.setIsPacman(isPacman)
+        state._setScaredTimer(scaredTimer)
+
+        return state
 
     def getDirection(self):
         return self._direction
@@ -48,6 +76,14 @@ class AgentState:
     def getScaredTimer(self):
         return self._scaredTimer
 
+    def getZobristHash(self):
+        """
+        Get the Zobrist hash of this agent's current position, direction, type, and scared timer.
+        This is 0 if this state was not given any keys.
+        """
+
+        return self._zobrist
+
     def isBraveGhost(self):
         """
         A ghost that is not scared.
@@ -68,27 +104,41 @@ class AgentState:
         return (self.isGhost() and self.isScared())
 
     def setIsPacman(self, isPacman):
+        if (self._zobristKeys is not None and isPacman != self._isPacman):
+            self._updateZobrist(zobrist.AGENT_IS_PACMAN, self._isPacman, isPacman)
+
         self._isPacman = isPacman
 
+    def serialize(self):
+        """
+        Get the parts of this agent that can change as the game is played as a JSON friendly list.
+        """
+
+        position = self._position
+        if (position is not None):
+            position = list(position)
+
+        return [position, self._direction, self._isPacman, self._scaredTimer]
+
     def setScaredTimer(self, timer):
-        self._scaredTimer = timer
+        self._setScaredTimer(timer)
 
     def snapToNearestPoint(self):
         """
         Move the agent to the nearest point to its current location.
         """
 
-        self._position = util.nearestPoint(self._position)
+        self._setPosition(util.nearestPoint(self._position))
 
     def respawn(self):
         """
         This agent was killed, respawn it at the start as a pacman.
         """
 
-        self._position = self._startPosition
-        self._direction = self._startDirection
-        self._isPacman = self._startIsPacman
-        self._scaredTimer = 0
+        self._setPosition(self._startPosition)
+        self._setDirection(self._startDirection)
+        self.setIsPacman(self._startIsPacman)
+        self._setScaredTimer(0)
 
     def updatePosition(self, vector):
         """
@@ -98,12 +148,55 @@ class AgentState:
         x, y = self._position
         dx, dy = vector
 
-        self._position = (x + dx, y + dy)
+        self._setPosition((x + dx, y + dy))
 
         direction = Actions.vectorToDirection(vector)
         if (direction != Directions.STOP):
             # If this is a zero vector, face the same direction as before.
-            self._direction = direction
+            self._setDirection(direction)
+
+    def _getUndoRecord(self):
+        """
+        Get the parts of this agent that can change as the game is played.
+        See `pacai.core.gamestate.AbstractGameState.applyAction`.
+        """
+
+        return (self._position, self._direction, self._isPacman, self._scaredTimer, self._zobrist)
+
+    def _restoreUndoRecord(self, record):
+        position, direction, isPacman, scaredTimer, zobristHash = record
+
+        self._position = position
+        self._direction = direction
+        self._isPacman = isPacman
+        self._scaredTimer = scaredTimer
+        self._zobrist = zobristHash
+
+    def _setDirection(self, direction):
+        if (self._zobristKeys is not None and direction != self._direction):
+            self._updateZobrist(zobrist.AGENT_DIRECTION, self._direction, direction)
+
+        self._direction = direction
+
+    def _setPosition(self, position):
+        if (self._zobristKeys is not None and position != self._position):
+            self._updateZobrist(zobrist.AGENT_POSITION, self._position, position)
+
+        self._position = position
+
+    def _setScaredTimer(self, timer):
+        if (self._zobristKeys is not None and timer != self._scaredTimer):
+            self._updateZobrist(zobrist.AGENT_SCARED_TIMER, self._scaredTimer, timer)
+
+        self._scaredTimer = timer
+
+    def _updateZobrist(self, field, oldValue, newValue):
+        """
+        Swap the key for the old value of a field with the key for the new value.
+        """
+
+        self._zobrist ^= (self._zobristKeys.agent(self._index, field, oldValue)
+                ^ self._zobristKeys.agent(self._index, field, newValue))
 
     def __eq__(self, other):
         if (other is None):
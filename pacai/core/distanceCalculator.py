@@ -1,10 +1,32 @@
-import sys
+import array
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
 
 from pacai.core.distance import manhattan
-from pacai.util import priorityQueue
 
 DEFAULT_DISTANCE = 10000
 
+# If set, maze distances are saved to (and loaded from) this directory.
+CACHE_DIR_ENV_VAR = 'PACAI_DISTANCE_CACHE'
+
+CACHE_FILE_EXTENSION = '.dist'
+CACHE_MAGIC = b'PACDIST\0'
+CACHE_VERSION = 1
+
+# Cache files are written in native byte order, this mark catches files from another machine.
+CACHE_BYTE_ORDER_MARK = 0x01020304
+
+# Magic, version, byte order mark, width, height, number of open cells, and padding
+# (so the tables that follow are aligned).
+CACHE_HEADER = struct.Struct('=8sIIIIII')
+
+# Marks a pair of positions with no path between them in a DistanceMatrix.
+UNREACHABLE = 0xFFFF
+
 class Distancer(object):
     """
     A class for computing and caching the shortest path between any two points in a given maze.
@@ -48,11 +70,7 @@ class Distancer(object):
         return bestDistance
 
     def getDistanceOnGrid(self, pos1, pos2):
-        key = (pos1, pos2)
-        if key in self._distances:
-            return self._distances[key]
-
-        raise Exception("Position not in grid: " + str(key))
+        return self._distances.getDistance(pos1, pos2)
 
     def isReadyForMazeDistance(self):
         return (self._distances is not None)
@@ -78,79 +96,257 @@ def getGrids1D(x):
 # MACHINERY FOR COMPUTING MAZE DISTANCES #
 ##########################################
 
+# All the maze distances computed in this process, keyed by getLayoutKey().
+# Shared by every distancer (teammates, opponents, and later games on the same layout).
 distanceMap = {}
 
+_cacheDir = os.environ.get(CACHE_DIR_ENV_VAR) or None
+
+class DistanceMatrix(object):
+    """
+    All-pairs maze distances for a layout, stored compactly.
+
+    Every open position gets a dense index (cellIndexes maps x * height + y to that index,
+    or -1 for walls).
+    The distance between the positions with indexes i and j is distances[i * numCells + j].
+    Any indexable sequences work for the two tables (arrays, memoryviews, etc).
+    """
+
+    def __init__(self, width, height, numCells, cellIndexes, distances):
+        self._width = width
+        self._height = height
+        self._numCells = numCells
+        self._cellIndexes = cellIndexes
+        self._distances = distances
+
+    def getCellIndex(self, position):
+        """
+        Get the dense index of a position, or -1 if it is not an open position.
+        """
+
+        x, y = position
+        x = int(x)
+        y = int(y)
+
+        if (x < 0 or x >= self._width or y < 0 or y >= self._height):
+            return -1
+
+        return self._cellIndexes[x * self._height + y]
+
+    def getDistance(self, pos1, pos2):
+        """
+        Get the maze distance between two open positions.
+        Positions with no path between them are DEFAULT_DISTANCE apart.
+        Raises a LookupError if either position is not open.
+        """
+
+        index1 = self.getCellIndex(pos1)
+        index2 = self.getCellIndex(pos2)
+
+        if (index1 < 0 or index2 < 0):
+            raise LookupError("Position not in grid: " + str((pos1, pos2)))
+
+        distance = self._distances[index1 * self._numCells + index2]
+        if (distance == UNREACHABLE):
+            return DEFAULT_DISTANCE
+
+        return distance
+
+    def getHeight(self):
+        return self._height
+
+    def getNumCells(self):
+        return self._numCells
+
+    def getWidth(self):
+        return self._width
+
+    def save(self, path):
+        """
+        Write these distances to a cache file that loadDistanceMatrix() can map back in.
+        The file is written to a temp file and then moved into place,
+        so other processes never see a partial file.
+        """
+
+        dirname = os.path.dirname(os.path.abspath(path))
+        header = CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, CACHE_BYTE_ORDER_MARK,
+                self._width, self._height, self._numCells, 0)
+
+        handle, tempPath = tempfile.mkstemp(dir = dirname, suffix = '.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                file.write(header)
+                file.write(array.array('i', self._cellIndexes))
+                file.write(array.array('H', self._distances))
+
+            # Temp files are private, but the cache is meant to be shared.
+            os.chmod(tempPath, 0o644)
+            os.replace(tempPath, path)
+        except BaseException:
+            os.remove(tempPath)
+            raise
+
 class DistanceCalculator:
     def __init__(self, layout, distancer):
         self.layout = layout
         self.distancer = distancer
-        self.cache = {}
 
     def run(self):
-        if self.layout.walls not in self.cache:
-            self.cache[self.layout.walls] = computeDistances(self.layout)
+        key = getLayoutKey(self.layout)
+        if (key not in distanceMap):
+            distanceMap[key] = getCachedDistances(self.layout, key)
 
-        self.distancer._distances = self.cache[self.layout.walls]
+        self.distancer._distances = distanceMap[key]
 
-def computeDistances(layout):
+def getCacheDir():
+    """
+    Get the directory that maze distances are persisted to, or None if they are not persisted.
     """
-    Runs UCS to all other positions from each position.
+
+    return _cacheDir
+
+def setCacheDir(path):
+    """
+    Persist maze distances to this directory (None turns off persisting).
+    Defaults to the value of the PACAI_DISTANCE_CACHE environment variable.
+    """
+
+    global _cacheDir
+    _cacheDir = path
+
+def getCachedDistances(layout, key):
+    """
+    Get the maze distances for a layout from the cache directory,
+    or compute them (and save them to the cache directory) if they are not there.
     """
 
-    distances = {}
-    allNodes = layout.walls.asList(False)
+    if (_cacheDir is None):
+        return computeDistances(layout)
+
+    path = os.path.join(_cacheDir, key + CACHE_FILE_EXTENSION)
+
+    if (os.path.isfile(path)):
+        try:
+            distances = loadDistanceMatrix(path)
+            if (distances.getWidth() == layout.width and distances.getHeight() == layout.height):
+                return distances
+
+            logging.warning('Distance cache file does not match its layout: %s' % (path))
+        except (OSError, ValueError) as ex:
+            logging.warning('Could not load distance cache file (%s): %s' % (path, ex))
+
+    distances = computeDistances(layout)
+
+    try:
+        os.makedirs(_cacheDir, exist_ok = True)
+        distances.save(path)
+    except OSError as ex:
+        logging.warning('Could not write distance cache file (%s): %s' % (path, ex))
+
+    return distances
+
+def loadDistanceMatrix(path):
+    """
+    Map a cache file written by DistanceMatrix.save() into memory.
+    The file is mapped read-only, so every process using the same file shares the same pages.
+    """
+
+    with open(path, 'rb') as file:
+        if (os.fstat(file.fileno()).st_size < CACHE_HEADER.size):
+            raise ValueError('Distance cache file is truncated.')
+
+        data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
 
-    for source in allNodes:
-        dist = {}
-        closed = {}
+    header = CACHE_HEADER.unpack_from(data)
+    magic, version, byteOrderMark, width, height, numCells, padding = header
 
-        for node in allNodes:
-            dist[node] = sys.maxsize
+    if (magic != CACHE_MAGIC):
+        raise ValueError('Not a distance cache file.')
 
-        queue = priorityQueue.PriorityQueue()
-        queue.push(source, 0)
-        dist[source] = 0
+    if (version != CACHE_VERSION or byteOrderMark != CACHE_BYTE_ORDER_MARK):
+        raise ValueError('Distance cache file is from an incompatible version or machine.')
 
-        while not queue.isEmpty():
-            node = queue.pop()
-            if node in closed:
+    cellIndexesStart = CACHE_HEADER.size
+    distancesStart = cellIndexesStart + (width * height * array.array('i').itemsize)
+    distancesEnd = distancesStart + (numCells * numCells * array.array('H').itemsize)
+
+    if (len(data) != distancesEnd):
+        raise ValueError('Distance cache file is the wrong size.')
+
+    view = memoryview(data)
+    cellIndexes = view[cellIndexesStart:distancesStart].cast('i')
+    distances = view[distancesStart:distancesEnd].cast('H')
+
+    return DistanceMatrix(width, height, numCells, cellIndexes, distances)
+
+def getLayoutKey(layout):
+    """
+    Get a key that identifies the walls of a layout.
+    Maze distances only depend on the walls, so any layouts with the same walls share a key.
+    The key is stable across processes.
+    """
+
+    return hashlib.sha1(str(layout.walls).encode()).hexdigest()
+
+def computeDistances(layout):
+    """
+    Runs a BFS to all other positions from each position.
+    Every move costs the same, so the first time BFS reaches a position is its shortest distance.
+    """
+
+    width = layout.width
+    height = layout.height
+
+    # Give every open position a dense index.
+    positions = layout.walls.asList(False)
+    cellIndexes = array.array('i', [-1]) * (width * height)
+    for (index, (x, y)) in enumerate(positions):
+        cellIndexes[x * height + y] = index
+
+    neighbors = []
+    for (x, y) in positions:
+        adjacent = []
+        for (dx, dy) in ((0, 1), (0, -1), (1, 0), (-1, 0)):
+            neighborX = x + dx
+            neighborY = y + dy
+
+            if (neighborX < 0 or neighborX >= width or neighborY < 0 or neighborY >= height):
                 continue
 
-            closed[node] = True
-            nodeDist = dist[node]
-            adjacent = []
-            x, y = node
+            neighborIndex = cellIndexes[neighborX * height + neighborY]
+            if (neighborIndex >= 0):
+                adjacent.append(neighborIndex)
 
-            if not layout.isWall((x, y + 1)):
-                adjacent.append((x, y + 1))
+        neighbors.append(adjacent)
 
-            if not layout.isWall((x, y - 1)):
-                adjacent.append((x, y - 1))
+    numCells = len(positions)
+    distances = array.array('H')
 
-            if not layout.isWall((x + 1, y)):
-                adjacent.append((x + 1, y))
+    for source in range(numCells):
+        row = [UNREACHABLE] * numCells
+        row[source] = 0
 
-            if not layout.isWall((x - 1, y)):
-                adjacent.append((x - 1, y))
+        frontier = [source]
+        depth = 0
 
-            for other in adjacent:
-                if other not in dist:
-                    continue
+        while (len(frontier) > 0):
+            depth += 1
+            nextFrontier = []
 
-                oldDist = dist[other]
-                newDist = nodeDist + 1
-                if newDist < oldDist:
-                    dist[other] = newDist
-                    queue.push(other, newDist)
+            for node in frontier:
+                for other in neighbors[node]:
+                    if (row[other] == UNREACHABLE):
+                        row[other] = depth
+                        nextFrontier.append(other)
 
-        for target in allNodes:
-            distances[(target, source)] = dist[target]
+            frontier = nextFrontier
 
-    return distances
+        distances.extend(row)
 
-def getDistanceOnGrid(distances, pos1, pos2):
-    key = (pos1, pos2)
-    if key in distances:
-        return distances[key]
+    return DistanceMatrix(width, height, numCells, cellIndexes, distances)
 
-    return DEFAULT_DISTANCE
+def getDistanceOnGrid(distances, pos1, pos2):
+    try:
+        return distances.getDistance(pos1, pos2)
+    except LookupError:
+        return DEFAULT_DISTANCE
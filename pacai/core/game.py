@@ -8,9 +8,18 @@ import time
 class Game:
     """
     The Game manages the control flow, soliciting actions from agents.
+
+    A turbo game is a headless simulation that runs as fast as the agents allow:
+    the display is never touched (so it may be None),
+    agents are only timed if timeouts are enforced,
+    and (without catchExceptions) agents are trusted to only make legal moves.
+
+    If a replay writer (`pacai.core.replay.ReplayWriter`) is given,
+    every move is streamed out to it as it is made.
     """
 
-    def __init__(self, agents, display, rules, startingIndex = 0, catchExceptions = False):
+    def __init__(self, agents, display, rules, startingIndex = 0, catchExceptions = False,
+            turbo = False, replayWriter = None):
         self.agentCrashed = False
         self.agents = agents
         self.display = display
@@ -24,6 +33,22 @@ class Game:
 
         self.enforceTimeouts = catchExceptions
         self.catchExceptions = catchExceptions
+        self.turbo = turbo
+        self.replayWriter = replayWriter
+
+    def getResults(self):
+        """
+        Get a compact (JSON friendly) summary of how this game went.
+        Games add their own details, like who won.
+        """
+
+        return {
+            'score': self.state.getScore(),
+            'moves': len(self.moveHistory),
+            'agentTimes': [round(agentTime, 4) for agentTime in self.totalAgentTimes],
+            'crashed': self.agentCrashed,
+            'timeout': self.agentTimeout,
+        }
 
     def run(self):
         """
@@ -31,24 +56,34 @@ class Game:
         """
 
         self.numMoves = 0
+        self.numPlies = 0
 
         agentIndex = self.startingIndex
         numAgents = len(self.agents)
 
-        self.display.initialize(self.state)
+        useDisplay = not self.turbo
+        timeMoves = (not self.turbo or self.enforceTimeouts)
+        validateMoves = (not self.turbo or self.catchExceptions)
+
+        if (useDisplay):
+            self.display.initialize(self.state)
 
         if (not self._registerInitialState()):
             return False
 
         # Draw the initial frame.
-        self.display.update(self.state)
+        if (useDisplay):
+            self.display.update(self.state)
+
+        gameStartTime = time.time()
 
         while (not self.gameOver):
             # Fetch the next agent
             agent = self.agents[agentIndex]
 
             action = None
-            startTime = time.time()
+            if (timeMoves):
+                startTime = time.time()
 
             # Get an action from the agent.
             try:
@@ -61,16 +96,18 @@ class Game:
                 self._agentCrash(agentIndex, ex)
                 return False
 
-            timeTaken = time.time() - startTime
-            self.totalAgentTimes[agentIndex] += timeTaken
+            if (timeMoves):
+                timeTaken = time.time() - startTime
+                self.totalAgentTimes[agentIndex] += timeTaken
 
-            if (self._checkForTimeouts(agentIndex, timeTaken)):
-                return False
+                if (self._checkForTimeouts(agentIndex, timeTaken)):
+                    return False
 
             # Execute the action.
             self.moveHistory.append((agentIndex, action))
             try:
-                self.state = self.state.generateSuccessor(agentIndex, action)
+                self.state = self.state.generateSuccessor(agentIndex, action,
+                        validate = validateMoves)
             except Exception as ex:
                 if (not self.catchExceptions):
                     raise ex
@@ -78,8 +115,14 @@ class Game:
                 self._agentCrash(agentIndex, ex)
                 return False
 
+            self.numPlies += 1
+
+            if (self.replayWriter is not None):
+                self.replayWriter.writeMove(agentIndex, action, self.state)
+
             # Update the display.
-            self.display.update(self.state)
+            if (useDisplay):
+                self.display.update(self.state)
 
             # Allow for game specific conditions (winning, losing, etc.).
             self.rules.process(self.state, self)
@@ -91,10 +134,16 @@ class Game:
             # Next agent.
             agentIndex = (agentIndex + 1) % numAgents
 
+        if (self.turbo):
+            gameTime = max(time.time() - gameStartTime, 1e-9)
+            logging.info('Simulated %d plies in %.2f seconds (%.0f plies/second).' %
+                    (self.numPlies, gameTime, self.numPlies / gameTime))
+
         if (not self._registerFinalState()):
             return False
 
-        self.display.finish()
+        if (useDisplay):
+            self.display.finish()
 
     def _agentCrash(self, agentIndex, exception = None):
         """
@@ -164,6 +213,9 @@ class Game:
                 self._agentCrash(agentIndex)
                 return False
 
+            # Let agents with time limited searches know how long they have.
+            agent.setMoveTimeBudget(self.rules.getMoveWarningTime(agentIndex))
+
             maxStartupTime = int(self.rules.getMaxStartupTime(agentIndex))
             startTime = time.time()
 
@@ -3,6 +3,7 @@ import copy
 
 from pacai.core.agentstate import AgentState
 from pacai.core.directions import Directions
+from pacai.core.grid import Grid
 from pacai.util import util
 
 class AbstractGameState(abc.ABC):
@@ -22,17 +23,24 @@ class AbstractGameState(abc.ABC):
 
         self._layout = layout
 
-        # Keep a copy of the hash, since it is expensive to compute.
-        # Any children should be sure to clear the hash when modifications are made.
-        self._hash = None
+        # The state is hashed with Zobrist hashing (see pacai.core.zobrist).
+        # The hash of the food and capsules is kept here and updated as they are eaten,
+        # while each agent state maintains its own hash.
+        self._zobristKeys = layout.getZobristKeys()
+        self._zobrist = self._zobristKeys.getInitialHash()
 
         # For food and capsules, we will only copy on write (if we eat one of them).
         # This avoid additional copies on successors that don't eat.
 
         self._foodCopied = False
         self._food = layout.food.copy()
+        self._numFood = self._food.count()
         self._lastFoodEaten = None
 
+        # A set of the remaining food positions, built the first time someone asks for it
+        # (see getFoodPositions()) and then maintained (and copied on write) with the food grid.
+        self._foodPositions = None
+
         self._capsulesCopied = False
         self._capsules = layout.capsules.copy()
         self._lastCapsuleEaten = None
@@ -43,15 +51,20 @@ class AbstractGameState(abc.ABC):
 
         self._agentStates = []
         for (isPacman, position) in layout.agentPositions:
-            self._agentStates.append(AgentState(position, Directions.STOP, isPacman))
+            agentIndex = len(self._agentStates)
+            self._agentStates.append(AgentState(position, Directions.STOP, isPacman,
+                    agentIndex, self._zobristKeys))
 
         self._score = 0
 
     @abc.abstractmethod
-    def generateSuccessor(self, agentIndex, action):
+    def generateSuccessor(self, agentIndex, action, validate = True):
         """
         Returns the successor state after the specified agent takes the action.
         Treat the returned state as a SHALLOW copy that has been modified.
+
+        If validate is False, the action is trusted to be legal and is not checked
+        (the result of an illegal action is then undefined).
         """
 
         pass
@@ -65,9 +78,36 @@ class AbstractGameState(abc.ABC):
         pass
 
     def addScore(self, score):
-        self._hash = None
         self._score += score
 
+    def applyAction(self, agentIndex, action, validate = True):
+        """
+        Apply the action to this state in-place, instead of allocating a new successor.
+        The result is exactly the same as `AbstractGameState.generateSuccessor`.
+
+        Returns an undo record that can be given to `AbstractGameState.undoAction`
+        to put this state back to how it was before the action.
+        When applying several actions, they must be undone in the reverse order.
+
+        This is meant for agents that walk a search tree depth-first
+        (apply, recurse, undo) and do not need to keep intermediate states around.
+        See `AbstractGameState.generateSuccessor` for validate.
+        """
+
+        if (self.isOver()):
+            raise RuntimeError("Can't apply actions to a terminal state.")
+
+        record = self._getUndoRecord()
+
+        # Food and capsules may be shared with other states (or our undo record),
+        # so make sure they get copied on write.
+        self._foodCopied = False
+        self._capsulesCopied = False
+
+        self._applySuccessorAction(agentIndex, action, validate)
+
+        return record
+
     def eatCapsule(self, x, y):
         """
         Mark the capsule at the given location as eaten.
@@ -83,7 +123,7 @@ class AbstractGameState(abc.ABC):
         self._capsules.remove((x, y))
         self._lastCapsuleEaten = (x, y)
 
-        self._hash = None
+        self._zobrist ^= self._zobristKeys.capsule(x, y)
         return True
 
     def eatFood(self, x, y):
@@ -96,20 +136,62 @@ class AbstractGameState(abc.ABC):
 
         if (not self._foodCopied):
             self._food = self._food.copy()
+            if (self._foodPositions is not None):
+                self._foodPositions = self._foodPositions.copy()
+
             self._foodCopied = True
 
-        self._food[x][y] = False
+        self._food.set(x, y, False)
+        self._numFood -= 1
+        if (self._foodPositions is not None):
+            self._foodPositions.discard((x, y))
+
         self._lastFoodEaten = (x, y)
 
-        self._hash = None
+        self._zobrist ^= self._zobristKeys.food(x, y)
         return True
 
+    def deserialize(self, data):
+        """
+        Get a state on the same layout as this one,
+        but with the values from `AbstractGameState.serialize`.
+        """
+
+        state = self._initSuccessor()
+
+        state._score = data['score']
+        state._gameover = data['gameover']
+        state._win = data['win']
+        state._lastAgentMoved = data['lastAgentMoved']
+        state._lastFoodEaten = _toPosition(data['lastFoodEaten'])
+        state._lastCapsuleEaten = _toPosition(data['lastCapsuleEaten'])
+
+        state._food = Grid(self._food.getWidth(), self._food.getHeight(), initialValue = False)
+        state._foodCopied = True
+        state._foodPositions = None
+        state._zobrist = 0
+
+        for (x, y) in data['food']:
+            state._food.set(x, y, True)
+            state._zobrist ^= self._zobristKeys.food(x, y)
+
+        state._numFood = len(data['food'])
+
+        state._capsules = [tuple(capsule) for capsule in data['capsules']]
+        state._capsulesCopied = True
+
+        for (x, y) in state._capsules:
+            state._zobrist ^= self._zobristKeys.capsule(x, y)
+
+        state._agentStates = [agentState.deserialize(agentData)
+                for (agentState, agentData) in zip(self._agentStates, data['agents'])]
+
+        return state
+
     def endGame(self, win):
         self._gameover = True
         self._win = win
 
-        self._hash = None
-
     def getAgentPosition(self, index):
         """
         Returns a location tuple of the agent with the given index.
@@ -149,6 +231,20 @@ class AbstractGameState(abc.ABC):
 
         return self._food.copy()
 
+    def getFoodPositions(self):
+        """
+        Returns a set of the positions (x, y) of the remaining food.
+        This is the fastest way to look at all the food,
+        since it is kept up to date as food is eaten instead of scanning the grid.
+
+        The caller should not modify the set.
+        """
+
+        if (self._foodPositions is None):
+            self._foodPositions = set(self._food.asList())
+
+        return self._foodPositions
+
     def getHighlightLocations(self):
         return self._highlightLocations
 
@@ -188,7 +284,7 @@ class AbstractGameState(abc.ABC):
         Get the amount of food left on the board.
         """
 
-        return self._food.count()
+        return self._numFood
 
     def getScore(self):
         return self._score
@@ -217,14 +313,14 @@ class AbstractGameState(abc.ABC):
         Returns true if the location (x, y) has food.
         """
 
-        return self._food[x][y]
+        return self._food.get(x, y)
 
     def hasWall(self, x, y):
         """
         Returns true if (x, y) has a wall, false otherwise.
         """
 
-        return self._layout.walls[x][y]
+        return self._layout.walls.get(x, y)
 
     def isLose(self):
         return self.isOver() and not self._win
@@ -235,12 +331,68 @@ class AbstractGameState(abc.ABC):
     def isWin(self):
         return self.isOver() and self._win
 
+    def serialize(self):
+        """
+        Get everything about this state that can change as the game is played
+        as a JSON friendly dict (the layout is left out).
+        See `AbstractGameState.deserialize`.
+        """
+
+        return {
+            'score': self._score,
+            'gameover': self._gameover,
+            'win': self._win,
+            'lastAgentMoved': self._lastAgentMoved,
+            'lastFoodEaten': self._lastFoodEaten,
+            'lastCapsuleEaten': self._lastCapsuleEaten,
+            'food': self._food.asList(),
+            'capsules': self._capsules,
+            'agents': [agentState.serialize() for agentState in self._agentStates],
+        }
+
     def setHighlightLocations(self, locations):
         self._highlightLocations = list(locations)
 
     def setScore(self, score):
         self._score = score
-        self._hash = None
+
+    def undoAction(self, record):
+        """
+        Undo an action applied with `AbstractGameState.applyAction`.
+        """
+
+        self._restoreUndoRecord(record)
+
+    @abc.abstractmethod
+    def _applySuccessorAction(self, agentIndex, action, validate = True):
+        """
+        Apply the action to the context state (self).
+        """
+
+        pass
+
+    def _getUndoRecord(self):
+        """
+        Get everything that applying an action could change.
+        Children with more state should extend this (and `_restoreUndoRecord`).
+        """
+
+        return (
+            self._lastAgentMoved,
+            self._gameover,
+            self._win,
+            self._score,
+            self._food,
+            self._foodCopied,
+            self._numFood,
+            self._foodPositions,
+            self._lastFoodEaten,
+            self._capsules,
+            self._capsulesCopied,
+            self._lastCapsuleEaten,
+            self._zobrist,
+            [agentState._getUndoRecord() for agentState in self._agentStates],
+        )
 
     def _initSuccessor(self):
         """
@@ -250,7 +402,6 @@ class AbstractGameState(abc.ABC):
 
         # Start with a shallow copy.
         successor = copy.copy(self)
-        successor._hash = None
 
         # Leave food and capsules as a shallow copy, but mark them to be copied on write.
         successor._foodCopied = False
@@ -261,6 +412,27 @@ class AbstractGameState(abc.ABC):
 
         return successor
 
+    def _restoreUndoRecord(self, record):
+        (
+            self._lastAgentMoved,
+            self._gameover,
+            self._win,
+            self._score,
+            self._food,
+            self._foodCopied,
+            self._numFood,
+            self._foodPositions,
+            self._lastFoodEaten,
+            self._capsules,
+            self._capsulesCopied,
+            self._lastCapsuleEaten,
+            self._zobrist,
+            agentRecords,
+        ) = record
+
+        for i in range(len(agentRecords)):
+            self._agentStates[i]._restoreUndoRecord(agentRecords[i])
+
     def __eq__(self, other):
         if (other is None):
             return False
@@ -288,8 +460,16 @@ class AbstractGameState(abc.ABC):
                 and self._layout == other._layout)
 
     def __hash__(self):
-        if (self._hash is None):
-            self._hash = util.buildHash(self._score, self._gameover, self._win, *self._capsules,
-                self._food, *self._agentStates, self._layout)
+        # All the expensive components are already Zobrist hashed,
+        # so this is constant time.
+        zobristHash = self._zobrist
+        for agentState in self._agentStates:
+            zobristHash ^= agentState.getZobristHash()
+
+        return util.buildHash(self._score, self._gameover, self._win, zobristHash)
+
+def _toPosition(value):
+    if (value is None):
+        return None
 
-        return self._hash
+    return tuple(value)
@@ -1,8 +1,12 @@
 class Grid:
     """
-    A 2-dimensional array of objects backed by a list of lists.
+    A 2-dimensional array of booleans backed by a bitboard (a single Python int).
     Data is accessed via grid[x][y] where (x, y) are positions on a Pacman map with x horizontal,
     y vertical and the origin (0, 0) in the bottom left corner.
+
+    The cell (x, y) is stored in bit (x * height + y).
+    Since ints are immutable, copying a grid is O(1),
+    counting is a popcount, and hashing/equality are single integer operations.
     """
 
     def __init__(self, width, height, initialValue = False):
@@ -11,74 +15,158 @@ class Grid:
 
         self._width = width
         self._height = height
-        self._data = [[initialValue for y in range(height)] for x in range(width)]
+
+        self._bits = 0
+        if (initialValue):
+            self._bits = (1 << (width * height)) - 1
 
     def asList(self, key = True):
+        bits = self._bits
+        if (not key):
+            bits = ~bits & ((1 << (self._width * self._height)) - 1)
+
         values = []
 
-        for x in range(self._width):
-            for y in range(self._height):
-                if self[x][y] == key:
-                    values.append((x, y))
+        while (bits):
+            # Skip directly to the next set bit.
+            lowBit = bits & -bits
+            index = lowBit.bit_length() - 1
+            values.append(self._cellIndexToPosition(index))
+            bits ^= lowBit
 
         return values
 
     def copy(self):
         grid = Grid(self._width, self._height)
-        grid._data = [row.copy() for row in self._data]
+        grid._bits = self._bits
         return grid
 
-    def count(self, item =True):
-        return sum([x.count(item) for x in self._data])
+    def count(self, item = True):
+        numSet = bin(self._bits).count('1')
+
+        if (item):
+            return numSet
+
+        return self._width * self._height - numSet
 
     def deepCopy(self):
         return self.copy()
 
+    def get(self, x, y):
+        """
+        Get the value at (x, y) without going through a column view.
+        This is the fastest way to read a single cell.
+        """
+
+        return (self._bits >> (x * self._height + y)) & 1 == 1
+
     def getHeight(self):
         return self._height
 
     def getWidth(self):
         return self._width
 
+    def set(self, x, y, value):
+        """
+        Set the value at (x, y) without going through a column view.
+        """
+
+        mask = 1 << (x * self._height + y)
+
+        if (value):
+            self._bits |= mask
+        else:
+            self._bits &= ~mask
+
     def shallowCopy(self):
-        grid = Grid(self._width, self._height)
-        grid._data = self._data
-        return grid
+        # The backing int is immutable, so there is nothing to share.
+        return self.copy()
 
     def _cellIndexToPosition(self, index):
-        x = index / self._height
+        x = index // self._height
         y = index % self._height
 
         return x, y
 
+    def _checkColumn(self, x):
+        if (x < 0):
+            x += self._width
+
+        if (x < 0 or x >= self._width):
+            raise IndexError('Grid column out of range: %d.' % (x))
+
+        return x
+
     def __eq__(self, other):
         if (other is None):
             return False
 
-        return self._data == other._data
+        return (self._bits == other._bits
+                and self._width == other._width
+                and self._height == other._height)
 
-    def __getitem__(self, i):
-        return self._data[i]
+    def __getitem__(self, x):
+        return _GridColumn(self, self._checkColumn(x))
 
     def __hash__(self):
-        hashcode = 0
-        base = 1
-
-        for row in self._data:
-            for value in row:
-                if (value):
-                    hashcode += base
-                base *= 2
-
-        return hash(hashcode)
+        return hash(self._bits)
 
     def __lt__(self, other):
         return self.__hash__() < other.__hash__()
 
-    def __setitem__(self, key, item):
-        self._data[key] = item
+    def __setitem__(self, x, column):
+        x = self._checkColumn(x)
+
+        if (len(column) != self._height):
+            raise ValueError('Grid columns must have exactly %d values.' % (self._height))
+
+        for y in range(self._height):
+            self.set(x, y, column[y])
 
     def __str__(self):
-        out = [[str(self._data[x][y])[0] for x in range(self._width)] for y in range(self._height)]
+        out = [[str(self.get(x, y))[0] for x in range(self._width)] for y in range(self._height)]
         out.reverse()
         return '\n'.join([''.join(x) for x in out])
+
+class _GridColumn:
+    """
+    A light view of a single column of a `Grid`.
+    This allows the classic grid[x][y] access (and assignment) on a bitboard.
+    """
+
+    __slots__ = ('_grid', '_x')
+
+    def __init__(self, grid, x):
+        self._grid = grid
+        self._x = x
+
+    def count(self, item = True):
+        return [self[y] for y in range(len(self))].count(item)
+
+    def _checkRow(self, y):
+        height = self._grid._height
+
+        if (y < 0):
+            y += height
+
+        if (y < 0 or y >= height):
+            raise IndexError('Grid row out of range: %d.' % (y))
+
+        return y
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __getitem__(self, y):
+        grid = self._grid
+        return (grid._bits >> (self._x * grid._height + self._checkRow(y))) & 1 == 1
+
+    def __iter__(self):
+        for y in range(len(self)):
+            yield self[y]
+
+    def __len__(self):
+        return self._grid._height
+
+    def __setitem__(self, y, value):
+        self._grid.set(self._x, self._checkRow(y), value)
@@ -1,8 +1,10 @@
 import os
 import random
 
+from pacai.core.actions import Actions
 from pacai.core.distance import manhattan
 from pacai.core.grid import Grid
+from pacai.core.zobrist import ZobristKeys
 
 # By default, the layout directory is adjacent to this file.
 DEFAULT_LAYOUT_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'layouts')
@@ -26,12 +28,27 @@ class Layout(object):
 
         self.processLayoutText(layoutText, maxGhosts)
 
+        # Indexed by (x * height + y).
+        self._cellActions, self._cellNeighbors = self._buildMoveTables()
+
+        # Built on demand by the first game state on this layout.
+        self._zobristKeys = None
+
+    def getLegalNeighbors(self, position):
+        """
+        Get the positions reachable in a single move (including staying put)
+        from the grid point nearest to a position.
+        """
+
+        x, y = position
+        return list(self._cellNeighbors[int(x + 0.5) * self.height + int(y + 0.5)])
+
     def getNumGhosts(self):
         return self.numGhosts
 
     def isWall(self, pos):
         x, col = pos
-        return self.walls[x][col]
+        return self.walls.get(x, col)
 
     def getHeight(self):
         return self.height
@@ -39,6 +56,32 @@ class Layout(object):
     def getWidth(self):
         return self.width
 
+    def getZobristKeys(self):
+        """
+        Get the `pacai.core.zobrist.ZobristKeys` that all states on this layout hash with.
+        """
+
+        if (self._zobristKeys is None):
+            self._zobristKeys = ZobristKeys(self)
+
+        return self._zobristKeys
+
+    def getPossibleActions(self, position, direction):
+        """
+        The same as `pacai.core.actions.Actions.getPossibleActions`,
+        but read from a table built with the layout.
+        """
+
+        x, y = position
+        xInt = int(x + 0.5)
+        yInt = int(y + 0.5)
+
+        # In between grid points, all agents must continue straight.
+        if (abs(x - xInt) + abs(y - yInt) > Actions.TOLERANCE):
+            return [direction]
+
+        return list(self._cellActions[xInt * self.height + yInt])
+
     def getRandomLegalPosition(self):
         x = random.choice(list(range(self.width)))
         y = random.choice(list(range(self.height)))
@@ -104,9 +147,9 @@ class Layout(object):
 
     def processLayoutChar(self, x, y, layoutChar, maxGhosts):
         if (layoutChar == '%'):
-            self.walls[x][y] = True
+            self.walls.set(x, y, True)
         elif (layoutChar == '.'):
-            self.food[x][y] = True
+            self.food.set(x, y, True)
         elif (layoutChar == 'o'):
             self.capsules.append((x, y))
         elif (layoutChar == 'P'):
@@ -118,6 +161,37 @@ class Layout(object):
             self.agentPositions.append((int(layoutChar), (x, y)))
             self.numGhosts += 1
 
+    def _buildMoveTables(self):
+        """
+        Build the (immutable) tables of legal directions and neighbors for every cell.
+        Walls have no moves, and moving off the board is never legal.
+        """
+
+        cellActions = []
+        cellNeighbors = []
+
+        for x in range(self.width):
+            for y in range(self.height):
+                actions = []
+                neighbors = []
+
+                if (not self.walls.get(x, y)):
+                    for direction, (dx, dy) in Actions._directionsAsList:
+                        nextX = x + dx
+                        nextY = y + dy
+
+                        if (nextX < 0 or nextX >= self.width or nextY < 0 or nextY >= self.height):
+                            continue
+
+                        if (not self.walls.get(nextX, nextY)):
+                            actions.append(direction)
+                            neighbors.append((nextX, nextY))
+
+                cellActions.append(tuple(actions))
+                cellNeighbors.append(tuple(neighbors))
+
+        return tuple(cellActions), tuple(cellNeighbors)
+
 def getLayout(name, layout_dir = DEFAULT_LAYOUT_DIR, maxGhosts = None):
     if (not name.endswith('.lay')):
         name += '.lay'
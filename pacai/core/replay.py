@@ -0,0 +1,386 @@
+"""
+A compact binary format for recording games.
+
+A replay file is laid out as:
+```
+    magic (8 bytes), version (uint16), header length (uint32)
+    header (UTF-8 JSON)
+    moves (one byte each), with optional keyframes mixed in
+    end of moves (one byte, END_BYTE)
+    footer (UTF-8 JSON)
+    footer length (uint32), end magic (8 bytes)
+```
+All integers are little endian.
+
+The header holds everything needed to set up the game again (the layout text, seed, team names,
+etc), and the footer holds how the game ended.
+Each move is a single byte: (agentIndex << 3) | direction.
+Bytes with an agent index of CONTROL_AGENT_INDEX are reserved for control codes (like END_BYTE).
+
+A keyframe is a snapshot of the game state after some number of moves (plies):
+KEYFRAME_BYTE, the state's length (uint32), and the state (UTF-8 JSON, see
+`pacai.core.gamestate.AbstractGameState.serialize`).
+The footer indexes where every keyframe is,
+so the state at any ply can be found by loading the nearest keyframe and only simulating the moves
+after it (see `ReplayReader.materializeState`).
+
+Files are written and read as streams, so a game can be recorded while it is being played,
+and a replay can be played without loading the whole file.
+A file that was cut off (e.g. the recording process crashed) can still be played up to the cut.
+
+Unlike pickles, loading a replay never runs any code, so untrusted replays are safe to load.
+"""
+
+import json
+import struct
+
+from pacai.core.directions import Directions
+from pacai.core.layout import Layout
+
+MAGIC = b'PACAIRPL'
+END_MAGIC = b'PACAIEND'
+VERSION = 2
+
+# Version 1 replays are the same, but never have keyframes.
+SUPPORTED_VERSIONS = (1, 2)
+
+PREFIX = struct.Struct('<8sHI')
+TAIL = struct.Struct('<I8s')
+KEYFRAME_LENGTH = struct.Struct('<I')
+
+DIRECTION_BITS = 3
+DIRECTION_MASK = (1 << DIRECTION_BITS) - 1
+
+# The largest agent index is reserved for control bytes.
+CONTROL_AGENT_INDEX = (0xFF >> DIRECTION_BITS)
+MAX_AGENTS = CONTROL_AGENT_INDEX
+
+END_BYTE = 0xFF
+KEYFRAME_BYTE = 0xFE
+
+DIRECTION_CODES = {
+    Directions.NORTH: 0,
+    Directions.SOUTH: 1,
+    Directions.EAST: 2,
+    Directions.WEST: 3,
+    Directions.STOP: 4,
+}
+
+DIRECTIONS = {code: direction for (direction, code) in DIRECTION_CODES.items()}
+
+class ReplayWriter(object):
+    """
+    Streams a game out to a replay file.
+    The header is written right away, and the footer is written on close().
+
+    The header must have a 'layout' (the lines of the layout's text).
+    Other common header keys are: 'gameType', 'seed', 'agents', and team names.
+
+    With a positive keyframe interval, a keyframe is written every keyframeInterval moves
+    (as long as writeMove() is given the state after the move).
+    """
+
+    def __init__(self, path, header, keyframeInterval = 0):
+        if ('layout' not in header):
+            raise ValueError("Replay headers must include a 'layout'.")
+
+        if (keyframeInterval < 0):
+            raise ValueError('The keyframe interval cannot be negative, found: %d.' %
+                    (keyframeInterval))
+
+        self._file = open(path, 'wb')
+        self._numMoves = 0
+        self._keyframeInterval = keyframeInterval
+
+        # [[ply, offset], ...]
+        self._keyframes = []
+
+        headerBytes = _encodeJSON(header)
+        self._file.write(PREFIX.pack(MAGIC, VERSION, len(headerBytes)))
+        self._file.write(headerBytes)
+
+    def close(self, footer = None):
+        """
+        End the replay.
+        The footer (if any) should describe how the game ended, e.g. the final score.
+        """
+
+        if (self._file is None):
+            return
+
+        if (footer is None):
+            footer = {}
+
+        footer = dict(footer)
+        footer['numMoves'] = self._numMoves
+
+        if (len(self._keyframes) > 0):
+            footer['keyframes'] = self._keyframes
+
+        footerBytes = _encodeJSON(footer)
+
+        self._file.write(bytes([END_BYTE]))
+        self._file.write(footerBytes)
+        self._file.write(TAIL.pack(len(footerBytes), END_MAGIC))
+
+        self._file.close()
+        self._file = None
+
+    def getNumMoves(self):
+        return self._numMoves
+
+    def writeKeyframe(self, state):
+        """
+        Write a snapshot of the state after all the moves written so far.
+        """
+
+        offset = self._file.tell()
+        stateBytes = _encodeJSON(state.serialize())
+
+        self._file.write(bytes([KEYFRAME_BYTE]))
+        self._file.write(KEYFRAME_LENGTH.pack(len(stateBytes)))
+        self._file.write(stateBytes)
+
+        self._keyframes.append([self._numMoves, offset])
+
+    def writeMove(self, agentIndex, action, state = None):
+        """
+        Write a move.
+        If given, the state should be the state after the move (and is used for keyframes).
+        """
+
+        self._file.write(bytes([encodeMove(agentIndex, action)]))
+        self._numMoves += 1
+
+        if (state is not None and self._keyframeInterval > 0
+                and self._numMoves % self._keyframeInterval == 0):
+            self.writeKeyframe(state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+class ReplayReader(object):
+    """
+    Reads a replay file written by a `ReplayWriter`.
+    Only the header is read when opening, moves are streamed with moves().
+    """
+
+    def __init__(self, path):
+        self._path = path
+
+        with open(path, 'rb') as file:
+            prefix = file.read(PREFIX.size)
+            if (len(prefix) != PREFIX.size):
+                raise ValueError('Replay file is too short: %s.' % (path))
+
+            magic, version, headerLength = PREFIX.unpack(prefix)
+            if (magic != MAGIC):
+                raise ValueError('Not a replay file: %s.' % (path))
+
+            if (version not in SUPPORTED_VERSIONS):
+                raise ValueError('Unsupported replay version (%d): %s.' % (version, path))
+
+            self._header = _decodeJSON(file.read(headerLength))
+            self._movesOffset = file.tell()
+
+        # Loaded on demand, see getKeyframes().
+        self._keyframes = None
+
+    def getFooter(self):
+        """
+        Get the footer of the replay, or None if the replay was never finished.
+        """
+
+        with open(self._path, 'rb') as file:
+            file.seek(0, 2)
+            size = file.tell()
+
+            if (size < self._movesOffset + 1 + TAIL.size):
+                return None
+
+            file.seek(size - TAIL.size)
+            footerLength, endMagic = TAIL.unpack(file.read(TAIL.size))
+            if (endMagic != END_MAGIC):
+                return None
+
+            file.seek(size - TAIL.size - footerLength)
+            return _decodeJSON(file.read(footerLength))
+
+    def getHeader(self):
+        return self._header
+
+    def getKeyframes(self):
+        """
+        Get where every keyframe is: [(ply, file offset), ...].
+        Finished replays index their keyframes in the footer,
+        cut off replays have to be scanned.
+        """
+
+        if (self._keyframes is not None):
+            return self._keyframes
+
+        footer = self.getFooter()
+        if (footer is not None):
+            keyframes = [tuple(keyframe) for keyframe in footer.get('keyframes', [])]
+        else:
+            keyframes = []
+            ply = 0
+
+            for (offset, move, stateBytes) in self._readRecords(self._movesOffset):
+                if (move is not None):
+                    ply += 1
+                else:
+                    keyframes.append((ply, offset))
+
+        self._keyframes = keyframes
+        return self._keyframes
+
+    def getLayout(self):
+        return Layout(self._header['layout'], self._header.get('maxGhosts'))
+
+    def materializeState(self, initialState, ply):
+        """
+        Get the state of the game after the given number of moves (plies).
+        The initial state is the state the game started in
+        (e.g. `pacai.bin.capture.CaptureGameState` on the replay's layout),
+        and is not modified.
+
+        The nearest keyframe at or before the ply is loaded, and the moves after it are simulated.
+        States are the result of generateSuccessor(),
+        so they do not include any changes made by a game's rules (like ending the game).
+        """
+
+        if (ply < 0):
+            raise ValueError('Cannot materialize a negative ply: %d.' % (ply))
+
+        currentPly, offset = self._findKeyframe(ply)
+
+        state = initialState
+        for (recordOffset, move, stateBytes) in self._readRecords(offset):
+            if (move is None):
+                if (recordOffset == offset):
+                    state = initialState.deserialize(_decodeJSON(stateBytes))
+
+                continue
+
+            if (currentPly >= ply):
+                break
+
+            # Recorded moves were already checked when the game was played.
+            state = state.generateSuccessor(move[0], move[1], validate = False)
+            currentPly += 1
+
+        if (currentPly < ply):
+            raise LookupError('Replay only has %d moves, cannot materialize ply %d.' %
+                    (currentPly, ply))
+
+        return state
+
+    def moves(self, startPly = 0, chunkSize = 65536):
+        """
+        Yield every move (agentIndex, action) in the replay,
+        starting with the move made after startPly moves.
+        """
+
+        ply, offset = self._findKeyframe(startPly)
+
+        for (recordOffset, move, stateBytes) in self._readRecords(offset, chunkSize):
+            if (move is None):
+                continue
+
+            if (ply >= startPly):
+                yield move
+
+            ply += 1
+
+    def _findKeyframe(self, ply):
+        """
+        Get the latest keyframe at or before the ply: (keyframe ply, file offset).
+        Without one, this is the start of the moves.
+        """
+
+        best = (0, self._movesOffset)
+        for (keyframePly, offset) in self.getKeyframes():
+            if (keyframePly <= ply and keyframePly >= best[0]):
+                best = (keyframePly, offset)
+
+        return best
+
+    def _readRecords(self, offset, chunkSize = 65536):
+        """
+        Yield every record from the offset until the end of the moves:
+        (file offset, move, None) for moves and (file offset, None, state bytes) for keyframes.
+        """
+
+        with open(self._path, 'rb') as file:
+            file.seek(offset)
+
+            chunk = b''
+            index = 0
+
+            while (True):
+                if (index >= len(chunk)):
+                    offset += len(chunk)
+                    chunk = file.read(chunkSize)
+                    index = 0
+
+                    if (len(chunk) == 0):
+                        # A cut off replay.
+                        return
+
+                value = chunk[index]
+
+                if (value == END_BYTE):
+                    return
+
+                if (value != KEYFRAME_BYTE):
+                    yield (offset + index, decodeMove(value), None)
+                    index += 1
+                    continue
+
+                # Keyframes may cross chunks, so read them on their own.
+                recordOffset = offset + index
+                file.seek(recordOffset + 1)
+
+                lengthBytes = file.read(KEYFRAME_LENGTH.size)
+                if (len(lengthBytes) != KEYFRAME_LENGTH.size):
+                    return
+
+                length = KEYFRAME_LENGTH.unpack(lengthBytes)[0]
+                stateBytes = file.read(length)
+                if (len(stateBytes) != length):
+                    return
+
+                yield (recordOffset, None, stateBytes)
+
+                offset = file.tell()
+                chunk = b''
+                index = 0
+
+def decodeMove(value):
+    agentIndex = value >> DIRECTION_BITS
+    code = value & DIRECTION_MASK
+
+    if (agentIndex == CONTROL_AGENT_INDEX or code not in DIRECTIONS):
+        raise ValueError('Invalid move byte in replay: %d.' % (value))
+
+    return agentIndex, DIRECTIONS[code]
+
+def encodeMove(agentIndex, action):
+    if (agentIndex < 0 or agentIndex >= MAX_AGENTS):
+        raise ValueError('Replays only support up to %d agents, found index %d.' %
+                (MAX_AGENTS, agentIndex))
+
+    if (action not in DIRECTION_CODES):
+        raise ValueError('Unknown action for replay: %s.' % (str(action)))
+
+    return (agentIndex << DIRECTION_BITS) | DIRECTION_CODES[action]
+
+def _decodeJSON(data):
+    return json.loads(data.decode('utf-8'))
+
+def _encodeJSON(value):
+    return json.dumps(value, separators = (',', ':')).encode('utf-8')
@@ -0,0 +1,91 @@
+"""
+Zobrist hashing for game states.
+
+Each piece of a game state (a food pellet, a capsule, an agent's position, etc) gets a random key.
+The hash of a state is the XOR of the keys of all the pieces that are present.
+When a piece changes, the hash can be updated in O(1) by XORing out the old key
+and XORing in the new one.
+"""
+
+import random
+
+# A fixed seed so that keys (and therefore hashes) are stable for a layout.
+ZOBRIST_SEED = 140
+KEY_BITS = 64
+
+AGENT_POSITION = 0
+AGENT_DIRECTION = 1
+AGENT_IS_PACMAN = 2
+AGENT_SCARED_TIMER = 3
+
+class ZobristKeys(object):
+    """
+    The random keys used to hash states on a specific layout.
+    Layouts hold onto a single instance of this (see `pacai.core.layout.Layout.getZobristKeys`),
+    so all states on the same layout share the same keys.
+    """
+
+    def __init__(self, layout):
+        self._rng = random.Random(ZOBRIST_SEED)
+        self._height = layout.height
+
+        numCells = layout.width * layout.height
+        self._foodKeys = [self._rng.getrandbits(KEY_BITS) for i in range(numCells)]
+        self._capsuleKeys = [self._rng.getrandbits(KEY_BITS) for i in range(numCells)]
+
+        # Agents can be in half positions and have unbounded scared timers,
+        # so their keys are generated on demand (see agent()).
+        self._agentKeys = {}
+
+        self._initialHash = 0
+        for (x, y) in layout.food.asList():
+            self._initialHash ^= self.food(x, y)
+
+        for (x, y) in layout.capsules:
+            self._initialHash ^= self.capsule(x, y)
+
+    def agent(self, agentIndex, field, value):
+        """
+        Get the key for a single field (e.g. AGENT_POSITION) of an agent.
+        Each key comes from its own generator (seeded by the agent, field, and value),
+        so keys do not depend on the order they are asked for in.
+        """
+
+        key = (agentIndex, field, value)
+
+        agentKey = self._agentKeys.get(key)
+        if (agentKey is None):
+            seed = '%d:%d:%d:%r' % (ZOBRIST_SEED, agentIndex, field, _normalize(field, value))
+            agentKey = random.Random(seed).getrandbits(KEY_BITS)
+            self._agentKeys[key] = agentKey
+
+        return agentKey
+
+    def capsule(self, x, y):
+        return self._capsuleKeys[x * self._height + y]
+
+    def food(self, x, y):
+        return self._foodKeys[x * self._height + y]
+
+    def getInitialHash(self):
+        """
+        Get the hash of the layout's starting food and capsules.
+        """
+
+        return self._initialHash
+
+def _normalize(field, value):
+    """
+    Make equal values look the same (e.g. a position of (1, 2) and (1.0, 2.0)).
+    """
+
+    if (field == AGENT_POSITION):
+        return (float(value[0]), float(value[1]))
+
+    if (field == AGENT_SCARED_TIMER):
+        return int(value)
+
+    if (field == AGENT_IS_PACMAN):
+        return bool(value)
+
+    return value
@@ -67,13 +67,10 @@ class ReflexAgent(BaseAgent):
         baddist = maxlen
         badflag = True
 
-        for i in range(x):
-            for j in range(y):
-                m = oldFood[i][j]
-                if m:
-                    d = distance.manhattan((i, j), newPosition)
-                    if d < minfooddist:
-                        minfooddist = d
+        for foodPosition in currentGameState.getFoodPositions():
+            d = distance.manhattan(foodPosition, newPosition)
+            if d < minfooddist:
+                minfooddist = d
 
         for i in range(len(newScaredTimes)):
             ghost = newGhostStates[i]
@@ -116,6 +113,10 @@ class MinimaxAgent(MultiAgentSearchAgent):
     `pacai.core.gamestate.AbstractGameState.generateSuccessor`:
     Get the successor game state after an agent takes an action.
 
+    `pacai.core.gamestate.AbstractGameState.applyAction`:
+    Apply an action in-place (undo it with `pacai.core.gamestate.AbstractGameState.undoAction`).
+    This avoids allocating a new state for every node in the search tree.
+
     `pacai.core.directions.Directions.STOP`:
     The stop direction, which is always legal, but you may not want to include in your search.
 
@@ -131,21 +132,42 @@ class MinimaxAgent(MultiAgentSearchAgent):
         super().__init__(index, **kwargs)
 
     def getAction(self, state):
-        succs = state.getLegalActions(0)
-        depth = 0
+        # Root actions may be searched in parallel (see searchRootActions()).
+        succs = [s for s in state.getLegalActions(0) if s != 'Stop']
+        values = self.searchRootActions(state, succs)
         v = -float('inf')
         bestaction = ''
-        for s in succs:
-            if s != 'Stop':
-                j = state.generateSuccessor(0, s)
-                m = self.min_value(j, depth, 1)
-                w = v
-                v = max(v, m)
-                if v > w:
-                    bestaction = s
+        for s, m in zip(succs, values):
+            w = v
+            v = max(v, m)
+            if v > w:
+                bestaction = s
         return bestaction
 
+    def searchRootAction(self, state, action):
+        record = state.applyAction(0, action)
+        try:
+            m = self.min_value(state, 0, 1)
+        finally:
+            state.undoAction(record)
+        return m
+
     def min_value(self, state, depth, agentind):
+        # Positions reached through different move orders are only searched once.
+        table = self.getTranspositionTable()
+        remaining = self.getTreeDepth() - depth
+        if table is not None:
+            cached = table.lookup(state, agentind, remaining)
+            if cached is not None:
+                return cached
+
+        v = self._min_value(state, depth, agentind)
+
+        if table is not None:
+            table.store(state, agentind, remaining, v)
+        return v
+
+    def _min_value(self, state, depth, agentind):
         actions = state.getLegalActions(agentind)
         if depth == self.getTreeDepth() or len(actions) == 0:
             j = self.getEvaluationFunction()(state)
@@ -155,26 +177,49 @@ class MinimaxAgent(MultiAgentSearchAgent):
         if agentind < (numagents - 1):
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.min_value(newstate, depth, agentind + 1)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.min_value(state, depth, agentind + 1)
+                    finally:
+                        state.undoAction(record)
                     v = min(v, values)
         else:
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.max_value(newstate, depth + 1)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.max_value(state, depth + 1)
+                    finally:
+                        state.undoAction(record)
                     v = min(v, values)
         return v
 
     def max_value(self, state, depth):
+        table = self.getTranspositionTable()
+        remaining = self.getTreeDepth() - depth
+        if table is not None:
+            cached = table.lookup(state, 0, remaining)
+            if cached is not None:
+                return cached
+
+        v = self._max_value(state, depth)
+
+        if table is not None:
+            table.store(state, 0, remaining, v)
+        return v
+
+    def _max_value(self, state, depth):
         actions = state.getLegalActions(0)
         if depth == self.getTreeDepth() or len(actions) == 0:
             return self.getEvaluationFunction()(state)
         v = -(float('inf'))
         for action in actions:
             if action != 'Stop':
-                newstate = state.generateSuccessor(0, action)
-                values = self.min_value(newstate, depth + 1, 1)
+                record = state.applyAction(0, action)
+                try:
+                    values = self.min_value(state, depth + 1, 1)
+                finally:
+                    state.undoAction(record)
                 v = max(v, values)
         return v
 
@@ -194,23 +239,45 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         super().__init__(index, **kwargs)
 
     def getAction(self, state):
-        succs = state.getLegalActions(0)
-        depth = 0
+        # Every root action is searched with the full window,
+        # so they can be searched in parallel (see searchRootActions()).
+        succs = [s for s in state.getLegalActions(0) if s != 'Stop']
+        values = self.searchRootActions(state, succs)
         v = -float('inf')
-        pinf = float('inf')
-        ninf = -float('inf')
         bestaction = ''
-        for s in succs:
-            if s != 'Stop':
-                j = state.generateSuccessor(0, s)
-                m = self.max_value(j, depth, ninf, pinf)
-                w = v
-                v = max(v, m)
-                if v > w:
-                    bestaction = s
+        for s, m in zip(succs, values):
+            w = v
+            v = max(v, m)
+            if v > w:
+                bestaction = s
         return bestaction
 
+    def searchRootAction(self, state, action):
+        pinf = float('inf')
+        ninf = -float('inf')
+        record = state.applyAction(0, action)
+        try:
+            m = self.max_value(state, 0, ninf, pinf)
+        finally:
+            state.undoAction(record)
+        return m
+
     def min_value(self, state, depth, agentind, alpha, beta):
+        # Cached values are exact, or bounds that are only used if they cause a cutoff.
+        table = self.getTranspositionTable()
+        remaining = self.getTreeDepth() - depth
+        if table is not None:
+            cached = table.lookup(state, agentind, remaining, alpha, beta)
+            if cached is not None:
+                return cached
+
+        v = self._min_value(state, depth, agentind, alpha, beta)
+
+        if table is not None:
+            table.store(state, agentind, remaining, v, alpha, beta)
+        return v
+
+    def _min_value(self, state, depth, agentind, alpha, beta):
         actions = state.getLegalActions(agentind)
         if depth == self.getTreeDepth() or len(actions) == 0:
             j = self.getEvaluationFunction()(state)
@@ -220,8 +287,11 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         if agentind < (numagents - 1):
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.min_value(newstate, depth, agentind + 1, alpha, beta)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.min_value(state, depth, agentind + 1, alpha, beta)
+                    finally:
+                        state.undoAction(record)
                     v = min(v, values)
                     if v <= alpha:
                         return v
@@ -229,8 +299,11 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         else:
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.max_value(newstate, depth + 1, alpha, beta)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.max_value(state, depth + 1, alpha, beta)
+                    finally:
+                        state.undoAction(record)
                     v = min(v, values)
                     if v <= alpha:
                         return v
@@ -238,14 +311,31 @@ class AlphaBetaAgent(MultiAgentSearchAgent):
         return v
 
     def max_value(self, state, depth, alpha, beta):
+        table = self.getTranspositionTable()
+        remaining = self.getTreeDepth() - depth
+        if table is not None:
+            cached = table.lookup(state, 0, remaining, alpha, beta)
+            if cached is not None:
+                return cached
+
+        v = self._max_value(state, depth, alpha, beta)
+
+        if table is not None:
+            table.store(state, 0, remaining, v, alpha, beta)
+        return v
+
+    def _max_value(self, state, depth, alpha, beta):
         actions = state.getLegalActions(0)
         if depth == self.getTreeDepth() or len(actions) == 0:
             return self.getEvaluationFunction()(state)
         v = -(float('inf'))
         for action in actions:
             if action != 'Stop':
-                newstate = state.generateSuccessor(0, action)
-                values = self.min_value(newstate, depth + 1, 1, alpha, beta)
+                record = state.applyAction(0, action)
+                try:
+                    values = self.min_value(state, depth + 1, 1, alpha, beta)
+                finally:
+                    state.undoAction(record)
                 v = max(v, values)
                 if v >= beta:
                     return v
@@ -276,8 +366,11 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         bestaction = ''
         for s in succs:
             if s != 'Stop':
-                j = state.generateSuccessor(0, s)
-                m = self.min_value(j, depth, 1)
+                record = state.applyAction(0, s)
+                try:
+                    m = self.min_value(state, depth, 1)
+                finally:
+                    state.undoAction(record)
                 w = v
                 v = max(v, m)
                 if v > w:
@@ -294,14 +387,20 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         if agentind < (numagents - 1):
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.min_value(newstate, depth, agentind + 1)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.min_value(state, depth, agentind + 1)
+                    finally:
+                        state.undoAction(record)
                     e += values
         else:
             for action in actions:
                 if action != 'Stop':
-                    newstate = state.generateSuccessor(agentind, action)
-                    values = self.max_value(newstate, depth + 1)
+                    record = state.applyAction(agentind, action)
+                    try:
+                        values = self.max_value(state, depth + 1)
+                    finally:
+                        state.undoAction(record)
                     e += values
         return e / len(actions)
 
@@ -312,8 +411,11 @@ class ExpectimaxAgent(MultiAgentSearchAgent):
         v = -(float('inf'))
         for action in actions:
             if action != 'Stop':
-                newstate = state.generateSuccessor(0, action)
-                values = self.min_value(newstate, depth + 1, 1)
+                record = state.applyAction(0, action)
+                try:
+                    values = self.min_value(state, depth + 1, 1)
+                finally:
+                    state.undoAction(record)
                 v = max(v, values)
         return v
 
@@ -339,13 +441,10 @@ def betterEvaluationFunction(currentGameState):
     scaredflag = True
     badflag = True
 
-    for i in range(x):
-        for j in range(y):
-            m = oldFood[i][j]
-            if m:
-                d = distance.manhattan(newPosition, (i, j))
-                if d < minfooddist:
-                    minfooddist = d
+    for foodPosition in currentGameState.getFoodPositions():
+        d = distance.manhattan(newPosition, foodPosition)
+        if d < minfooddist:
+            minfooddist = d
 
     for i in range(len(newScaredTimes)):
         ghost = newGhostStates[i]
@@ -1,6 +1,37 @@
 from pacai.agents.capture.reflex import ReflexCaptureAgent
-from pacai.util import counter
+from pacai.agents.search.deepening import Deadline
+from pacai.agents.search.deepening import iterativeDeepening
+from pacai.core.directions import Directions
 from pacai.util import util
+from pacai.util.features import FeatureSchema
+from pacai.util.transposition import DEFAULT_MAX_SIZE
+from pacai.util.transposition import TranspositionTable
+
+# The deepest search (in plies) to try, if there is time for it.
+MAX_SEARCH_DEPTH = 12
+
+# The features of both agents (each agent's weights pick out the ones it uses).
+FEATURES = FeatureSchema([
+    'successorScore',
+    'distanceToFood',
+    'distFromDefender',
+    'distFromScared',
+    'capsuleDist',
+    'invaderDistance',
+    'teammateDist',
+    'numInvaders',
+    'onDefense',
+])
+
+SUCCESSOR_SCORE = FEATURES.getIndex('successorScore')
+DISTANCE_TO_FOOD = FEATURES.getIndex('distanceToFood')
+DIST_FROM_DEFENDER = FEATURES.getIndex('distFromDefender')
+DIST_FROM_SCARED = FEATURES.getIndex('distFromScared')
+CAPSULE_DIST = FEATURES.getIndex('capsuleDist')
+INVADER_DISTANCE = FEATURES.getIndex('invaderDistance')
+TEAMMATE_DIST = FEATURES.getIndex('teammateDist')
+NUM_INVADERS = FEATURES.getIndex('numInvaders')
+ON_DEFENSE = FEATURES.getIndex('onDefense')
 
 def createTeam(firstIndex, secondIndex, isRed,
         first = 'pacai.agents.capture.dummy.DummyAgent',
@@ -20,10 +51,27 @@ def createTeam(firstIndex, secondIndex, isRed,
         secondAgent
     ]
 
-class OffensiveAgent(ReflexCaptureAgent):
+class AlphaBetaCaptureAgent(ReflexCaptureAgent):
+    """
+    A capture agent that searches its own moves and its opponents' moves with alpha-beta
+    (its teammate is assumed to stay put), and evaluates positions with `evaluate`.
+
+    The search deepens one ply at a time until the time for the move is nearly used up
+    (see `pacai.agents.search.deepening`), trying the moves from the last depth's best line first.
+    Positions reached through different move orders (or on the last move) are looked up in a
+    transposition table instead of being searched again.
+    """
+
+    def __init__(self, index, maxDepth = MAX_SEARCH_DEPTH,
+            transpositionTableSize = DEFAULT_MAX_SIZE, **kwargs):
+        super().__init__(index, **kwargs)
+
+        self._maxDepth = int(maxDepth)
+        self._transpositionTableSize = int(transpositionTableSize)
+        self._transpositionTable = None
 
-    def __init__(self, index):
-        super().__init__(index)
+        # The agents in the order they move in the search: this agent, then the opponents.
+        self._searchOrder = None
 
     def registerInitialState(self, gameState):
         """
@@ -32,11 +80,10 @@ class OffensiveAgent(ReflexCaptureAgent):
 
         IMPORTANT: If this method runs for more than 15 seconds, your agent will time out.
         """
-        self._treeDepth = 4
         super().registerInitialState(gameState)
 
-    def getTreeDepth(self):
-        return self._treeDepth
+        self._transpositionTable = TranspositionTable(self._transpositionTableSize)
+        self._searchOrder = [self.index] + self.getOpponents(gameState)
 
     def getAction(self, gameState):
         self.observationHistory.append(gameState)
@@ -45,84 +92,103 @@ class OffensiveAgent(ReflexCaptureAgent):
         if (myPos != util.nearestPoint(myPos)):
             # We're halfway from one position to the next.
             return gameState.getLegalActions(self.index)[0]
-        else:
-            actions = gameState.getLegalActions(self.index)
-            depth = 0
-            max = -float('inf')
-            pinf = float('inf')
-            ninf = -float('inf')
-            bestaction = ''
-            for action in actions:
-                if action != 'Stop':
-                    value = self.max_value(
-                        gameState.generateSuccessor(self.index, action), depth, ninf, pinf)
-                    if value > max:
-                        max = value
-                        bestaction = action
-            return bestaction
-
-    # Min value calculates the optimal successor states for enemy agents
-    def min_value(self, state, depth, agentind, alpha, beta):
-        if depth == self.getTreeDepth():
-            return self.evaluate(state, None)
-        v = float('inf')
-        opps = []
-        if state.isOnBlueTeam(self.index):
-            opps = state.getRedTeamIndices()
-        else:
-            opps = state.getBlueTeamIndices()
-        if agentind == opps[0]:
-            actions = state.getLegalActions(opps[0])
-            if len(actions) == 0:
-                return self.evaluate(state, None)
-            for action in actions:
-                if action != 'Stop':
-                    values = self.min_value(
-                        state.generateSuccessor(opps[0], action), depth, opps[1], alpha, beta)
-                    v = min(v, values)
-                    if v <= alpha:
-                        return v
-                    beta = min(beta, v)
-        else:
-            actions = state.getLegalActions(opps[1])
-            if len(actions) == 0:
-                return self.evaluate(state, None)
-            for action in actions:
-                if action != 'Stop':
-                    values = self.max_value(
-                        state.generateSuccessor(opps[1], action), depth + 1, alpha, beta)
-                    v = min(v, values)
-                    if v <= alpha:
-                        return v
-                    beta = min(beta, v)
-        return v
-
-    # Max value calculates maximum evaluation value for Offensive Agent
-    # of successor states given by enemies through min_value
-    def max_value(self, state, depth, alpha, beta):
-        opps = []
-        if state.isOnBlueTeam(self.index):
-            opps = state.getRedTeamIndices()
-        else:
-            opps = state.getBlueTeamIndices()
-        actions = state.getLegalActions(self.index)
-        if depth == self.getTreeDepth() or len(actions) == 0:
-            return self.evaluate(state, None)
-        v = -(float('inf'))
+
+        def search(depth, principalVariation, deadline):
+            return self._search(gameState, 0, depth, -float('inf'), float('inf'),
+                    principalVariation, deadline, root = True)
+
+        deadline = Deadline.fromBudget(self.getMoveTimeBudget())
+        depth, value, principalVariation = iterativeDeepening(search, deadline, self._maxDepth)
+
+        if (len(principalVariation) == 0):
+            # There is nowhere to go.
+            return Directions.STOP
+
+        return principalVariation[0]
+
+    def _search(self, state, turn, remaining, alpha, beta, principalVariation, deadline,
+            root = False):
+        """
+        Search the state with remaining plies left, where self._searchOrder[turn] is the agent
+        to move (this agent maximizes, its opponents minimize).
+        Returns the value of the state and the best line of play from it (a list of actions).
+        """
+
+        deadline.check()
+
+        agentIndex = self._searchOrder[turn]
+
+        # The root always needs to be searched, since we need its best action (not just its value).
+        if (not root):
+            cached = self._transpositionTable.lookup(state, agentIndex, remaining, alpha, beta)
+            if (cached is not None):
+                return cached, []
+
+        actions = [action for action in state.getLegalActions(agentIndex)
+                if action != Directions.STOP]
+
+        if (remaining == 0 or len(actions) == 0):
+            value = self.evaluate(state, None)
+            self._transpositionTable.store(state, agentIndex, remaining, value)
+            return value, []
+
+        # The best move from the last (shallower) search is the most likely to be the best again.
+        pvAction = None
+        if (len(principalVariation) > 0 and principalVariation[0] in actions):
+            pvAction = principalVariation[0]
+            actions.remove(pvAction)
+            actions.insert(0, pvAction)
+
+        maximize = (turn == 0)
+        nextTurn = (turn + 1) % len(self._searchOrder)
+
+        startAlpha = alpha
+        startBeta = beta
+
+        bestValue = -float('inf') if maximize else float('inf')
+        bestLine = [actions[0]]
+
         for action in actions:
-            if action != 'Stop':
-                values = self.min_value(state.generateSuccessor(self.index, action),
-                                        depth + 1, opps[0], alpha, beta)
-                v = max(v, values)
-                if v >= beta:
-                    return v
-                alpha = max(alpha, v)
-        return v
-
-    def getFeatures(self, gameState, action):
-        features = counter.Counter()
+            childVariation = []
+            if (action == pvAction):
+                childVariation = principalVariation[1:]
+
+            # Always undo the action, even if the search runs out of time.
+            record = state.applyAction(agentIndex, action)
+            try:
+                value, line = self._search(state, nextTurn, remaining - 1, alpha, beta,
+                        childVariation, deadline)
+            finally:
+                state.undoAction(record)
+
+            if (maximize and value > bestValue) or (not maximize and value < bestValue):
+                bestValue = value
+                bestLine = [action] + line
+
+            if (maximize):
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+
+            if (alpha >= beta):
+                break
+
+        self._transpositionTable.store(state, agentIndex, remaining, bestValue,
+                startAlpha, startBeta, bestLine[0])
+
+        return bestValue, bestLine
+
+class OffensiveAgent(AlphaBetaCaptureAgent):
+
+    def __init__(self, index, **kwargs):
+        super().__init__(index, **kwargs)
+
+    def getFeatureSchema(self):
+        return FEATURES
+
+    def writeFeatures(self, gameState, action, features):
         successor = gameState
-        features['successorScore'] = self.getScore(successor)
+        features[SUCCESSOR_SCORE] = self.getScore(successor)
 
         # Compute distance to the nearest food.
         foodList = self.getFood(successor).asList()
@@ -132,9 +198,9 @@ class OffensiveAgent(ReflexCaptureAgent):
         if (len(foodList) > 0):
             minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
             if minDistance == 0:
-                features['distanceToFood'] = 10
+                features[DISTANCE_TO_FOOD] = 10
             else:
-                features['distanceToFood'] = 1 / minDistance
+                features[DISTANCE_TO_FOOD] = 1 / minDistance
 
         opponents = [successor.getAgentState(i) for i in self.getOpponents(successor)]
         defenders = [opp for opp in opponents
@@ -146,47 +212,47 @@ class OffensiveAgent(ReflexCaptureAgent):
             if len(opps) > 0:
                 oppD = min([self.getMazeDistance(myPos, opp.getPosition()) for opp in opps])
                 if oppD == 0:
-                    features['distFromDefender'] = 100
+                    features[DIST_FROM_DEFENDER] = 100
                 elif oppD < 5:
-                    features['distFromDefender'] = 0
+                    features[DIST_FROM_DEFENDER] = 0
                 else:
-                    features['distFromDefender'] = 1 / oppD
+                    features[DIST_FROM_DEFENDER] = 1 / oppD
             else:
-                features['distFromDefender'] = 0
+                features[DIST_FROM_DEFENDER] = 0
             if len(scaredys) > 0:
                 scareD = min([self.getMazeDistance(myPos, opp.getPosition()) for opp in scaredys])
                 if scareD == 0:
-                    features['distFromScared'] = 100
+                    features[DIST_FROM_SCARED] = 100
                 else:
-                    features['distFromScared'] = 1 / scareD
+                    features[DIST_FROM_SCARED] = 1 / scareD
             else:
-                features['distFromScared'] = 0
+                features[DIST_FROM_SCARED] = 0
         else:
             if myAgent.isPacman():
-                features['distFromDefender'] = -10
+                features[DIST_FROM_DEFENDER] = -10
             else:
-                features['distFromDefender'] = 0.7
-            features['distFromScared'] = 0
+                features[DIST_FROM_DEFENDER] = 0.7
+            features[DIST_FROM_SCARED] = 0
 
         capsuleList = self.getCapsules(successor)
         if len(capsuleList) > 0:
             minCapDist = min([self.getMazeDistance(myPos, food) for food in capsuleList])
             if minCapDist == 0:
-                features['capsuleDist'] = 1000
+                features[CAPSULE_DIST] = 1000
             else:
-                features['capsuleDist'] = 1 / minCapDist
+                features[CAPSULE_DIST] = 1 / minCapDist
         else:
-            features['capsuleDist'] = 10
+            features[CAPSULE_DIST] = 10
 
         invaders = [a for a in opponents if a.isPacman() and a.getPosition() is not None]
         if (len(invaders) > 0):
             minInvDist = min([self.getMazeDistance(myPos, a.getPosition()) for a in invaders])
             if minInvDist == 0:
-                features['invaderDistance'] = 100
+                features[INVADER_DISTANCE] = 100
             else:
-                features['invaderDistance'] = 1 / minInvDist
+                features[INVADER_DISTANCE] = 1 / minInvDist
         else:
-            features['invaderDistance'] = 10
+            features[INVADER_DISTANCE] = 10
 
         team = []
         if successor.isOnBlueTeam(self.index):
@@ -201,11 +267,9 @@ class OffensiveAgent(ReflexCaptureAgent):
         otherPos = otherAgent.getPosition()
         teamDist = self.getMazeDistance(myPos, otherPos)
         if teamDist == 0:
-            features['teammateDist'] = 10
+            features[TEAMMATE_DIST] = 10
         else:
-            features['teammateDist'] = 1 / teamDist
-
-        return features
+            features[TEAMMATE_DIST] = 1 / teamDist
 
     def getWeights(self, gameState, action):
         return {
@@ -218,151 +282,50 @@ class OffensiveAgent(ReflexCaptureAgent):
             'teammateDist': -0.5,
         }
 
-    def evaluate(self, gameState, action):
-        """
-        Computes a linear combination of features and feature weights.
-        """
-        features = self.getFeatures(gameState, action)
-        weights = self.getWeights(gameState, action)
-
-        return features * weights
-
-class DefensiveReflexAgent(ReflexCaptureAgent):
+class DefensiveReflexAgent(AlphaBetaCaptureAgent):
     """
     A reflex agent that tries to keep its side Pacman-free.
     This is to give you an idea of what a defensive agent could be like.
     It is not the best or only way to make such an agent.
     """
 
-    def __init__(self, index):
-        super().__init__(index)
-
-    def registerInitialState(self, gameState):
-        """
-        This method handles the initial setup of the agent and populates useful fields,
-        such as the team the agent is on and the `pacai.core.distanceCalculator.Distancer`.
-
-        IMPORTANT: If this method runs for more than 15 seconds, your agent will time out.
-        """
-        self._treeDepth = 3
-        super().registerInitialState(gameState)
+    def __init__(self, index, **kwargs):
+        super().__init__(index, **kwargs)
 
-    def getTreeDepth(self):
-        return self._treeDepth
+    def getFeatureSchema(self):
+        return FEATURES
 
-    def getAction(self, gameState):
-        self.observationHistory.append(gameState)
-        myState = gameState.getAgentState(self.index)
-        myPos = myState.getPosition()
-        if (myPos != util.nearestPoint(myPos)):
-            # We're halfway from one position to the next.
-            return gameState.getLegalActions(self.index)[0]
-        else:
-            actions = gameState.getLegalActions(self.index)
-            depth = 0
-            max = -float('inf')
-            pinf = float('inf')
-            ninf = -float('inf')
-            bestaction = ''
-            for action in actions:
-                if action != 'Stop':
-                    value = self.max_value(gameState.generateSuccessor(self.index, action),
-                                           depth, ninf, pinf)
-                    if value > max:
-                        max = value
-                        bestaction = action
-            return bestaction
-
-    # Min value calculates the optimal successor states for enemy agents
-    def min_value(self, state, depth, agentind, alpha, beta):
-        if depth == self.getTreeDepth():
-            return self.evaluate(state, None)
-        v = float('inf')
-        opps = []
-        if state.isOnBlueTeam(self.index):
-            opps = state.getRedTeamIndices()
-        else:
-            opps = state.getBlueTeamIndices()
-        if agentind == opps[0]:
-            actions = state.getLegalActions(opps[0])
-            if len(actions) == 0:
-                return self.evaluate(state, None)
-            for action in actions:
-                if action != 'Stop':
-                    values = self.min_value(
-                        state.generateSuccessor(opps[0], action), depth, opps[1], alpha, beta)
-                    v = min(v, values)
-                    if v <= alpha:
-                        return v
-                    beta = min(beta, v)
-        else:
-            actions = state.getLegalActions(opps[1])
-            if len(actions) == 0:
-                return self.evaluate(state, None)
-            for action in actions:
-                if action != 'Stop':
-                    values = self.max_value(
-                        state.generateSuccessor(opps[1], action), depth + 1, alpha, beta)
-                    v = min(v, values)
-                    if v <= alpha:
-                        return v
-                    beta = min(beta, v)
-        return v
-
-    # Max value calculates maximum evaluation value for Offensive Agent
-    # of successor states given by enemies through min_value
-    def max_value(self, state, depth, alpha, beta):
-        opps = []
-        if state.isOnBlueTeam(self.index):
-            opps = state.getRedTeamIndices()
-        else:
-            opps = state.getBlueTeamIndices()
-        actions = state.getLegalActions(self.index)
-        if depth == self.getTreeDepth() or len(actions) == 0:
-            return self.evaluate(state, None)
-        v = -(float('inf'))
-        for action in actions:
-            if action != 'Stop':
-                values = self.min_value(
-                    state.generateSuccessor(self.index, action), depth + 1, opps[0], alpha, beta)
-                v = max(v, values)
-                if v >= beta:
-                    return v
-                alpha = max(alpha, v)
-        return v
-
-    def getFeatures(self, gameState, action):
-        features = counter.Counter()
+    def writeFeatures(self, gameState, action, features):
         successor = gameState
 
         myState = successor.getAgentState(self.index)
         myPos = myState.getPosition()
 
         # Computes whether we're on defense (1) or offense (0).
-        features['onDefense'] = 1
+        features[ON_DEFENSE] = 1
         if (myState.isPacman()):
-            features['onDefense'] = 0
+            features[ON_DEFENSE] = 0
 
-        features['successorScore'] = 0
-        features['distanceToFood'] = 0
+        features[SUCCESSOR_SCORE] = 0
+        features[DISTANCE_TO_FOOD] = 0
 
         # Computes distance to invaders we can see.
         enemies = [successor.getAgentState(i) for i in self.getOpponents(successor)]
         invaders = [a for a in enemies if a.isPacman() and a.getPosition() is not None]
-        features['numInvaders'] = len(invaders)
+        features[NUM_INVADERS] = len(invaders)
 
         if (len(invaders) > 0):
             dists = [self.getMazeDistance(myPos, a.getPosition()) for a in invaders]
-            features['invaderDistance'] = min(dists)
-            features['onDefense'] = 1
+            features[INVADER_DISTANCE] = min(dists)
+            features[ON_DEFENSE] = 1
         else:
-            features['onDefense'] = 0
+            features[ON_DEFENSE] = 0
             myPos = successor.getAgentState(self.index).getPosition()
             foodList = self.getFood(successor).asList()
             minDistance = min([self.getMazeDistance(myPos, food) for food in foodList])
-            features['distanceToFood'] = minDistance
-            features['successorScore'] = self.getScore(successor)
-            features['invaderDistance'] = 0
+            features[DISTANCE_TO_FOOD] = minDistance
+            features[SUCCESSOR_SCORE] = self.getScore(successor)
+            features[INVADER_DISTANCE] = 0
 
         team = []
         if successor.isOnBlueTeam(self.index):
@@ -377,11 +340,9 @@ class DefensiveReflexAgent(ReflexCaptureAgent):
         otherPos = otherAgent.getPosition()
         teamDist = self.getMazeDistance(myPos, otherPos)
         if teamDist == 0:
-            features['teammateDist'] = 10
+            features[TEAMMATE_DIST] = 10
         else:
-            features['teammateDist'] = 1 / teamDist
-
-        return features
+            features[TEAMMATE_DIST] = 1 / teamDist
 
     def getWeights(self, gameState, action):
         return {
@@ -392,12 +353,3 @@ class DefensiveReflexAgent(ReflexCaptureAgent):
             'successorScore': 1000,
             'teammateDist': -0.2
         }
-
-    def evaluate(self, gameState, action):
-        """
-        Computes a linear combination of features and feature weights.
-        """
-        features = self.getFeatures(gameState, action)
-        weights = self.getWeights(gameState, action)
-
-        return features * weights
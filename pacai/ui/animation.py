@@ -0,0 +1,466 @@
+"""
+Save games as animated images (GIF, APNG, or WebP).
+
+Frames are rendered and encoded as soon as they are added, instead of all at the end of the game,
+so only a few frames are ever held in memory.
+Rendering and encoding can also be done on a background thread,
+so they do not slow down the game itself.
+"""
+
+import io
+import logging
+import os
+import queue
+import struct
+import threading
+import zlib
+
+from PIL import Image
+from PIL import ImageChops
+
+# The format to use for each file extension.
+FORMATS = {
+    '.apng': 'PNG',
+    '.gif': 'GIF',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+}
+
+DEFAULT_FORMAT = 'GIF'
+
+# The most frames that can be waiting on a background thread.
+# A full queue makes the game wait (instead of using more memory).
+MAX_QUEUED_FRAMES = 8
+
+GIF_HEADER = struct.Struct('<6sHHBBB')
+GIF_IMAGE_DESCRIPTOR = struct.Struct('<cHHHHB')
+GIF_EXTENSION_INTRODUCER = 0x21
+GIF_IMAGE_SEPARATOR = 0x2C
+GIF_TRAILER = b'\x3B'
+
+GIF_COLOR_TABLE_FLAG = 0x80
+GIF_COLOR_TABLE_SIZE_MASK = 0x07
+GIF_COLOR_RESOLUTION = 0x70
+
+# Loop forever.
+GIF_LOOP_EXTENSION = b'\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00'
+
+# Just the duration (in hundredths of a second).
+GIF_GRAPHIC_CONTROL_EXTENSION = struct.Struct('<3sBHBB')
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_CHUNK_HEADER = struct.Struct('>I4s')
+PNG_CHUNK_CRC = struct.Struct('>I')
+# Number of frames, number of plays (0 is forever).
+PNG_ANIMATION_CONTROL = struct.Struct('>II')
+# Sequence number, width, height, x, y, delay numerator, delay denominator, dispose, blend.
+PNG_FRAME_CONTROL = struct.Struct('>IIIIIHHBB')
+PNG_SEQUENCE_NUMBER = struct.Struct('>I')
+
+WEBP_HEADER = struct.Struct('<4sI4s')
+WEBP_CHUNK_HEADER = struct.Struct('<4sI')
+# Only the 'RIFF' tag and size are not counted in the RIFF size.
+WEBP_RIFF_HEADER_SIZE = 8
+WEBP_ANIMATION_FLAG = 0x02
+WEBP_NO_BLEND_FLAG = 0x02
+# Background color (BGRA), loop count (0 is forever).
+WEBP_ANIMATION = struct.Struct('<IH')
+# The chunks that hold the image itself (alpha, lossy, and lossless).
+WEBP_IMAGE_CHUNKS = (b'ALPH', b'VP8 ', b'VP8L')
+
+def getFormat(path):
+    """
+    Get the format to save an animation to the path as (based on its extension).
+    """
+
+    extension = os.path.splitext(path)[1].lower()
+    return FORMATS.get(extension, DEFAULT_FORMAT)
+
+class AnimationWriter(object):
+    """
+    Renders frames (`pacai.ui.frame.Frame`) and streams them out to an animation.
+    Call close() when there are no more frames, the animation is not complete until then.
+
+    If background is True, frames are rendered and encoded on a background thread.
+    """
+
+    def __init__(self, path, fps, sprites, font, background = False):
+        self._path = path
+        self._sprites = sprites
+        self._font = font
+
+        durationMS = int(1.0 / fps * 1000.0)
+
+        imageFormat = getFormat(path)
+        if (imageFormat == 'GIF'):
+            self._encoder = _GIFEncoder(path, durationMS)
+        elif (imageFormat == 'PNG'):
+            self._encoder = _PNGEncoder(path, durationMS)
+        else:
+            self._encoder = _WebPEncoder(path, durationMS)
+
+        self._numFrames = 0
+
+        self._queue = None
+        self._thread = None
+        self._error = None
+
+        if (background):
+            self._queue = queue.Queue(maxsize = MAX_QUEUED_FRAMES)
+            self._thread = threading.Thread(target = self._work, daemon = True)
+            self._thread.start()
+
+    def addFrame(self, frame):
+        self._checkError()
+
+        if (self._queue is not None):
+            self._queue.put(frame)
+        else:
+            self._writeFrame(frame)
+
+        self._numFrames += 1
+
+    def close(self):
+        """
+        Finish writing all the frames and close the animation.
+        """
+
+        if (self._thread is not None):
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+        self._checkError()
+        self._encoder.close()
+
+        logging.debug("Saved %d frames to '%s'." % (self._numFrames, self._path))
+
+    def getNumFrames(self):
+        return self._numFrames
+
+    def _checkError(self):
+        if (self._error is not None):
+            error = self._error
+            self._error = None
+            raise RuntimeError('Failed to save animation: %s.' % (self._path)) from error
+
+    def _work(self):
+        while (True):
+            frame = self._queue.get()
+            if (frame is None):
+                return
+
+            # After an error, keep taking frames so the game never blocks.
+            if (self._error is not None):
+                continue
+
+            try:
+                self._writeFrame(frame)
+            except Exception as ex:
+                self._error = ex
+
+    def _writeFrame(self, frame):
+        self._encoder.write(frame.toImage(self._sprites, self._font))
+
+class _GIFEncoder(object):
+    """
+    Writes a GIF one frame at a time.
+    Pillow only writes GIFs all at once, so each frame is encoded by Pillow as its own GIF,
+    and its image data (along with its colors) is copied out into the full animation.
+    Like Pillow, only the part of each frame that changed is saved.
+    """
+
+    def __init__(self, path, durationMS):
+        self._file = open(path, 'wb')
+        self._duration = max(1, int(durationMS / 10))
+        self._size = None
+        self._previousImage = None
+
+    def close(self):
+        if (self._file is None):
+            return
+
+        if (self._size is not None):
+            self._file.write(GIF_TRAILER)
+
+        self._file.close()
+        self._file = None
+
+    def write(self, image):
+        if (self._size is None):
+            self._size = image.size
+
+            packed = GIF_COLOR_RESOLUTION
+            self._file.write(GIF_HEADER.pack(b'GIF89a', image.size[0], image.size[1], packed, 0, 0))
+            self._file.write(GIF_LOOP_EXTENSION)
+
+        (changes, offset) = _cropChanges(self._previousImage, image)
+        self._previousImage = image
+
+        # Each frame gets its own colors.
+        changes = changes.convert('P', palette = Image.ADAPTIVE)
+
+        buffer = io.BytesIO()
+        changes.save(buffer, 'GIF')
+
+        self._file.write(GIF_GRAPHIC_CONTROL_EXTENSION.pack(b'\x21\xF9\x04', 0, self._duration,
+                0, 0))
+        self._file.write(_getGIFImageBlock(buffer.getvalue(), offset))
+
+class _PNGEncoder(object):
+    """
+    Writes an animated PNG (APNG) one frame at a time.
+    Each frame is encoded by Pillow as its own PNG, and its image data is copied out into
+    the full animation.
+    The number of frames is filled in when the animation is closed.
+    Only the part of each frame that changed is saved.
+    """
+
+    def __init__(self, path, durationMS):
+        self._file = open(path, 'wb')
+        self._duration = durationMS
+        self._previousImage = None
+
+        self._numFrames = 0
+        self._sequenceNumber = 0
+        self._animationControlOffset = None
+
+    def close(self):
+        if (self._file is None):
+            return
+
+        if (self._numFrames > 0):
+            self._writeChunk(b'IEND', b'')
+
+            # Now that we know how many frames there are, fill in the animation control.
+            self._file.seek(self._animationControlOffset)
+            self._writeChunk(b'acTL', PNG_ANIMATION_CONTROL.pack(self._numFrames, 0))
+
+        self._file.close()
+        self._file = None
+
+    def write(self, image):
+        # All frames must have the same type of pixels as the first one.
+        image = image.convert('RGB')
+
+        (changes, offset) = _cropChanges(self._previousImage, image)
+        self._previousImage = image
+
+        buffer = io.BytesIO()
+        changes.save(buffer, 'PNG')
+        chunks = _getPNGChunks(buffer.getvalue())
+
+        if (self._numFrames == 0):
+            self._file.write(PNG_SIGNATURE)
+            self._writeChunk(b'IHDR', chunks[0][1])
+
+            self._animationControlOffset = self._file.tell()
+            self._writeChunk(b'acTL', PNG_ANIMATION_CONTROL.pack(0, 0))
+
+        frameControl = PNG_FRAME_CONTROL.pack(self._nextSequenceNumber(),
+                changes.size[0], changes.size[1], offset[0], offset[1], self._duration, 1000, 0, 0)
+        self._writeChunk(b'fcTL', frameControl)
+
+        for (chunkType, data) in chunks:
+            if (chunkType != b'IDAT'):
+                continue
+
+            # The first frame is also the regular (non-animated) image.
+            if (self._numFrames == 0):
+                self._writeChunk(b'IDAT', data)
+            else:
+                sequenceNumber = PNG_SEQUENCE_NUMBER.pack(self._nextSequenceNumber())
+                self._writeChunk(b'fdAT', sequenceNumber + data)
+
+        self._numFrames += 1
+
+    def _nextSequenceNumber(self):
+        sequenceNumber = self._sequenceNumber
+        self._sequenceNumber += 1
+
+        return sequenceNumber
+
+    def _writeChunk(self, chunkType, data):
+        self._file.write(PNG_CHUNK_HEADER.pack(len(data), chunkType))
+        self._file.write(data)
+        self._file.write(PNG_CHUNK_CRC.pack(zlib.crc32(chunkType + data) & 0xFFFFFFFF))
+
+class _WebPEncoder(object):
+    """
+    Writes an animated WebP one frame at a time.
+    Each frame is encoded by Pillow as its own WebP, and its image data is copied out into
+    the full animation.
+    The size of the file is filled in when the animation is closed.
+    Only the part of each frame that changed is saved.
+    """
+
+    def __init__(self, path, durationMS):
+        self._file = open(path, 'wb')
+        self._duration = durationMS
+        self._previousImage = None
+        self._numFrames = 0
+
+    def close(self):
+        if (self._file is None):
+            return
+
+        if (self._numFrames > 0):
+            # Now that we know how big the file is, fill in the RIFF header.
+            size = self._file.tell()
+            self._file.seek(0)
+            self._file.write(WEBP_HEADER.pack(b'RIFF', size - WEBP_RIFF_HEADER_SIZE, b'WEBP'))
+
+        self._file.close()
+        self._file = None
+
+    def write(self, image):
+        image = image.convert('RGB')
+
+        if (self._numFrames == 0):
+            self._file.write(WEBP_HEADER.pack(b'RIFF', 0, b'WEBP'))
+
+            canvas = bytes([WEBP_ANIMATION_FLAG, 0, 0, 0])
+            canvas += _packUInt24(image.size[0] - 1) + _packUInt24(image.size[1] - 1)
+            self._writeChunk(b'VP8X', canvas)
+
+            # Black background, loop forever.
+            self._writeChunk(b'ANIM', WEBP_ANIMATION.pack(0xFF000000, 0))
+
+        # Frames can only start on even pixels.
+        (changes, offset) = _cropChanges(self._previousImage, image, alignment = 2)
+        self._previousImage = image
+
+        buffer = io.BytesIO()
+        changes.save(buffer, 'WEBP')
+
+        frame = _packUInt24(offset[0] // 2) + _packUInt24(offset[1] // 2)
+        frame += _packUInt24(changes.size[0] - 1) + _packUInt24(changes.size[1] - 1)
+        frame += _packUInt24(self._duration) + bytes([WEBP_NO_BLEND_FLAG])
+
+        for (chunkType, data) in _getWebPChunks(buffer.getvalue()):
+            if (chunkType in WEBP_IMAGE_CHUNKS):
+                frame += _getWebPChunk(chunkType, data)
+
+        self._writeChunk(b'ANMF', frame)
+        self._numFrames += 1
+
+    def _writeChunk(self, chunkType, data):
+        self._file.write(_getWebPChunk(chunkType, data))
+
+def _cropChanges(previousImage, image, alignment = 1):
+    """
+    Get the part of the image that is different from the previous image,
+    and where that part is: (image, (x, y)).
+    The position of the part will be a multiple of alignment.
+    """
+
+    if (previousImage is None):
+        return (image, (0, 0))
+
+    box = ImageChops.difference(previousImage, image).getbbox()
+    if (box is None):
+        # Nothing changed, but every frame needs some pixels.
+        box = (0, 0, 1, 1)
+
+    box = (box[0] - (box[0] % alignment), box[1] - (box[1] % alignment), box[2], box[3])
+
+    return (image.crop(box), box[0:2])
+
+def _getGIFImageBlock(data, offset):
+    """
+    Get the image from a single frame GIF (the image descriptor, colors, and image data)
+    with the GIF's global colors moved into the image's local colors,
+    and the image moved to the offset.
+    """
+
+    (signature, width, height, packed, background, aspect) = GIF_HEADER.unpack_from(data)
+
+    position = GIF_HEADER.size
+    colorTable = b''
+    colorTableSize = 0
+
+    if (packed & GIF_COLOR_TABLE_FLAG):
+        colorTableSize = packed & GIF_COLOR_TABLE_SIZE_MASK
+        length = 3 * (2 ** (colorTableSize + 1))
+        colorTable = data[position:(position + length)]
+        position += length
+
+    # Skip any extensions.
+    while (data[position] == GIF_EXTENSION_INTRODUCER):
+        # The introducer and label.
+        position += 2
+
+        # Data sub-blocks, until an empty one.
+        while (data[position] != 0):
+            position += data[position] + 1
+
+        position += 1
+
+    if (data[position] != GIF_IMAGE_SEPARATOR):
+        raise ValueError('Could not find the image in a GIF.')
+
+    descriptor = GIF_IMAGE_DESCRIPTOR.unpack_from(data, position)
+    (separator, left, top, imageWidth, imageHeight, imagePacked) = descriptor
+    position += GIF_IMAGE_DESCRIPTOR.size
+
+    # Leave images that already have their own colors alone.
+    if (imagePacked & GIF_COLOR_TABLE_FLAG or len(colorTable) == 0):
+        colorTable = b''
+    else:
+        imagePacked |= GIF_COLOR_TABLE_FLAG | colorTableSize
+
+    descriptor = GIF_IMAGE_DESCRIPTOR.pack(separator, left + offset[0], top + offset[1],
+            imageWidth, imageHeight, imagePacked)
+
+    # Everything else is the image data (except the trailer).
+    imageData = data[position:]
+    if (imageData.endswith(GIF_TRAILER)):
+        imageData = imageData[:-len(GIF_TRAILER)]
+
+    return descriptor + colorTable + imageData
+
+def _getPNGChunks(data):
+    """
+    Get all the chunks in a PNG: [(type, data), ...].
+    """
+
+    chunks = []
+    offset = len(PNG_SIGNATURE)
+
+    while (offset < len(data)):
+        (length, chunkType) = PNG_CHUNK_HEADER.unpack_from(data, offset)
+        offset += PNG_CHUNK_HEADER.size
+
+        chunks.append((chunkType, data[offset:(offset + length)]))
+        offset += length + PNG_CHUNK_CRC.size
+
+    return chunks
+
+def _getWebPChunk(chunkType, data):
+    chunk = WEBP_CHUNK_HEADER.pack(chunkType, len(data)) + data
+
+    # Chunks are padded to an even size.
+    if (len(data) % 2 == 1):
+        chunk += b'\x00'
+
+    return chunk
+
+def _getWebPChunks(data):
+    """
+    Get all the chunks in a WebP: [(type, data), ...].
+    """
+
+    chunks = []
+    offset = WEBP_HEADER.size
+
+    while (offset < len(data)):
+        (chunkType, length) = WEBP_CHUNK_HEADER.unpack_from(data, offset)
+        offset += WEBP_CHUNK_HEADER.size
+
+        chunks.append((chunkType, data[offset:(offset + length)]))
+        offset += length + (length % 2)
+
+    return chunks
+
+def _packUInt24(value):
+    return struct.pack('<I', value)[0:3]
@@ -5,9 +5,7 @@ the view chooses.
 """
 
 import abc
-
-from PIL import Image
-from PIL import ImageDraw
+import weakref
 
 from pacai.ui import spritesheet
 from pacai.ui import token
@@ -19,16 +17,26 @@ MAX_HIGHLIGHT_INTENSITY_RANGE = 150
 SCORE_X_POSITION = 0.55
 SCORE_Y_POSITION = -0.95
 
+# Walls never change during a game, so everything about them is cached per layout:
+# the wall tokens and the background image (the walls already drawn).
+# {layout: {key: value, ...}, ...}
+_layoutCache = weakref.WeakKeyDictionary()
+
 class Frame(abc.ABC):
     """
     A general representation of that can be seen on-screen at a given time.
     Frames are the basic units of the views.
+
+    Wall tokens may only depend on the layout (not the rest of the state),
+    since they are computed once per layout.
     """
 
     def __init__(self, frame, state, turn):
         self._frame = frame
         self._turn = turn
 
+        self._layout = state.getInitialLayout()
+
         self._boardHeight = state.getInitialLayout().getHeight()
         self._boardWidth = state.getInitialLayout().getWidth()
 
@@ -63,6 +71,36 @@ class Frame(abc.ABC):
     def getBoardHeight(self):
         return self._boardHeight
 
+    def getChangedCells(self, previousFrame = None):
+        """
+        Get the board positions whose token is different in the previous frame: [(x, y), ...].
+        Agents are not part of the board, so they are not considered.
+        Without a previous frame (or with a frame of a different size), every position is changed.
+        """
+
+        if (previousFrame is None or previousFrame._boardWidth != self._boardWidth
+                or previousFrame._boardHeight != self._boardHeight):
+            return [(x, y) for x in range(self._boardWidth) for y in range(self._boardHeight)]
+
+        changes = []
+
+        for x in range(self._boardWidth):
+            column = self._board[x]
+            previousColumn = previousFrame._board[x]
+
+            # Most columns do not change between frames.
+            if (column == previousColumn):
+                continue
+
+            for y in range(self._boardHeight):
+                if (column[y] != previousColumn[y]):
+                    changes.append((x, y))
+
+        return changes
+
+    def getHighlightLocations(self):
+        return self._highlightLocations
+
     def getImageHeight(self):
         # +1 for the score.
         return (self._boardHeight + 1) * spritesheet.SQUARE_SIZE
@@ -70,6 +108,9 @@ class Frame(abc.ABC):
     def getImageWidth(self):
         return self._boardWidth * spritesheet.SQUARE_SIZE
 
+    def getScore(self):
+        return self._score
+
     def getToken(self, x, y):
         return self._board[x][y]
 
@@ -79,14 +120,29 @@ class Frame(abc.ABC):
     def getBoardWidth(self):
         return self._boardWidth
 
+    def toBackgroundImage(self, sprites):
+        """
+        Get an image of just the walls.
+        The image is shared between frames (see _getBackground()), so it should not be modified.
+        """
+
+        return self._getBackground(sprites)
+
     def toImage(self, sprites = {}, font = None):
-        # Height is +1 for the score.
-        size = (
-            self._boardWidth * spritesheet.SQUARE_SIZE,
-            (self._boardHeight + 1) * spritesheet.SQUARE_SIZE
-        )
+        # PIL is only imported when we actually need images (see pacai.ui.view).
+        from PIL import ImageDraw
+
+        # Highlights go under the walls, and tokens without a sprite are drawn as rectangles
+        # (which overlap their neighbors a little).
+        # In both of these cases, the board has to be drawn in order.
+        useBackground = (len(self._highlightLocations) == 0 and len(sprites) > 0)
+
+        if (useBackground):
+            # Start with the walls already drawn.
+            image = self._getBackground(sprites).copy()
+        else:
+            image = self._newImage()
 
-        image = Image.new('RGB', size, (0, 0, 0, 255))
         draw = ImageDraw.Draw(image)
 
         # First, draw any highlights.
@@ -101,9 +157,14 @@ class Frame(abc.ABC):
 
         # Then, draw the board.
         for x in range(self._boardWidth):
+            column = self._board[x]
             for y in range(self._boardHeight):
-                if (self._board[x][y] != token.EMPTY_TOKEN):
-                    self._placeToken(x, y, self._board[x][y], sprites, image, draw)
+                objectToken = column[y]
+                if (objectToken == token.EMPTY_TOKEN
+                        or (useBackground and token.isWall(objectToken))):
+                    continue
+
+                self._placeToken(x, y, objectToken, sprites, image, draw)
 
         # Finally, overlay the agents.
         for ((x, y), agentToken) in self._agentTokens.items():
@@ -111,28 +172,67 @@ class Frame(abc.ABC):
 
         # Draw score
         position = self._toImageCoords(SCORE_X_POSITION, SCORE_Y_POSITION)
-        scoreText = "Score: %d" % (self._score)
-        draw.text(position, scoreText, self._getTextColor(), font)
+        draw.text(position, self._getScoreText(), self._getTextColor(), font)
 
         return image
 
+    def toScoreImage(self, font = None):
+        """
+        Get an image of just the score (on a transparent background),
+        and where it goes in the image from toImage(): (image, (x, y)).
+        """
+
+        from PIL import Image
+        from PIL import ImageDraw
+
+        position = self._toImageCoords(SCORE_X_POSITION, SCORE_Y_POSITION)
+        size = (self.getImageWidth() - position[0], self.getImageHeight() - position[1])
+
+        image = Image.new('RGBA', size, (0, 0, 0, 0))
+        ImageDraw.Draw(image).text((0, 0), self._getScoreText(), self._getTextColor(), font)
+
+        return image, position
+
     def _buildBoard(self, state):
-        board = self._boardWidth * [None]
-        for x in range(self._boardWidth):
+        # Start with the walls, and add the food and capsules.
+        # Food is placed last, since it goes on top of a capsule in the same spot.
+        board = [list(column) for column in self._getWallBoard(state)]
 
-            items = self._boardHeight * [token.EMPTY_TOKEN]
-            for y in range(self._boardHeight):
-                if (state.hasWall(x, y)):
-                    items[y] = self._getWallToken(x, y, state)
-                elif (state.hasFood(x, y)):
-                    items[y] = self._getFoodToken(x, y, state)
-                elif (state.hasCapsule(x, y)):
-                    items[y] = self._getCapsuleToken(x, y, state)
+        for (x, y) in state.getCapsules():
+            board[x][y] = self._getCapsuleToken(x, y, state)
 
-            board[x] = items
+        for (x, y) in state.getFoodPositions():
+            board[x][y] = self._getFoodToken(x, y, state)
 
         return board
 
+    def _getBackground(self, sprites):
+        """
+        Get an image of just the walls (see toImage()).
+        Backgrounds are cached per layout (and set of sprites).
+        """
+
+        cache = _getLayoutCache(self._layout)
+        key = ('background', type(self), id(sprites))
+
+        # Keep the sprites with the image, so their id cannot be reused while it is cached.
+        entry = cache.get(key)
+        if (entry is None or entry[0] is not sprites):
+            from PIL import ImageDraw
+
+            image = self._newImage()
+            draw = ImageDraw.Draw(image)
+
+            for x in range(self._boardWidth):
+                for y in range(self._boardHeight):
+                    if (token.isWall(self._board[x][y])):
+                        self._placeToken(x, y, self._board[x][y], sprites, image, draw)
+
+            entry = (sprites, image)
+            cache[key] = entry
+
+        return entry[1]
+
     @abc.abstractmethod
     def _getAgentBaseToken(self, x, y, agentIndex, state):
         pass
@@ -175,6 +275,9 @@ class Frame(abc.ABC):
     def _getFoodToken(self, x, y, state):
         return self._getFoodBaseToken(x, y, state) + token.FOOD_OFFSET
 
+    def _getScoreText(self):
+        return "Score: %d" % (self._score)
+
     @abc.abstractmethod
     def _getTextColor(self):
         pass
@@ -183,6 +286,30 @@ class Frame(abc.ABC):
     def _getWallBaseToken(self, x, y, state):
         pass
 
+    def _getWallBoard(self, state):
+        """
+        Get the wall token for every position (EMPTY_TOKEN where there is no wall).
+        Wall boards are cached per layout.
+        """
+
+        cache = _getLayoutCache(self._layout)
+        key = ('walls', type(self))
+
+        board = cache.get(key)
+        if (board is None):
+            board = self._boardWidth * [None]
+            for x in range(self._boardWidth):
+                items = self._boardHeight * [token.EMPTY_TOKEN]
+                for y in range(self._boardHeight):
+                    if (state.hasWall(x, y)):
+                        items[y] = self._getWallToken(x, y, state)
+
+                board[x] = items
+
+            cache[key] = board
+
+        return board
+
     def _getWallToken(self, x, y, state):
         hasWallN = False
         hasWallE = False
@@ -205,6 +332,17 @@ class Frame(abc.ABC):
 
         return token.getWallToken(baseToken, hasWallN, hasWallE, hasWallS, hasWallW)
 
+    def _newImage(self):
+        from PIL import Image
+
+        # Height is +1 for the score.
+        size = (
+            self._boardWidth * spritesheet.SQUARE_SIZE,
+            (self._boardHeight + 1) * spritesheet.SQUARE_SIZE
+        )
+
+        return Image.new('RGB', size, (0, 0, 0, 255))
+
     def _placeToken(self, x, y, objectToken, sprites, image, draw):
         startPoint = self._toImageCoords(x, y)
         endPoint = self._toImageCoords(x + 1, y - 1)
@@ -241,3 +379,11 @@ class Frame(abc.ABC):
             return (0, 255, 0)
         else:
             return (0, 0, 0)
+
+def _getLayoutCache(layout):
+    cache = _layoutCache.get(layout)
+    if (cache is None):
+        cache = {}
+        _layoutCache[layout] = cache
+
+    return cache
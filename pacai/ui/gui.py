@@ -8,16 +8,30 @@ from PIL import ImageTk
 
 from pacai.ui.keyboard import Keyboard
 from pacai.ui import spritesheet
+from pacai.ui import token
 from pacai.ui.view import AbstractView
 
 MAX_FPS = 1000
 TK_BASE_NAME = 'pacai'
 DEATH_SLEEP_TIME = 0.5
 
+# Canvas tags for the items drawn on top of the background.
+CELL_TAG = 'cell'
+AGENT_TAG = 'agent'
+SCORE_TAG = 'score'
+
 class AbstractGUIView(AbstractView):
     """
     Most of the functionality necessary to draw graphics in a window.
     `tkinter` is used, so Tk must be installed on the machine.
+
+    Frames are drawn incrementally:
+    the walls are a single background image (only redrawn when the window is resized),
+    and every food, capsule, agent, and the score is its own canvas item.
+    Between frames, only the items that changed are touched.
+    Sprites are scaled (and converted for Tk) once per window size.
+    Frames that cannot be drawn this way (highlights, or tokens without a sprite)
+    are drawn as a single full image.
     """
 
     def __init__(self, fps = 0, title = 'pacai', **kwargs):
@@ -53,6 +67,27 @@ class AbstractGUIView(AbstractView):
         self._height = None
         self._width = None
 
+        # The Tk images currently in use (Tk does not keep its own reference).
+        self._imageAreaPhoto = None
+        self._scorePhoto = None
+
+        # The last frame that was drawn incrementally, and the window size it was drawn at.
+        self._lastFrame = None
+        self._drawnSize = None
+
+        # Scaled Tk images for the current window size: {token: PhotoImage, ...}.
+        self._scaledSprites = {}
+
+        # The background image that is currently drawn (before scaling).
+        self._backgroundSource = None
+
+        # {(x, y): item, ...}
+        self._cellItems = {}
+        # [(position, token, item), ...]
+        self._agentItems = []
+        self._scoreItem = None
+        self._lastScore = None
+
         self._dead = False
         self._keyboard = None
 
@@ -61,6 +96,7 @@ class AbstractGUIView(AbstractView):
         super().finish()
 
         self._canvas.delete("all")
+        self._clearItems()
 
     def getKeyboard(self):
         # tkinter is not good with multiple keybinds.
@@ -81,6 +117,8 @@ class AbstractGUIView(AbstractView):
             self._canvas = tkinter.Canvas(self._root, height = self._height, width = self._width,
                     highlightthickness = 0)
 
+        self._clearItems()
+
         self._imageArea = self._canvas.create_image(0, 0, image = None, anchor = tkinter.NW)
         self._canvas.pack(fill = 'both', expand = True)
 
@@ -149,20 +187,246 @@ class AbstractGUIView(AbstractView):
         if (not forceDraw and self._adjustFPS()):
             return
 
-        image = frame.toImage(self._sprites, self._font)
+        if (not self._drawIncrementally(frame)):
+            self._drawFullFrame(frame)
+
+        self._root.update_idletasks()
+        self._root.update()
+
+        self._lastDrawTime = time.time()
+
+    def _canDrawIncrementally(self, frame, changedCells):
+        sprites = self._getSprites()
+
+        if (len(frame.getHighlightLocations()) > 0 or len(sprites) == 0):
+            return False
+
+        for agentToken in frame.getAgents().values():
+            if (agentToken not in sprites):
+                return False
+
+        for (x, y) in changedCells:
+            objectToken = frame.getToken(x, y)
+            if (objectToken != token.EMPTY_TOKEN and objectToken not in sprites):
+                return False
+
+        return True
+
+    def _clearItems(self):
+        """
+        Forget about all the incrementally drawn items, so the next frame is drawn from scratch.
+        """
+
+        if (self._canvas is not None):
+            for tag in (CELL_TAG, AGENT_TAG, SCORE_TAG):
+                self._canvas.delete(tag)
+
+        self._imageAreaPhoto = None
+        self._scorePhoto = None
+
+        self._lastFrame = None
+        self._drawnSize = None
+
+        self._scaledSprites = {}
+        self._backgroundSource = None
+
+        self._cellItems = {}
+        self._agentItems = []
+        self._scoreItem = None
+        self._lastScore = None
+
+    def _drawAgents(self, frame):
+        # Agents that did not move (or change) keep their item,
+        # and the rest of the items are moved to the agents that did.
+        unchanged = []
+        changed = []
+
+        remaining = list(self._agentItems)
+        for (position, agentToken) in frame.getAgents().items():
+            match = None
+            for agentItem in remaining:
+                if (agentItem[0] == position and agentItem[1] == agentToken):
+                    match = agentItem
+                    break
+
+            if (match is not None):
+                remaining.remove(match)
+                unchanged.append(match)
+            else:
+                changed.append((position, agentToken))
+
+        agentItems = unchanged
+        for (position, agentToken) in changed:
+            coords = self._toCanvasCoords(frame, *position)
+            image = self._getScaledSprite(frame, agentToken)
+
+            if (len(remaining) > 0):
+                item = remaining.pop()[2]
+                self._canvas.coords(item, *coords)
+                self._canvas.itemconfig(item, image = image)
+            else:
+                item = self._canvas.create_image(*coords, image = image, anchor = tkinter.NW,
+                        tags = AGENT_TAG)
+
+            agentItems.append((position, agentToken, item))
+
+        for agentItem in remaining:
+            self._canvas.delete(agentItem[2])
+
+        self._agentItems = agentItems
+
+    def _drawCell(self, frame, x, y):
+        """
+        Draw the non-wall token at a position.
+        Returns True if a new item was created.
+        """
+
+        objectToken = frame.getToken(x, y)
+        item = self._cellItems.get((x, y))
+
+        if (objectToken == token.EMPTY_TOKEN or token.isWall(objectToken)):
+            if (item is not None):
+                self._canvas.delete(item)
+                del self._cellItems[(x, y)]
+
+            return False
+
+        image = self._getScaledSprite(frame, objectToken)
+
+        if (item is not None):
+            self._canvas.itemconfig(item, image = image)
+            return False
+
+        coords = self._toCanvasCoords(frame, x, y)
+        self._cellItems[(x, y)] = self._canvas.create_image(*coords, image = image,
+                anchor = tkinter.NW, tags = CELL_TAG)
+
+        return True
+
+    def _drawFullFrame(self, frame):
+        """
+        Draw the whole frame as a single image.
+        """
+
+        self._clearItems()
+
+        image = frame.toImage(self._getSprites(), self._getFont())
 
         # Check for a resize.
         if (self._height != frame.getImageHeight() or self._width != frame.getImageWidth()):
             image = image.resize((self._width, self._height), resample = Image.LANCZOS)
 
-        # Convert the image into a ik image.
-        image = ImageTk.PhotoImage(image)
-        self._canvas.itemconfig(self._imageArea, image = image)
+        # Convert the image into a tk image.
+        self._imageAreaPhoto = ImageTk.PhotoImage(image)
+        self._canvas.itemconfig(self._imageArea, image = self._imageAreaPhoto)
 
-        self._root.update_idletasks()
-        self._root.update()
+    def _drawIncrementally(self, frame):
+        """
+        Draw only what changed since the last frame.
+        Returns False if this frame has to be drawn in full instead.
+        """
 
-        self._lastDrawTime = time.time()
+        # Everything is scaled to the window, so a resize means drawing everything again.
+        if (self._drawnSize != (self._width, self._height)):
+            self._clearItems()
+            self._drawnSize = (self._width, self._height)
+
+        background = frame.toBackgroundImage(self._getSprites())
+        if (background is not self._backgroundSource):
+            # A new layout (or the first frame).
+            self._lastFrame = None
+
+        changedCells = frame.getChangedCells(self._lastFrame)
+        if (not self._canDrawIncrementally(frame, changedCells)):
+            return False
+
+        if (background is not self._backgroundSource):
+            self._backgroundSource = background
+            self._imageAreaPhoto = ImageTk.PhotoImage(self._scaleImage(frame, background))
+            self._canvas.itemconfig(self._imageArea, image = self._imageAreaPhoto)
+
+        createdItems = False
+        for (x, y) in changedCells:
+            createdItems = self._drawCell(frame, x, y) or createdItems
+
+        self._drawAgents(frame)
+        self._drawScore(frame)
+
+        # Keep the layers in order: background, cells, agents, and then the score.
+        if (createdItems):
+            self._canvas.tag_raise(AGENT_TAG)
+            self._canvas.tag_raise(SCORE_TAG)
+
+        self._lastFrame = frame
+        return True
+
+    def _drawScore(self, frame):
+        if (self._lastScore == frame.getScore() and self._scoreItem is not None):
+            return
+
+        image, position = frame.toScoreImage(self._getFont())
+        self._scorePhoto = ImageTk.PhotoImage(self._scaleImage(frame, image))
+
+        if (self._scoreItem is None):
+            coords = self._imageToCanvasCoords(frame, position)
+            self._scoreItem = self._canvas.create_image(*coords, image = self._scorePhoto,
+                    anchor = tkinter.NW, tags = SCORE_TAG)
+        else:
+            self._canvas.itemconfig(self._scoreItem, image = self._scorePhoto)
+
+        self._lastScore = frame.getScore()
+
+    def _imageToCanvasCoords(self, frame, position):
+        """
+        Convert a position in the frame's image (see Frame.toImage()) to a position on the canvas.
+        """
+
+        return (
+            round(position[0] * self._width / frame.getImageWidth()),
+            round(position[1] * self._height / frame.getImageHeight()),
+        )
+
+    def _getScaledSprite(self, frame, objectToken):
+        """
+        Get the sprite for a token scaled to the window (as a Tk image).
+        Scaled sprites are cached until the window is resized.
+        """
+
+        image = self._scaledSprites.get(objectToken)
+        if (image is None):
+            sprite = self._scaleImage(frame, self._getSprites()[objectToken])
+            image = ImageTk.PhotoImage(sprite)
+            self._scaledSprites[objectToken] = image
+
+        return image
+
+    def _scaleImage(self, frame, image):
+        """
+        Scale an image from frame (image) coordinates to window coordinates.
+        """
+
+        if (self._width == frame.getImageWidth() and self._height == frame.getImageHeight()):
+            return image
+
+        size = (
+            max(1, round(image.width * self._width / frame.getImageWidth())),
+            max(1, round(image.height * self._height / frame.getImageHeight())),
+        )
+
+        return image.resize(size, resample = Image.LANCZOS)
+
+    def _toCanvasCoords(self, frame, x, y):
+        """
+        Convert a board position to a position on the canvas.
+        """
+
+        # Like Frame._toImageCoords(), (0, 0) is the upper-left.
+        position = (
+            x * spritesheet.SQUARE_SIZE,
+            (frame.getBoardHeight() - 1 - y) * spritesheet.SQUARE_SIZE
+        )
+
+        return self._imageToCanvasCoords(frame, position)
 
     def _resize(self, event):
         if (self._width == event.width and self._height == event.height):
@@ -3,8 +3,6 @@ The graphics for pacman are held in a spritesheet.
 This file knows how to read a spritesheet and map sprites to tokens.
 """
 
-from PIL import Image
-
 from pacai.core.directions import Directions
 from pacai.ui import token
 
@@ -67,6 +65,10 @@ SPRITE_SHEET_AGENTS = [
 ]
 
 def loadSpriteSheet(path):
+    # PIL is only imported when we actually need images,
+    # so views that never draw one do not pay for it.
+    from PIL import Image
+
     spritesheet = Image.open(path)
 
     sprites = {}
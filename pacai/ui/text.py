@@ -1,38 +1,78 @@
+import os
+import shutil
+import sys
+
 from pacai.ui import token
 from pacai.ui.view import AbstractView
 
+REDRAW_AUTO = 'auto'
+REDRAW_DIFF = 'diff'
+REDRAW_FULL = 'full'
+REDRAW_MODES = [REDRAW_AUTO, REDRAW_DIFF, REDRAW_FULL]
+
+ANSI_CLEAR_SCREEN = '\x1b[2J'
+ANSI_CLEAR_LINE = '\x1b[K'
+
 class AbstractTextView(AbstractView):
     """
-    A view that outputs to stdout.
+    A view that outputs to stdout (or another text stream).
+
+    Each frame is built up in memory and written out all at once.
+    Frames can be redrawn in full (the whole board is printed every time),
+    or as a diff (ANSI escape codes are used to move the cursor and only rewrite the changed cells).
+    By default (REDRAW_AUTO), diffs are only used when the output is a terminal
+    (that is not too small for the board).
     """
 
-    def __init__(self, **kwargs):
+    def __init__(self, redraw = REDRAW_AUTO, output = None, **kwargs):
         super().__init__(**kwargs)
 
+        if (redraw not in REDRAW_MODES):
+            raise ValueError("Unknown text redraw mode '%s', expecting one of: %s." %
+                    (redraw, ', '.join(REDRAW_MODES)))
+
+        self._redraw = redraw
+
+        # Resolved when drawing, so stdout can be replaced (e.g. when testing).
+        self._output = output
+
+        # The rows (lists of cells) and score line of the last frame, if it was drawn as a diff.
+        self._lastRows = None
+        self._lastScoreLine = None
+
+    # Override
+    def finish(self):
+        super().finish()
+
+        self._lastRows = None
+        self._lastScoreLine = None
+
     # Override
     def _drawFrame(self, state, frame, forceDraw = False):
         # Only draw after agents moves.
         if (not forceDraw and state.getLastAgentMoved() != 0):
             return
 
-        print()
+        output = self._output
+        if (output is None):
+            output = sys.stdout
 
-        agentTokens = frame.getDiscreteAgents()
+        rows = self._getRows(frame)
+        scoreLine = 'Score: %d' % (state.getScore())
 
-        row = frame.getBoardWidth() * [None]
+        if (self._useDiff(output, rows)):
+            text = self._getDiffText(rows, scoreLine)
 
-        # Start in the upper left (0, height - 1) amd go row-by-row.
-        for y in range(frame.getBoardHeight() - 1, -1, -1):
-            for x in range(0, frame.getBoardWidth(), 1):
-                # Overlay the agent's onto the board at the closest interger position.
-                if ((x, y) in agentTokens):
-                    row[x] = self._convertToken(agentTokens[(x, y)])
-                else:
-                    row[x] = self._convertToken(frame.getToken(x, y))
+            self._lastRows = rows
+            self._lastScoreLine = scoreLine
+        else:
+            text = '\n' + '\n'.join([''.join(row) for row in rows]) + '\n' + scoreLine + '\n'
 
-            print(''.join(row))
+            self._lastRows = None
+            self._lastScoreLine = None
 
-        print('Score: %d' % (state.getScore()))
+        output.write(text)
+        output.flush()
 
     def _convertToken(self, objectToken):
         if (objectToken == token.EMPTY_TOKEN):
@@ -51,3 +91,97 @@ class AbstractTextView(AbstractView):
             return 'S'
         else:
             return "%02d" % (objectToken)
+
+    def _getDiffText(self, rows, scoreLine):
+        """
+        Get the text (with ANSI escape codes) that turns the last frame on the screen into this one.
+        Rows and columns on the screen start at 1,
+        and the frame starts at the top of the screen.
+        """
+
+        if (self._lastRows is None or len(self._lastRows) != len(rows)):
+            # Start from a clean screen.
+            parts = [ANSI_CLEAR_SCREEN, _moveCursor(1, 1)]
+            parts.append('\n'.join([''.join(row) for row in rows]))
+            parts.append('\n' + scoreLine + '\n')
+            return ''.join(parts)
+
+        parts = []
+
+        for y in range(len(rows)):
+            row = rows[y]
+            lastRow = self._lastRows[y]
+
+            if (row == lastRow):
+                continue
+
+            if (len(row) != len(lastRow)
+                    or any([len(row[x]) != len(lastRow[x]) for x in range(len(row))])):
+                # The cells moved, so rewrite the whole row.
+                parts.append(_moveCursor(y + 1, 1) + ''.join(row) + ANSI_CLEAR_LINE)
+                continue
+
+            # Rewrite each run of changed cells.
+            x = 0
+            while (x < len(row)):
+                if (row[x] == lastRow[x]):
+                    x += 1
+                    continue
+
+                start = x
+                while (x < len(row) and row[x] != lastRow[x]):
+                    x += 1
+
+                column = len(''.join(row[0:start])) + 1
+                parts.append(_moveCursor(y + 1, column) + ''.join(row[start:x]))
+
+        if (scoreLine != self._lastScoreLine):
+            parts.append(_moveCursor(len(rows) + 1, 1) + scoreLine + ANSI_CLEAR_LINE)
+
+        # Leave the cursor under the frame.
+        parts.append(_moveCursor(len(rows) + 2, 1))
+
+        return ''.join(parts)
+
+    def _getRows(self, frame):
+        """
+        Get each row of the board (top to bottom) as a list of cells (strings).
+        """
+
+        agentTokens = frame.getDiscreteAgents()
+        rows = []
+
+        # Start in the upper left (0, height - 1) amd go row-by-row.
+        for y in range(frame.getBoardHeight() - 1, -1, -1):
+            row = frame.getBoardWidth() * [None]
+
+            for x in range(0, frame.getBoardWidth(), 1):
+                # Overlay the agent's onto the board at the closest interger position.
+                if ((x, y) in agentTokens):
+                    row[x] = self._convertToken(agentTokens[(x, y)])
+                else:
+                    row[x] = self._convertToken(frame.getToken(x, y))
+
+            rows.append(row)
+
+        return rows
+
+    def _useDiff(self, output, rows):
+        if (self._redraw == REDRAW_FULL):
+            return False
+
+        if (self._redraw == REDRAW_DIFF):
+            return True
+
+        isTTY = hasattr(output, 'isatty') and output.isatty()
+        if (not isTTY or os.environ.get('TERM', 'dumb') == 'dumb'):
+            return False
+
+        # Cursor addressing only works if the whole frame (and the score) fits on the screen.
+        size = shutil.get_terminal_size()
+        width = max([len(''.join(row)) for row in rows] + [0])
+
+        return (len(rows) + 2 <= size.lines and width <= size.columns)
+
+def _moveCursor(row, column):
+    return '\x1b[%d;%dH' % (row, column)
@@ -1,8 +1,6 @@
 import abc
 import os
 
-from PIL import ImageFont
-
 from pacai.ui import spritesheet
 
 DEFAULT_GIF_FPS = 10
@@ -19,20 +17,28 @@ class AbstractView(abc.ABC):
     """
     A abstarct view that represents all the necessary functionality a specific
     view should implement.
-    The ability to produce a gif is inherent to all views,
-    even if they do not produce graphics at runtime.
+    The ability to produce a gif (or another animation, see `pacai.ui.animation`)
+    is inherent to all views, even if they do not produce graphics at runtime.
+    Key frames are streamed out to the gif as the game is played.
+
+    Images are only made for gifs and graphical views,
+    so the sprites and font (and PIL itself) are not loaded until the first image is needed.
     """
 
     def __init__(self, spritesPath = DEFAULT_SPRITES,
-            gifPath = None, gifFPS = DEFAULT_GIF_FPS, skipFrames = DEFAULT_SKIP_FRAMES):
+            gifPath = None, gifFPS = DEFAULT_GIF_FPS, skipFrames = DEFAULT_SKIP_FRAMES,
+            gifBackground = False):
         self._spritesPath = spritesPath
 
         self._gifPath = gifPath
         self._gifFPS = max(MIN_GIF_FPS, int(gifFPS))
+        self._gifBackground = gifBackground
 
         self._saveFrames = (self._gifPath is not None)
         self._skipFrames = max(1, int(skipFrames))
-        self._keyFrames = []
+
+        # Created with the first key frame.
+        self._animationWriter = None
 
         # The number of frames this view has produced.
         self._frameCount = 0
@@ -40,21 +46,19 @@ class AbstractView(abc.ABC):
         # (Tracked by the number of times agent 0 has been animated.)
         self._turnCount = 0
 
-        self._sprites = spritesheet.loadSpriteSheet(spritesPath)
-        self._font = ImageFont.truetype(FONT_PATH, spritesheet.SQUARE_SIZE - 14)
+        # Loaded on first use, see _getSprites() and _getFont().
+        self._sprites = None
+        self._font = None
 
     def finish(self):
         """
         Signal that the game is over and the UI should cleanup.
         """
 
-        # Save the gif.
-        if (self._saveFrames and len(self._keyFrames) > 0):
-            gifTimePerFrameMS = int(1.0 / self._gifFPS * 1000.0)
-
-            images = [frame.toImage(self._sprites, self._font) for frame in self._keyFrames]
-            images[0].save(self._gifPath, save_all = True, append_images = images,
-                    duration = gifTimePerFrameMS, loop = 0, optimize = False)
+        # Finish the gif.
+        if (self._animationWriter is not None):
+            self._animationWriter.close()
+            self._animationWriter = None
 
     def getKeyboard(self):
         """
@@ -81,7 +85,13 @@ class AbstractView(abc.ABC):
         frame = self._createFrame(state)
         if (frame is not None and self._saveFrames
                 and (state.isOver() or (self._frameCount % self._skipFrames == 0))):
-            self._keyFrames.append(frame)
+            if (self._animationWriter is None):
+                from pacai.ui.animation import AnimationWriter
+
+                self._animationWriter = AnimationWriter(self._gifPath, self._gifFPS,
+                        self._getSprites(), self._getFont(), background = self._gifBackground)
+
+            self._animationWriter.addFrame(frame)
 
         self._drawFrame(state, frame, forceDraw = forceDraw)
 
@@ -106,3 +116,17 @@ class AbstractView(abc.ABC):
         """
 
         pass
+
+    def _getFont(self):
+        if (self._font is None):
+            from PIL import ImageFont
+
+            self._font = ImageFont.truetype(FONT_PATH, spritesheet.SQUARE_SIZE - 14)
+
+        return self._font
+
+    def _getSprites(self):
+        if (self._sprites is None):
+            self._sprites = spritesheet.loadSpriteSheet(self._spritesPath)
+
+        return self._sprites
@@ -0,0 +1,76 @@
+"""
+Features stored in flat arrays (instead of `pacai.util.counter.Counter`),
+for evaluation functions that are called at every leaf of a search.
+
+An agent declares its features (in a fixed order) once with a `FeatureSchema`.
+Features are then written by index into a preallocated vector,
+and scored against a weight vector (of the same schema) with `dot`.
+"""
+
+import array
+import operator
+
+class FeatureSchema(object):
+    """
+    A fixed, ordered list of feature names.
+    A feature's index in the schema is its index in every feature (and weight) vector.
+    """
+
+    def __init__(self, names):
+        self._names = list(names)
+        self._indexes = {}
+
+        for index in range(len(self._names)):
+            name = self._names[index]
+            if (name in self._indexes):
+                raise ValueError("Feature '%s' appears more than once in a schema." % (name))
+
+            self._indexes[name] = index
+
+        self._zeros = array.array('d', [0.0]) * len(self._names)
+
+    def getIndex(self, name):
+        if (name not in self._indexes):
+            raise LookupError("Feature '%s' is not in the schema: [%s]." %
+                    (name, ', '.join(self._names)))
+
+        return self._indexes[name]
+
+    def getNames(self):
+        return list(self._names)
+
+    def newVector(self):
+        """
+        Get a new vector (array) of all zeros.
+        """
+
+        return array.array('d', self._zeros)
+
+    def toVector(self, values):
+        """
+        Get a vector from a dict (or `pacai.util.counter.Counter`) of {name: value, ...}.
+        Features that are not in the dict are zero.
+        """
+
+        vector = self.newVector()
+        for name, value in values.items():
+            vector[self.getIndex(name)] = value
+
+        return vector
+
+    def zero(self, vector):
+        """
+        Zero out a vector in-place.
+        """
+
+        vector[:] = self._zeros
+
+    def __len__(self):
+        return len(self._names)
+
+def dot(features, weights):
+    """
+    The dot product of two vectors of the same schema.
+    """
+
+    return sum(map(operator.mul, features, weights))
@@ -0,0 +1,105 @@
+"""
+Helpers for playing many games at once with a pool of processes,
+and for keeping a pool of processes around to help with each move of a game.
+"""
+
+import multiprocessing
+import random
+
+# The context of a worker in a PersistentPool (set once, when the worker starts).
+_workerContext = None
+
+class PersistentPool(object):
+    """
+    A pool of processes that is kept alive between calls (e.g. for every move of a game).
+    Every worker is given the same context once, when it starts
+    (e.g. the layout and anything else that never changes),
+    so each call only has to send what did change.
+    The context must be picklable.
+    """
+
+    def __init__(self, jobs, context):
+        self._pool = multiprocessing.Pool(processes = jobs,
+                initializer = _initWorker, initargs = (context,))
+
+    def close(self):
+        if (self._pool is None):
+            return
+
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = None
+
+    def map(self, function, tasks):
+        """
+        Call function(context, *task) for each task in a worker, and get all the results (in order).
+        The function must be module-level.
+        """
+
+        calls = [(function, task) for task in tasks]
+        return self._pool.map(_callWithContext, calls, chunksize = 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
+
+def canStartProcesses():
+    """
+    Check if this process can start a pool of processes.
+    Processes in a pool (e.g. games played with --jobs) are daemonic,
+    and daemonic processes are not allowed to have children.
+    """
+
+    return not multiprocessing.current_process().daemon
+
+def getGameSeed(masterSeed, gameIndex):
+    """
+    Get the seed for a single game in a run of games.
+    The seed only depends on the master seed and the index of the game,
+    so a run plays out the same no matter how many processes play it.
+    """
+
+    # String seeds are hashed the same way by every process (unlike hash()).
+    return random.Random('%d:%d' % (masterSeed, gameIndex)).getrandbits(32)
+
+def iterateInPool(function, tasks, jobs):
+    """
+    Like runInPool(), but yield each result (in order) as soon as it is ready
+    instead of waiting for all of them.
+    """
+
+    if (jobs <= 1):
+        for task in tasks:
+            yield function(*task)
+
+        return
+
+    with multiprocessing.Pool(processes = jobs) as pool:
+        calls = [(function, task) for task in tasks]
+        for result in pool.imap(_call, calls, chunksize = 1):
+            yield result
+
+def runInPool(function, tasks, jobs):
+    """
+    Call function with each task (a tuple of arguments) using a pool of processes.
+    The function and its arguments must be picklable (i.e. the function must be module-level).
+    Results are returned in the same order as the tasks.
+
+    With one job, everything is run in this process.
+    """
+
+    return list(iterateInPool(function, tasks, jobs))
+
+def _call(call):
+    function, args = call
+    return function(*args)
+
+def _callWithContext(call):
+    function, args = call
+    return function(_workerContext, *args)
+
+def _initWorker(context):
+    global _workerContext
+    _workerContext = context
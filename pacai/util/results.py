@@ -0,0 +1,46 @@
+"""
+Stream the results of games out as they finish.
+"""
+
+import json
+import sys
+
+STDOUT_PATH = '-'
+
+class ResultsWriter(object):
+    """
+    Writes one compact JSON object per line (JSON Lines).
+    Every record is flushed as soon as it is written,
+    so other programs can follow along (e.g. `tail -f`) while games are still being played.
+
+    A path of '-' writes to stdout, and a path of None writes nothing.
+    Use as a context manager to make sure the file gets closed.
+    """
+
+    def __init__(self, path):
+        self._path = path
+        self._file = None
+
+        if (path == STDOUT_PATH):
+            self._file = sys.stdout
+        elif (path is not None):
+            self._file = open(path, 'w')
+
+    def close(self):
+        if (self._file is not None and self._file is not sys.stdout):
+            self._file.close()
+
+        self._file = None
+
+    def write(self, record):
+        if (self._file is None):
+            return
+
+        self._file.write(json.dumps(record, separators = (',', ':')) + '\n')
+        self._file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exceptionType, exceptionValue, traceback):
+        self.close()
@@ -0,0 +1,115 @@
+"""
+A transposition table: a bounded cache of search results for game states.
+"""
+
+import collections
+
+DEFAULT_MAX_SIZE = 50000
+
+# How an entry's value relates to the true (minimax) value of its state.
+EXACT = 0
+# The true value is at least this value (the search failed high, value >= beta).
+LOWER_BOUND = 1
+# The true value is at most this value (the search failed low, value <= alpha).
+UPPER_BOUND = 2
+
+class TranspositionTable(object):
+    """
+    Caches the results of tree searches (e.g. minimax with alpha-beta pruning),
+    so positions that are reached through different move orders (or again on a later move)
+    do not have to be searched again.
+
+    Entries are keyed by the state's hash, the agent to move, and the remaining search depth.
+    States are hashed with Zobrist hashing (see `pacai.core.gamestate.AbstractGameState.__hash__`),
+    so states that are modified in-place (applyAction()/undoAction()) can be used as is.
+    Note that only the hash is kept, not the state itself.
+
+    When the table is full, the least recently used entry is replaced.
+    """
+
+    def __init__(self, maxSize = DEFAULT_MAX_SIZE):
+        if (maxSize < 1):
+            raise ValueError('The size of a transposition table must be positive, found: %d.' %
+                    (maxSize))
+
+        self._maxSize = maxSize
+
+        # {(hash, agentIndex, depth): (value, flag, bestAction), ...}
+        self._entries = collections.OrderedDict()
+
+        self._hits = 0
+        self._misses = 0
+
+    def clear(self):
+        self._entries.clear()
+
+    def get(self, state, agentIndex, depth):
+        """
+        Get the entry for a search: (value, flag, bestAction), or None.
+        """
+
+        key = (hash(state), agentIndex, depth)
+
+        entry = self._entries.get(key)
+        if (entry is None):
+            self._misses += 1
+            return None
+
+        self._hits += 1
+        self._entries.move_to_end(key)
+
+        return entry
+
+    def getHits(self):
+        return self._hits
+
+    def getMaxSize(self):
+        return self._maxSize
+
+    def getMisses(self):
+        return self._misses
+
+    def lookup(self, state, agentIndex, depth, alpha = -float('inf'), beta = float('inf')):
+        """
+        Get a value that a search with the given window can return right away, or None.
+        Exact values can always be used,
+        but bounds can only be used if they are outside of the window (cause a cutoff).
+        """
+
+        entry = self.get(state, agentIndex, depth)
+        if (entry is None):
+            return None
+
+        value, flag, bestAction = entry
+
+        if (flag == EXACT
+                or (flag == LOWER_BOUND and value >= beta)
+                or (flag == UPPER_BOUND and value <= alpha)):
+            return value
+
+        return None
+
+    def store(self, state, agentIndex, depth, value,
+            alpha = -float('inf'), beta = float('inf'), bestAction = None):
+        """
+        Store the result of a search that was run with the given (alpha, beta) window.
+        The window decides if the value is exact or a bound.
+        """
+
+        if (value <= alpha):
+            flag = UPPER_BOUND
+        elif (value >= beta):
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+
+        key = (hash(state), agentIndex, depth)
+
+        self._entries[key] = (value, flag, bestAction)
+        self._entries.move_to_end(key)
+
+        if (len(self._entries) > self._maxSize):
+            self._entries.popitem(last = False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+from PIL import ImageChops
+from PIL import ImageStat
+
+from pacai.ui import animation
+
+WIDTH = 32
+HEIGHT = 24
+DURATION_MS = 100
+
+"""
+Test that the animations we stream out decode (with Pillow) to the frames that went in.
+"""
+class AnimationTest(unittest.TestCase):
+    def test_gif(self):
+        self._checkRoundTrip('gif', animation._GIFEncoder, exact = True)
+
+    def test_png(self):
+        self._checkRoundTrip('png', animation._PNGEncoder, exact = True)
+
+    def test_webp(self):
+        # Pillow saves WebP frames lossy.
+        self._checkRoundTrip('webp', animation._WebPEncoder, exact = False)
+
+    def _checkRoundTrip(self, extension, encoderClass, exact):
+        frames = _getFrames()
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'animation.' + extension)
+
+            encoder = encoderClass(path, DURATION_MS)
+            for frame in frames:
+                encoder.write(frame)
+            encoder.close()
+
+            with Image.open(path) as image:
+                self.assertEqual(extension.upper(), image.format)
+                self.assertEqual(len(frames), image.n_frames)
+
+                for i in range(len(frames)):
+                    image.seek(i)
+
+                    # Some formats only read the duration when the frame is loaded.
+                    decoded = image.convert('RGB')
+                    self.assertEqual(DURATION_MS, image.info['duration'])
+
+                    difference = ImageChops.difference(decoded, frames[i])
+
+                    if (exact):
+                        maxDifference = max([channel[1] for channel in difference.getextrema()])
+                        self.assertEqual(0, maxDifference, 'Frame %d does not match.' % (i))
+                    else:
+                        # Lossy formats blur edges, but the frame should still be mostly the same.
+                        meanDifference = max(ImageStat.Stat(difference).mean)
+                        self.assertLess(meanDifference, 8, 'Frame %d does not match.' % (i))
+
+def _getFrames():
+    """
+    Frames with a square moving across a background (and a repeated frame).
+    """
+
+    frames = []
+
+    for x in [0, 5, 5, 12, 20]:
+        frame = Image.new('RGB', (WIDTH, HEIGHT), (0, 0, 128))
+        frame.paste((255, 255, 0), (x, 4, x + 8, 12))
+        frames.append(frame)
+
+    return frames
+
+if __name__ == '__main__':
+    unittest.main()
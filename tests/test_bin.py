@@ -1,8 +1,17 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
 import unittest
 
+from PIL import Image
+
 from pacai.bin import capture
 from pacai.bin import gridworld
 from pacai.bin import pacman
+from pacai.bin import startup
+from pacai.bin import tournament
 
 """
 This is a test class to assess the executables of this project.
@@ -41,6 +50,84 @@ class BinTest(unittest.TestCase):
             if status.code != 0:
                 self.fail("Error occured when running --help.")
 
+    def test_text_graphics(self):
+        # Text frames are redrawn in full, or as diffs of the changed cells.
+        for redraw in ['full', 'diff']:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                capture.main(['--text-graphics', '--text-redraw', redraw, '--seed', '1234'])
+
+            self.assertEqual(redraw == 'diff', '\x1b[' in output.getvalue())
+
+    def test_turbo(self):
+        # Run headless games of pacman and capture.
+        pacman.main(['-p', 'GreedyAgent', '--turbo', '--seed', '1234'])
+        capture.main(['--turbo', '--seed', '1234'])
+
+    def test_mcts_capture(self):
+        # Play a short game of capture with an MCTS agent.
+        gameResults = capture.main(['--null-graphics', '--seed', '1234', '--max-moves', '20',
+                '--red-args', 'first=pacai.agents.capture.mcts.MCTSCaptureAgent'])
+
+        self.assertEqual(1, len(gameResults))
+
+    def test_parallel_games(self):
+        # Seeded games play out the same no matter how many processes play them.
+        args = ['-p', 'GreedyAgent', '--turbo', '--seed', '1234', '--num-games', '4']
+
+        serialResults = pacman.main(args)
+        parallelResults = pacman.main(args + ['--jobs', '2'])
+
+        self.assertEqual(4, len(serialResults))
+        self.assertEqual(serialResults, parallelResults)
+
+    def test_results(self):
+        # Stream the results of each game as JSON.
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'results.jsonl')
+            gameResults = capture.main(['--turbo', '--seed', '1234', '--num-games', '2',
+                    '--max-moves', '50', '--results', path])
+
+            with open(path, 'r') as file:
+                lines = [json.loads(line) for line in file]
+
+        self.assertEqual(gameResults, lines)
+        self.assertEqual([0, 1], [line['game'] for line in lines])
+        self.assertEqual(50, lines[0]['moves'])
+
+    def test_animation(self):
+        # Save a game as each kind of animation.
+        with tempfile.TemporaryDirectory() as tempDir:
+            for extension in ('gif', 'png', 'webp'):
+                path = os.path.join(tempDir, 'game.' + extension)
+                pacman.main(['-p', 'GreedyAgent', '--null-graphics', '--seed', '1234',
+                        '--gif', path, '--gif-skip-frames', '10', '--gif-background'])
+
+                with Image.open(path) as image:
+                    self.assertEqual(image.format, extension.upper())
+                    self.assertTrue(image.n_frames > 1)
+
+    def test_startup(self):
+        # Text and null views should not load any images (or PIL).
+        results = {result['name']: result for result in startup.runBenchmarks(runs = 1)}
+
+        for name in ['pacman null view', 'pacman text view', 'capture text view']:
+            self.assertFalse(results[name]['pil'], name)
+
+        self.assertTrue(results['view assets (for images)']['pil'])
+
+    def test_tournament(self):
+        teams = ['pacai.core.baselineTeam', 'pacai.student.myTeam']
+        results = tournament.main(['--teams'] + teams + ['--layouts', 'RANDOM3',
+                '--max-moves', '50', '--seed', '1234', '--jobs', '2'])
+
+        # One game with each team as red.
+        self.assertEqual(2, len(results))
+        self.assertEqual(set(teams), set([result[0] for result in results]))
+
+        standings = tournament.getStandings(teams, results)
+        self.assertEqual(2, sum([standing['games'] for standing in standings]) // 2)
+
     def test_gridworld(self):
         # Run game of gridworld with default agents.
         gridworld.main(['--null-graphics'])
@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+
+from pacai.core import distanceCalculator
+from pacai.core.layout import getLayout
+
+"""
+Test the BFS maze distances.
+"""
+class DistanceTest(unittest.TestCase):
+    def test_shortest_paths(self):
+        layout = getLayout('tinyCapture')
+        distances = distanceCalculator.computeDistances(layout)
+        positions = layout.walls.asList(False)
+
+        self.assertEqual(len(positions), distances.getNumCells())
+
+        for source in positions:
+            self.assertEqual(0, distances.getDistance(source, source))
+
+            for target in positions:
+                distance = distances.getDistance(source, target)
+                self.assertEqual(distance, distances.getDistance(target, source))
+
+                if (source == target):
+                    continue
+
+                # A shortest path goes through the neighbor that is closest to the target.
+                neighborDistances = [distances.getDistance(neighbor, target)
+                        for neighbor in self._getNeighbors(layout, source)]
+                self.assertEqual(distance, 1 + min(neighborDistances))
+
+    def test_cache(self):
+        layout = getLayout('tinyCapture')
+        key = distanceCalculator.getLayoutKey(layout)
+        expected = distanceCalculator.computeDistances(layout)
+        positions = layout.walls.asList(False)
+
+        oldCacheDir = distanceCalculator.getCacheDir()
+
+        with tempfile.TemporaryDirectory() as cacheDir:
+            distanceCalculator.setCacheDir(cacheDir)
+
+            try:
+                # The first call computes and saves, the second loads the saved file.
+                distanceCalculator.getCachedDistances(layout, key)
+                self.assertTrue(os.path.isfile(
+                        os.path.join(cacheDir, key + distanceCalculator.CACHE_FILE_EXTENSION)))
+
+                loaded = distanceCalculator.getCachedDistances(layout, key)
+                self.assertIsInstance(loaded._distances, memoryview)
+
+                for source in positions:
+                    for target in positions:
+                        self.assertEqual(expected.getDistance(source, target),
+                                loaded.getDistance(source, target))
+
+                # Release the mapping before the directory is cleaned up.
+                loaded._distances.release()
+                loaded._cellIndexes.release()
+            finally:
+                distanceCalculator.setCacheDir(oldCacheDir)
+
+    def test_not_in_grid(self):
+        layout = getLayout('tinyCapture')
+        distancer = distanceCalculator.Distancer(layout)
+        distancer.getMazeDistances()
+
+        self.assertEqual(1, distancer.getDistance((1, 1), (1, 2)))
+
+        with self.assertRaises(LookupError):
+            distancer.getDistance((0, 0), (1, 1))
+
+    def _getNeighbors(self, layout, position):
+        x, y = position
+        neighbors = [(x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)]
+        return [neighbor for neighbor in neighbors if not layout.isWall(neighbor)]
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import random
+import unittest
+
+from pacai.bin.capture import CaptureGameState
+from pacai.bin.pacman import PacmanGameState
+from pacai.core import zobrist
+from pacai.core.layout import getLayout
+from pacai.student import multiagents
+
+NUM_PLAYOUTS = 10
+MAX_PLIES = 300
+SEED = 4
+
+"""
+Test that applying actions in-place (and undoing them) matches generating successors.
+"""
+class GameStateTest(unittest.TestCase):
+    def test_pacman_apply_undo(self):
+        layout = getLayout('smallClassic')
+        self._checkPlayouts(lambda: PacmanGameState(layout))
+
+    def test_capture_apply_undo(self):
+        layout = getLayout('tinyCapture')
+        self._checkPlayouts(lambda: CaptureGameState(layout, MAX_PLIES))
+
+    def test_search_error_restores_state(self):
+        # Searches work on the game's own state, so a failed search must leave it as it was.
+        layout = getLayout('smallClassic')
+
+        for agentClass in [multiagents.MinimaxAgent, multiagents.AlphaBetaAgent,
+                multiagents.ExpectimaxAgent]:
+            state = PacmanGameState(layout)
+            expectedHash = hash(state)
+            expectedFood = state.getFood().asList()
+
+            agent = agentClass(0, depth = 3)
+            agent._evaluationFunction = _FailingEvaluation(5)
+
+            self.assertRaises(RuntimeError, agent.getAction, state)
+            self.assertEqual(expectedHash, hash(state))
+            self.assertEqual(expectedFood, state.getFood().asList())
+
+    def test_zobrist_keys_are_stable(self):
+        layout = getLayout('tinyCapture')
+        queries = [
+            (0, zobrist.AGENT_POSITION, (1, 2)),
+            (1, zobrist.AGENT_DIRECTION, 'North'),
+            (0, zobrist.AGENT_IS_PACMAN, True),
+            (1, zobrist.AGENT_SCARED_TIMER, 40),
+            (2, zobrist.AGENT_POSITION, (3.5, 1.0)),
+        ]
+
+        # Keys must not depend on the order they are asked for in.
+        forwardKeys = zobrist.ZobristKeys(layout)
+        backwardKeys = zobrist.ZobristKeys(layout)
+
+        forward = [forwardKeys.agent(*query) for query in queries]
+        backward = [backwardKeys.agent(*query) for query in reversed(queries)]
+
+        self.assertEqual(forward, list(reversed(backward)))
+        self.assertEqual(forwardKeys.agent(0, zobrist.AGENT_POSITION, (1.0, 2.0)), forward[0])
+
+    def _checkPlayouts(self, initialStateFunction):
+        rng = random.Random(SEED)
+
+        for i in range(NUM_PLAYOUTS):
+            # Successors share food and capsules with the walker,
+            # so any in-place modification that leaks out will show up in the history.
+            walker = initialStateFunction()
+            state = walker
+            records = []
+            history = [initialStateFunction()]
+
+            agentIndex = 0
+            while (not state.isOver() and len(records) < MAX_PLIES):
+                action = rng.choice(state.getLegalActions(agentIndex))
+
+                state = state.generateSuccessor(agentIndex, action)
+                records.append(walker.applyAction(agentIndex, action))
+                history.append(state)
+
+                self._assertSameState(state, walker)
+
+                agentIndex = (agentIndex + 1) % state.getNumAgents()
+
+            # Walk all the way back to the start, checking every state along the way.
+            while (len(records) > 0):
+                walker.undoAction(records.pop())
+                history.pop()
+
+                self._assertSameState(history[-1], walker)
+
+    def _assertSameState(self, expected, actual):
+        self.assertEqual(expected, actual)
+        self.assertEqual(hash(expected), hash(actual))
+
+        self.assertEqual(expected.getLastAgentMoved(), actual.getLastAgentMoved())
+        self.assertEqual(expected.getLastFoodEaten(), actual.getLastFoodEaten())
+        self.assertEqual(expected.getLastCapsuleEaten(), actual.getLastCapsuleEaten())
+        self.assertEqual(expected.getNumFood(), actual.getNumFood())
+        self.assertEqual(expected.getFood().count(), actual.getNumFood())
+        self.assertEqual(set(expected.getFood().asList()), actual.getFoodPositions())
+
+        for agentIndex in range(expected.getNumAgents()):
+            expectedAgent = expected.getAgentState(agentIndex)
+            actualAgent = actual.getAgentState(agentIndex)
+
+            self.assertEqual(expectedAgent, actualAgent)
+            self.assertEqual(expectedAgent.getZobristHash(), actualAgent.getZobristHash())
+
+        if (isinstance(expected, CaptureGameState)):
+            self.assertEqual(expected.getTimeleft(), actual.getTimeleft())
+            self.assertEqual(expected.getRedFood(), actual.getRedFood())
+            self.assertEqual(expected.getBlueFood(), actual.getBlueFood())
+            self.assertEqual(expected.getRedFood().count(), actual.getNumRedFood())
+            self.assertEqual(expected.getBlueFood().count(), actual.getNumBlueFood())
+            self.assertEqual(expected.getRedCapsules(), actual.getRedCapsules())
+            self.assertEqual(expected.getBlueCapsules(), actual.getBlueCapsules())
+
+class _FailingEvaluation(object):
+    """
+    An evaluation function that fails partway through a search.
+    """
+
+    def __init__(self, numCalls):
+        self._numCalls = numCalls
+
+    def __call__(self, state):
+        self._numCalls -= 1
+        if (self._numCalls < 0):
+            raise RuntimeError('Evaluation failed.')
+
+        return state.getScore()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from pacai.core.grid import Grid
+
+"""
+Test the bitboard-backed grid.
+"""
+class GridTest(unittest.TestCase):
+    def test_access(self):
+        grid = Grid(3, 4)
+        self.assertFalse(grid[1][2])
+
+        grid[1][2] = True
+        self.assertTrue(grid[1][2])
+        self.assertTrue(grid.get(1, 2))
+        self.assertTrue(grid[-2][-2])
+
+        grid.set(1, 2, False)
+        self.assertFalse(grid[1][2])
+
+        with self.assertRaises(IndexError):
+            grid[3][0]
+
+        with self.assertRaises(IndexError):
+            grid[0][4]
+
+    def test_count_and_list(self):
+        grid = Grid(5, 5)
+        positions = [(0, 0), (1, 3), (4, 4), (2, 0)]
+        for (x, y) in positions:
+            grid[x][y] = True
+
+        self.assertEqual(len(positions), grid.count())
+        self.assertEqual(25 - len(positions), grid.count(False))
+        self.assertEqual(sorted(positions), sorted(grid.asList()))
+        self.assertEqual(25 - len(positions), len(grid.asList(False)))
+
+        full = Grid(2, 3, initialValue = True)
+        self.assertEqual(6, full.count())
+
+    def test_copy(self):
+        grid = Grid(4, 4)
+        grid[2][2] = True
+
+        other = grid.copy()
+        self.assertEqual(grid, other)
+        self.assertEqual(hash(grid), hash(other))
+
+        other[0][0] = True
+        self.assertNotEqual(grid, other)
+        self.assertFalse(grid[0][0])
+
+if __name__ == '__main__':
+    unittest.main()
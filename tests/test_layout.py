@@ -0,0 +1,28 @@
+import unittest
+
+from pacai.core.actions import Actions
+from pacai.core.directions import Directions
+from pacai.core.layout import getLayout
+
+"""
+Test the precomputed move tables on layouts.
+"""
+class LayoutTest(unittest.TestCase):
+    def test_move_tables(self):
+        for name in ['mediumClassic', 'tinyCapture', 'bigMaze']:
+            layout = getLayout(name)
+
+            for position in layout.walls.asList(False):
+                self.assertEqual(
+                        Actions.getPossibleActions(position, Directions.STOP, layout.walls),
+                        layout.getPossibleActions(position, Directions.STOP))
+
+                self.assertEqual(Actions.getLegalNeighbors(position, layout.walls),
+                        layout.getLegalNeighbors(position))
+
+    def test_between_cells(self):
+        layout = getLayout('mediumClassic')
+        self.assertEqual([Directions.EAST], layout.getPossibleActions((1.5, 1), Directions.EAST))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,6 +4,10 @@ import unittest
 
 from pacai.bin import capture
 from pacai.bin import pacman
+from pacai.bin import verify_replays
+from pacai.bin.capture import CaptureGameState
+from pacai.core import replay
+from pacai.core.directions import Directions
 
 PACMAN_FILENAME = 'pacai_unittest_pacman.replay'
 CAPTURE_FILENAME = 'pacai_unittest_capture.replay'
@@ -35,5 +39,133 @@ class ReplayTest(unittest.TestCase):
 
         os.remove(replayPath)
 
+    def test_format(self):
+        moves = [(0, Directions.NORTH), (1, Directions.STOP), (3, Directions.WEST),
+                (30, Directions.EAST), (2, Directions.SOUTH)]
+        header = {'layout': ['%%%', '%P%', '%%%'], 'seed': 5}
+
+        with tempfile.TemporaryDirectory() as tempDir:
+            path = os.path.join(tempDir, 'test.replay')
+
+            with replay.ReplayWriter(path, header) as writer:
+                for move in moves:
+                    writer.writeMove(*move)
+
+                writer.close({'score': 10})
+
+            # A header, one byte per move, and a footer.
+            reader = replay.ReplayReader(path)
+            self.assertEqual(header, reader.getHeader())
+            self.assertEqual(moves, list(reader.moves()))
+            self.assertEqual({'score': 10, 'numMoves': len(moves)}, reader.getFooter())
+
+            # Cut off replays still play, but have no footer.
+            with open(path, 'rb') as file:
+                data = file.read()
+
+            with open(path, 'wb') as file:
+                file.write(data[:-(replay.TAIL.size + 5)])
+
+            reader = replay.ReplayReader(path)
+            self.assertEqual(moves, list(reader.moves()))
+            self.assertIsNone(reader.getFooter())
+
+        with self.assertRaises(ValueError):
+            replay.encodeMove(replay.MAX_AGENTS, Directions.NORTH)
+
+    def test_capture_footer(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
+
+        capture.main(['--turbo', '--seed', '4', '--max-moves', '100', '--record', replayPath])
+
+        # Playing back the moves ends with the score in the footer.
+        reader = replay.ReplayReader(replayPath)
+        state = CaptureGameState(reader.getLayout(), reader.getHeader()['length'])
+        for (agentIndex, action) in reader.moves():
+            state = state.generateSuccessor(agentIndex, action)
+
+        footer = reader.getFooter()
+        self.assertEqual(100, footer['numMoves'])
+        self.assertEqual(footer['score'], state.getScore())
+
+        os.remove(replayPath)
+
+    def test_keyframes(self):
+        replayPath = os.path.join(tempfile.gettempdir(), CAPTURE_FILENAME)
+
+        capture.main(['--turbo', '--seed', '4', '--max-moves', '300', '--record', replayPath,
+                '--keyframe-interval', '50'])
+
+        reader = replay.ReplayReader(replayPath)
+        self.assertEqual(6, len(reader.getKeyframes()))
+
+        initialState = CaptureGameState(reader.getLayout(), reader.getHeader()['length'])
+        moves = list(reader.moves())
+
+        states = [initialState]
+        for (agentIndex, action) in moves:
+            states.append(states[-1].generateSuccessor(agentIndex, action))
+
+        for ply in (0, 1, 49, 50, 51, 175, 300):
+            state = reader.materializeState(initialState, ply)
+            self.assertEqual(states[ply], state)
+            self.assertEqual(hash(states[ply]), hash(state))
+            self.assertEqual(states[ply].getNumRedFood(), state.getNumRedFood())
+            self.assertEqual(states[ply].getTimeleft(), state.getTimeleft())
+
+            self.assertEqual(moves[ply:], list(reader.moves(ply)))
+
+        with self.assertRaises(LookupError):
+            reader.materializeState(initialState, len(moves) + 1)
+
+        # Keyframes in cut off replays are found by scanning.
+        with open(replayPath, 'rb') as file:
+            data = file.read()
+
+        with open(replayPath, 'wb') as file:
+            file.write(data[:len(data) // 2])
+
+        reader = replay.ReplayReader(replayPath)
+        self.assertIsNone(reader.getFooter())
+
+        keyframes = reader.getKeyframes()
+        self.assertTrue(len(keyframes) > 0)
+
+        ply = keyframes[-1][0]
+        self.assertEqual(states[ply], reader.materializeState(initialState, ply))
+
+        os.remove(replayPath)
+
+    def test_verify(self):
+        with tempfile.TemporaryDirectory() as tempDir:
+            pacman.main(['--turbo', '-p', 'GreedyAgent', '--seed', '3',
+                    '--record', os.path.join(tempDir, 'pacman.replay')])
+            capture.main(['--turbo', '--seed', '4', '--max-moves', '100', '-n', '2',
+                    '--record', os.path.join(tempDir, 'capture.replay')])
+
+            # Non-replay files are skipped.
+            with open(os.path.join(tempDir, 'notes.txt'), 'w') as file:
+                file.write('Not a replay.\n')
+
+            reports = verify_replays.main(['--jobs', '2', tempDir])
+            self.assertEqual(3, len(reports))
+            self.assertTrue(all([report['ok'] for report in reports]))
+
+            # Record the same game, but with the wrong result.
+            reader = replay.ReplayReader(os.path.join(tempDir, 'capture.replay.0'))
+            footer = reader.getFooter()
+            footer['score'] += 1
+
+            path = os.path.join(tempDir, 'bad.replay')
+            with replay.ReplayWriter(path, reader.getHeader()) as writer:
+                for (agentIndex, action) in reader.moves():
+                    writer.writeMove(agentIndex, action)
+
+                writer.close(footer)
+
+            report = verify_replays.verifyReplay(path)
+            self.assertFalse(report['ok'])
+            self.assertEqual(1, len(report['mismatches']))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,73 @@
+import unittest
+
+from pacai.bin.pacman import PacmanGameState
+from pacai.core.layout import getLayout
+from pacai.student import multiagents
+from pacai.util import parallel
+from pacai.util.transposition import DEFAULT_MAX_SIZE
+
+LAYOUT = 'smallClassic'
+NUM_MOVES = 6
+DEPTH = 2
+
+"""
+Test that searching root actions in parallel gives the same moves as searching them serially.
+"""
+class SearchTest(unittest.TestCase):
+    def test_parallel_alpha_beta(self):
+        self._checkParallelMoves(multiagents.AlphaBetaAgent, {})
+        self._checkParallelMoves(multiagents.AlphaBetaAgent,
+                {'transpositionTableSize': DEFAULT_MAX_SIZE})
+
+    def test_parallel_minimax(self):
+        self._checkParallelMoves(multiagents.MinimaxAgent, {})
+
+    def test_parallel_in_pool(self):
+        # Processes in a pool cannot start their own workers.
+        results = parallel.runInPool(_searchInPool, [(2,), (1,)], 2)
+
+        self.assertEqual('ValueError', results[0])
+        self.assertEqual('ok', results[1])
+
+    def _checkParallelMoves(self, agentClass, args):
+        serialAgent = agentClass(0, depth = DEPTH, numWorkers = 1, **args)
+        parallelAgent = agentClass(0, depth = DEPTH, numWorkers = 2, **args)
+
+        state = PacmanGameState(getLayout(LAYOUT))
+
+        try:
+            for i in range(NUM_MOVES):
+                serialAction = serialAgent.getAction(state)
+                parallelAction = parallelAgent.getAction(state)
+                self.assertEqual(serialAction, parallelAction, 'Moves differ on move %d.' % (i))
+
+                state = state.generateSuccessor(0, serialAction)
+
+                # Ghosts take their first legal action.
+                for agentIndex in range(1, state.getNumAgents()):
+                    if (state.isOver()):
+                        break
+
+                    state = state.generateSuccessor(agentIndex,
+                            state.getLegalActions(agentIndex)[0])
+
+                if (state.isOver()):
+                    break
+        finally:
+            parallelAgent.final(state)
+
+def _searchInPool(numWorkers):
+    agent = multiagents.AlphaBetaAgent(0, depth = 1, numWorkers = 1)
+
+    # Pretend that the agent was made outside the pool (like agents for games played with --jobs).
+    agent._numWorkers = numWorkers
+
+    try:
+        agent.getAction(PacmanGameState(getLayout(LAYOUT)))
+    except ValueError:
+        return 'ValueError'
+
+    return 'ok'
+
+if __name__ == '__main__':
+    unittest.main()
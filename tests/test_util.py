@@ -1,5 +1,7 @@
 import unittest
 
+from pacai.util import features
+from pacai.util import parallel
 from pacai.util import util
 
 """
@@ -13,5 +15,29 @@ class UtilTest(unittest.TestCase):
         self.assertEquals(util.buildHash(1, 1), 23311)
         self.assertEquals(util.buildHash(1, 2), 23312)
 
+    def test_feature_schema(self):
+        schema = features.FeatureSchema(['a', 'b', 'c'])
+        weights = schema.toVector({'a': 1.0, 'c': -2.0})
+
+        vector = schema.newVector()
+        vector[schema.getIndex('a')] = 2.0
+        vector[schema.getIndex('b')] = 5.0
+        vector[schema.getIndex('c')] = 2.0
+        self.assertEqual(features.dot(vector, weights), -2.0)
+
+        schema.zero(vector)
+        self.assertEqual(list(vector), [0.0, 0.0, 0.0])
+
+        self.assertRaises(LookupError, schema.getIndex, 'd')
+        self.assertRaises(ValueError, features.FeatureSchema, ['a', 'a'])
+
+    def test_persistent_pool(self):
+        with parallel.PersistentPool(2, 10) as pool:
+            self.assertEqual(pool.map(_addToContext, [(1,), (2,), (3,)]), [11, 12, 13])
+            self.assertEqual(pool.map(_addToContext, [(-10,)]), [0])
+
+def _addToContext(context, value):
+    return context + value
+
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@ import unittest
 from pacai.util import priorityQueue
 from pacai.util import queue
 from pacai.util import stack
+from pacai.util import transposition
 
 """
 This is a test class to assess the functionality of the data structures defined in util.py.
@@ -52,5 +53,28 @@ class UtilContainersTest(unittest.TestCase):
         for val, pri in reversed(val_list):
             self.assertEqual(val, testPriorityQueue.pop())
 
+    def test_transposition_table(self):
+        # Any hashable object can stand in for a state.
+        table = transposition.TranspositionTable(maxSize = 2)
+        self.assertIsNone(table.lookup('a', 0, 1))
+
+        # Exact values are always usable, bounds only when they cause a cutoff.
+        table.store('a', 0, 1, 5)
+        table.store('b', 0, 1, 10, alpha = 0, beta = 10)
+        self.assertEqual(5, table.lookup('a', 0, 1, 0, 1))
+        self.assertIsNone(table.lookup('b', 0, 1, 0, 20))
+        self.assertEqual(10, table.lookup('b', 0, 1, 0, 8))
+
+        # The agent and depth are part of the key.
+        self.assertIsNone(table.lookup('a', 1, 1))
+        self.assertIsNone(table.lookup('a', 0, 2))
+
+        # The least recently used entry is replaced ('a' was used after 'b').
+        table.lookup('a', 0, 1)
+        table.store('c', 0, 1, 1)
+        self.assertEqual(2, len(table))
+        self.assertIsNone(table.get('b', 0, 1))
+        self.assertEqual(5, table.lookup('a', 0, 1))
+
 if __name__ == '__main__':
     unittest.main()